@@ -0,0 +1,511 @@
+# Author: Selorm Kwami Dzakpasu
+
+# Benchmarks the parsing, status split and cleanup without fetching anything from the ISOs
+#
+# Record the inputs once after a normal run of main.py (raw PJM/SPP files and every ISO's formatted queue from ".cache"):
+#     python benchmark.py record
+# Then time the pipeline on them (or on generated queues with --synthetic), at 1x, 10x and 100x the rows:
+#     python benchmark.py run --scale 1 10 100
+#
+# Every run is added to "benchmarks/history.jsonl" and compared with the previous runs on the same machine.
+# The run fails (exit code 1) when a stage got slower than REGRESSION_TOLERANCE or the cleaned queues changed.
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from xml.sax.saxutils import escape
+import numpy as np
+import pandas as pd
+from instrumentation import STAGES
+from iso_queues import (PJM_QUEUE_URL, SPP_QUEUE_URL, SPP_STATUSES, STANDARD_COLUMNS, ISO_COLUMNS,
+                        parse_pjm_interconnection_queue, parse_spp_interconnection_queue)
+from downloads import HTTPCache
+from frame_cache import FrameCache
+from compaction import compact_queue_frame
+from status_rules import split_by_status
+from queue_cleanup import queue_cleanup
+from outputs import write_excel, SHORT_DATE_COLUMNS
+
+# Folder the recorded inputs and the results history are kept in
+BENCHMARK_DIR = 'benchmarks'
+FIXTURE_DIR = os.path.join(BENCHMARK_DIR, 'fixtures')
+HISTORY_PATH = os.path.join(BENCHMARK_DIR, 'history.jsonl')
+
+# Cleaned queues of the repo, the sheets and columns every run must produce
+GOLDEN_WORKBOOK = 'Cleaned_ISO_Queues.xlsx'
+
+# Commit whose code gives the golden output: the repo before any of the optimizations, its main.py split and queue_cleanup.py
+# are run unchanged on the recorded queues, so the golden output doesn't depend on the code it checks
+BASELINE_COMMIT = '823b850'
+
+# Variables the queues have in the baseline main.py
+BASELINE_QUEUE_NAMES = {'NYISO': 'nyiso_queue', 'CAISO': 'caiso_queue', 'SPP': 'spp_queue', 'ERCOT': 'ercot_queue',
+                        'MISO': 'miso_queue', 'NEISO': 'neiso_queue', 'PJM': 'pjm_queue'}
+
+# A stage is a regression when it is this much slower (share) and at least MIN_REGRESSION_SECONDS slower
+# than the median of the last HISTORY_WINDOW runs on the same machine, inputs and scale
+REGRESSION_TOLERANCE = 0.25
+MIN_REGRESSION_SECONDS = 0.05
+HISTORY_WINDOW = 5
+
+# Raw files recorded for the ISOs main.py parses itself
+RAW_FIXTURES = {'PJM': ('PJM.xml', PJM_QUEUE_URL), 'SPP': ('SPP.csv', SPP_QUEUE_URL)}
+
+# Rows of each generated queue (about the size of the real queues)
+SYNTHETIC_ROWS = {'NYISO': 1500, 'CAISO': 2500, 'SPP': 2300, 'ERCOT': 1900, 'MISO': 3600, 'NEISO': 1400, 'PJM': 8000}
+
+
+# Recording
+
+def record(fixture_dir=FIXTURE_DIR):
+    """Copy the inputs of the last main.py run from ".cache" into the fixture folder
+
+    Saves the raw PJM/SPP files, every ISO's formatted queue and the cleaned queues BASELINE_COMMIT gives for them
+    (the golden output later runs are compared with).
+    """
+    os.makedirs(fixture_dir, exist_ok=True)
+
+    # Raw files come from the HTTP cache (downloaded if they were never cached)
+    http_cache = HTTPCache(ttl=float('inf'))
+    for code, (file_name, url) in RAW_FIXTURES.items():
+        with open(os.path.join(fixture_dir, file_name), 'wb') as f:
+            f.write(http_cache.get(url).content)
+
+    frame_cache = FrameCache()
+    for code in ISO_COLUMNS:
+        cached = frame_cache.load_latest(code)
+        if cached is None:
+            raise RuntimeError(f"No cached {code} queue, run main.py before recording")
+        cached[0].to_pickle(os.path.join(fixture_dir, f"{code}.pkl"))
+
+    golden = baseline_cleaned(load_recorded(fixture_dir))
+    pd.to_pickle(golden, os.path.join(fixture_dir, 'golden.pkl'))
+    print(f"Recorded {len(ISO_COLUMNS)} queues to {fixture_dir} (golden output from {BASELINE_COMMIT})")
+
+
+def _baseline_source(path, commit=BASELINE_COMMIT):
+    return subprocess.run(['git', 'show', f"{commit}:{path}"], capture_output=True, text=True, check=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+
+def baseline_cleaned(queues, commit=BASELINE_COMMIT):
+    """Cleaned queues the code of commit gives for queues
+
+    Runs the commit's main.py from "# Combine all queues" on (the status split, which saves "Combined_ISO_Queues.xlsx")
+    and its queue_cleanup.py (which cleans that workbook into "Cleaned_ISO_Queues.xlsx") in a temporary folder.
+
+    Returns:
+        dict: the sheets of the cleaned workbook, as read by read_workbook(). The short dates the baseline saved as
+            MM/DD/YYYY text are turned into the dates the workbook shows, as the new code saves them as date cells.
+    """
+    main_source = _baseline_source('main.py', commit)
+    split_source = main_source[main_source.index('# Combine all queues'):main_source.index('# Run Queue Cleanup')]
+    cleanup_source = _baseline_source('queue_cleanup.py', commit)
+
+    prepared = {BASELINE_QUEUE_NAMES[code]: add_balancing_authority(queue, code) for code, queue in queues.items()}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory, warnings.catch_warnings(), contextlib.redirect_stdout(io.StringIO()):
+        warnings.simplefilter('ignore')
+        os.chdir(directory)
+        try:
+            exec(split_source, {'pd': pd, **prepared})
+            exec(cleanup_source, {'__name__': 'baseline_queue_cleanup'})
+            golden = read_workbook('Cleaned_ISO_Queues.xlsx')
+        finally:
+            os.chdir(cwd)
+
+    for df in golden.values():
+        for col in SHORT_DATE_COLUMNS:
+            if col in df.columns and df[col].dtype == object:
+                df[col] = pd.to_datetime(df[col], format='%m/%d/%Y')
+    return golden
+
+def read_workbook(path):
+    """Every sheet of a workbook, read the same way for the golden and the new cleaned queues"""
+    return pd.read_excel(path, sheet_name=None)
+
+
+def load_recorded(fixture_dir=FIXTURE_DIR):
+    """Recorded formatted queues keyed by Balancing Authority Code"""
+    return {code: pd.read_pickle(os.path.join(fixture_dir, f"{code}.pkl")) for code in ISO_COLUMNS}
+
+def load_raw(fixture_dir=FIXTURE_DIR):
+    """Recorded raw PJM/SPP files keyed by Balancing Authority Code"""
+    raw = {}
+    for code, (file_name, _) in RAW_FIXTURES.items():
+        with open(os.path.join(fixture_dir, file_name), 'rb') as f:
+            raw[code] = f.read()
+    return raw
+
+
+# Synthetic queues
+
+STATES = ['NY', 'CA', 'TX', 'KS', 'OK', 'IL', 'IN', 'MI', 'MA', 'ME', 'PA', 'VA', 'NJ', 'OH', 'MD']
+TECHNOLOGIES = ['Solar', 'Wind', 'Battery Storage', 'Natural Gas', 'Solar; Battery Storage', 'Hydro', 'Nuclear', 'Offshore Wind']
+STATUSES = {
+    'NYISO': ['Active', 'Withdrawn', 'Completed'],
+    'CAISO': ['ACTIVE', 'WITHDRAWN', 'COMPLETED', 'Active', 'Withdrawn'],
+    'SPP': ['IA FULLY EXECUTED/COMMERCIAL OPERATION', 'IA FULLY EXECUTED/ON SCHEDULE', 'IA FULLY EXECUTED/ON SUSPENSION',
+            'IA PENDING', 'DISIS STAGE', 'WITHDRAWN', 'TERMINATED', None], # None: "None", which read_csv leaves blank
+    'ERCOT': ['Active', 'Withdrawn', 'Completed', 'Cancelled'],
+    'MISO': ['Active', 'Withdrawn', 'Done', 'Suspended', 'Canceled'],
+    'NEISO': ['Active', 'Withdrawn', 'Completed', 'In Service'],
+    'PJM': ['Active', 'Withdrawn', 'In Service', 'Suspended', 'Deactivated', 'Annulled', 'Retracted', 'Under Construction',
+            'Engineering and Procurement', 'Partially in Service - Under Construction'],
+}
+PROJECT_STATUSES = ['In Service', 'Under Construction', 'Not Started', 'Withdrawn']
+DATE_WORDS = ('date', 'signed', 'approved', 'requested', 'started', 'complete', 'updated', 'inservice', 'giatoexec', 'sisphase1',
+              'op date', 'sync')
+
+
+# Values for one generated column, chosen from the column name
+def _values(column, code, rows, rng):
+    name = column.lower()
+    blank = rng.random(rows) < 0.3
+
+    if column == 'S':
+        values = rng.integers(0, 16, rows).astype(float)
+        values[blank] = np.nan
+        return values
+    if name in ('status', 'status (original)'):
+        return rng.choice(np.array(STATUSES[code], dtype=object), rows)
+    if 'status' in name and ('project' in name or 'post generator' in name):
+        values = rng.choice(np.array(PROJECT_STATUSES, dtype=object), rows)
+    elif any(word in name for word in DATE_WORDS) and 'status' not in name:
+        dates = pd.Timestamp('2005-01-01') + pd.to_timedelta(rng.integers(0, 9000, rows), unit='D')
+        values = np.array(dates.strftime('%Y-%m-%d'), dtype=object)
+    elif 'mw' in name or 'capacity' in name:
+        values = np.round(rng.random(rows) * 500, 1).astype(object)
+    elif name == 'state':
+        values = rng.choice(np.array(STATES, dtype=object), rows)
+    elif name in ('generation type', 'fuel', 'technology', 'fuel-1', 'type-1', 'facilitytype'):
+        values = rng.choice(np.array(TECHNOLOGIES, dtype=object), rows)
+    elif 'study' in name or 'agreement' in name:
+        values = rng.choice(np.array(['Y', 'N', 'Complete', 'In Progress', 'Not Started'], dtype=object), rows)
+    else:
+        values = np.char.add(f"{column} ", rng.integers(0, 200, rows).astype(str)).astype(object)
+    values[blank] = None
+    return values
+
+
+def synthetic_queue(code, rows=None, seed=0):
+    """Generated formatted queue of an ISO with the columns of its real queue"""
+    rows = rows or SYNTHETIC_ROWS[code]
+    rng = np.random.default_rng(seed)
+    queue = pd.DataFrame({col: _values(col, code, rows, rng) for col in STANDARD_COLUMNS + ISO_COLUMNS[code]})
+    queue['Queue ID'] = [f"{code}-{i}" for i in range(rows)]
+    if code == 'SPP': # SPP's statuses as parse_spp_interconnection_queue() maps them
+        queue['Status'] = queue['Status (Original)'].map(SPP_STATUSES)
+    return queue
+
+
+def synthetic_pjm_xml(rows=None, seed=0):
+    """Generated PlanningQueues.xml with the fields parse_pjm_interconnection_queue() reads (and some transmission projects)"""
+    queue = synthetic_queue('PJM', rows, seed)
+    rng = np.random.default_rng(seed)
+    fields = {
+        'ProjectNumber': queue['Queue ID'], 'Name': queue['Project Name'], 'County': queue['County'], 'State': queue['State'],
+        'TransmissionOwner': queue['Transmission Owner'], 'SubmittedDate': queue['Queue Date'],
+        'WithdrawalDate': queue['Withdrawn Date'], 'WithdrawnRemarks': queue['Withdrawal Comment'], 'Status': queue['Status'],
+        'RevisedInServiceDate': queue['Proposed Completion Date'], 'ActualInServiceDate': queue['Actual Completion Date'],
+        'Fuel': queue['Generation Type'], 'MWCapacity': queue['Summer Capacity (MW)'], 'MWEnergy': queue['Winter Capacity (MW)'],
+        'MaximumFacilityOutput': queue['Capacity (MW)'],
+        'ProjectType': np.where(rng.random(len(queue)) < 0.9, 'Generation Interconnection', 'Transmission Interconnection'),
+    }
+    for col in ISO_COLUMNS['PJM']:
+        if col != 'Service Type':
+            fields[col.replace(' ', '')] = queue[col]
+
+    projects = []
+    for values in zip(*fields.values()):
+        tags = ''.join(f"<{tag}>{escape(str(value))}</{tag}>" for tag, value in zip(fields, values) if value is not None and value == value)
+        projects.append(f"<Project>{tags}</Project>")
+    return ('<?xml version="1.0" encoding="utf-8"?><PlanningQueues>' + ''.join(projects) + '</PlanningQueues>').encode('utf-8')
+
+
+def synthetic_spp_csv(rows=None, seed=0):
+    """Generated GenerateSummaryCSV file with the columns parse_spp_interconnection_queue() reads"""
+    queue = synthetic_queue('SPP', rows, seed)
+    rng = np.random.default_rng(seed)
+    csv = pd.DataFrame({
+        'Generation Interconnection Number': queue['Queue ID'], ' Nearest Town or County': queue['County'],
+        'State': queue['State'], 'TO at POI': queue['Transmission Owner'], 'Capacity': queue['Capacity (MW)'],
+        'MAX Summer MW': queue['Summer Capacity (MW)'], 'MAX Winter MW': queue['Winter Capacity (MW)'],
+        'Generation Type': queue['Generation Type'], 'Fuel Type': rng.choice(np.array(['Solar', 'Wind', None], dtype=object), len(queue)),
+        'Request Received': queue['Queue Date'], 'Substation or Line': queue['Interconnection Location'],
+        'Date Withdrawn': queue['Withdrawn Date'], 'Status': queue['Status (Original)'],
+        **{col: queue[col] for col in ISO_COLUMNS['SPP'] if col != 'Status (Original)'},
+    })
+    return b"Generation Interconnection Requests\n" + csv.to_csv(index=False).encode('utf-8')
+
+
+# Scaling
+
+def scale_queue(queue, factor):
+    """Repeat a queue's rows factor times, giving the copies their own Queue IDs"""
+    if factor == 1:
+        return queue
+    copies = []
+    for k in range(factor):
+        copy = queue.copy()
+        if k:
+            copy['Queue ID'] = copy['Queue ID'].astype(str) + f"-x{k}"
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def scale_raw(code, content, factor):
+    """Repeat the projects of a raw PJM/SPP file factor times"""
+    if factor == 1:
+        return content
+    if code == 'SPP':
+        title, table = content.split(b"\n", 1)
+        queue = pd.read_csv(io.BytesIO(table), dtype=str, keep_default_na=False)
+        queue = scale_queue(queue.rename(columns={'Generation Interconnection Number': 'Queue ID'}), factor)
+        table = queue.rename(columns={'Queue ID': 'Generation Interconnection Number'}).to_csv(index=False).encode('utf-8')
+        return title + b"\n" + table
+
+    # PJM: repeat the text of every project element (everything between the root element's tags)
+    start = re.search(rb'<[^?!][^>]*>', content).end()
+    end = content.rindex(b'</')
+    projects = content[start:end]
+    copies = [projects]
+    for k in range(1, factor):
+        copies.append(projects.replace(b'</ProjectNumber>', f"-x{k}</ProjectNumber>".encode('utf-8')))
+    return content[:start] + b''.join(copies) + content[end:]
+
+
+# Timing
+
+# Runs a call repeat times (its printing hidden) and returns the last result with the best seconds
+def _best(call, repeat):
+    best = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            result = call()
+            seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    return result, best
+
+
+# Queue with the columns main.py adds after fetching it
+def add_balancing_authority(queue, code):
+    queue = queue.copy()
+    queue['Balancing Authority Code'] = code
+    queue['Balancing Authority Name'] = code
+    queue['Latitude'] = None
+    queue['Longitude'] = None
+    return queue
+
+# Combined queue the way main.py builds it
+def combine(queues):
+    return pd.concat([add_balancing_authority(queue, code) for code, queue in queues.items()], ignore_index=True)
+
+
+def clean_partitions(queues):
+    """Combine, compact, split and clean queues like main.py does"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        combined, _ = compact_queue_frame(combine(queues))
+        partitions, _ = split_by_status(combined)
+        return {name: queue_cleanup(df) for name, df in partitions.items()}
+
+
+def run_benchmark(queues, raw=None, repeat=3):
+    """Time every stage on the given inputs
+
+    Args:
+        queues (dict): formatted queues keyed by Balancing Authority Code
+        raw (dict): raw PJM/SPP files to time the parsers on (skipped when None or gridstatus is not installed)
+        repeat (int): times each stage is run, the best time is kept
+
+    Returns:
+        tuple: (seconds per stage dict, rows per stage dict, cleaned partitions)
+    """
+    seconds = {}
+    rows = {}
+
+    parsers = {'PJM': parse_pjm_interconnection_queue, 'SPP': parse_spp_interconnection_queue}
+    for code, content in (raw or {}).items():
+        try:
+            queue, seconds[f"parse {code}"] = _best(lambda: parsers[code](content), repeat)
+        except ImportError as e:
+            print(f"Skipping the {code} parser ({e})")
+            continue
+        rows[f"parse {code}"] = len(queue)
+
+    combined, seconds['combine'] = _best(lambda: combine(queues), repeat)
+    rows['combine'] = len(combined)
+    (compacted, _), seconds['compact_queue_frame'] = _best(lambda: compact_queue_frame(combined), repeat)
+    (partitions, _), seconds['split_by_status'] = _best(lambda: split_by_status(compacted), repeat)
+    rows['split_by_status'] = len(compacted)
+
+    cleaned = {}
+    steps = {}
+    for name, df in partitions.items():
+        best = None
+        for _ in range(repeat):
+            STAGES.stages = []
+            with contextlib.redirect_stdout(io.StringIO()):
+                cleaned[name] = queue_cleanup(df)
+            run = {stage.name: stage.seconds for stage in STAGES.stages}
+            if best is None or run['queue_cleanup'] < best['queue_cleanup']:
+                best = run
+        seconds[f"queue_cleanup {name}"] = best.pop('queue_cleanup')
+        rows[f"queue_cleanup {name}"] = len(df)
+        for step, step_seconds in best.items():
+            steps[step] = steps.get(step, 0) + step_seconds
+    STAGES.stages = []
+
+    # Steps are summed over the partitions
+    for step, step_seconds in steps.items():
+        seconds[f"queue_cleanup {step}"] = round(step_seconds, 4)
+
+    return {name: round(value, 4) for name, value in seconds.items()}, rows, cleaned
+
+
+# Golden output and history
+
+def check_golden(cleaned, golden=None, workbook=GOLDEN_WORKBOOK):
+    """List how cleaned differs from the golden output
+
+    The sheets and columns must match the repo's cleaned workbook, and the values must match golden
+    (the cleaned workbook of BASELINE_COMMIT saved when the fixtures were recorded) when it is given.
+    cleaned is saved to a workbook and read back to compare it with golden cell by cell.
+    """
+    problems = []
+    if workbook and os.path.exists(workbook):
+        expected = pd.read_excel(workbook, sheet_name=None, nrows=0)
+        if list(expected) != list(cleaned):
+            problems.append(f"sheets {list(cleaned)} instead of {list(expected)}")
+        for name, df in expected.items():
+            if name in cleaned and list(df.columns) != list(cleaned[name].columns):
+                problems.append(f"{name}: columns differ from {workbook}")
+
+    if golden:
+        with tempfile.TemporaryDirectory() as directory:
+            saved = read_workbook(write_excel(cleaned, os.path.join(directory, 'cleaned'))[0])
+        for name, df in golden.items():
+            if name not in saved or not df.equals(saved[name]):
+                problems.append(f"{name}: cleaned rows differ from the recorded golden output")
+    return problems
+
+
+def load_history(path=HISTORY_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def save_result(result, path=HISTORY_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps(result) + "\n")
+
+
+def find_regressions(result, history, tolerance=REGRESSION_TOLERANCE, min_seconds=MIN_REGRESSION_SECONDS, window=HISTORY_WINDOW):
+    """Stages slower than the median of the previous runs on the same machine, inputs and scale
+
+    Returns:
+        list: (stage, median seconds before, seconds now) of every regression
+    """
+    same = [run for run in history
+            if (run['machine'], run['inputs'], run['scale']) == (result['machine'], result['inputs'], result['scale'])][-window:]
+    if not same:
+        return []
+
+    regressions = []
+    for stage, now in result['seconds'].items():
+        before = [run['seconds'][stage] for run in same if stage in run['seconds']]
+        if not before:
+            continue
+        baseline = float(np.median(before))
+        if now > baseline * (1 + tolerance) and now - baseline >= min_seconds:
+            regressions.append((stage, baseline, now))
+    return regressions
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ISO queue parsing, status split and cleanup")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('record', help="Save the inputs of the last main.py run as fixtures")
+    run = commands.add_parser('run', help="Time every stage")
+    run.add_argument('--synthetic', action='store_true', help="Use generated queues instead of the recorded fixtures")
+    run.add_argument('--scale', type=int, nargs='+', default=[1], help="Row multipliers to run at (e.g. 1 10 100)")
+    run.add_argument('--repeat', type=int, default=3, help="Times each stage is run, the best time is kept")
+    run.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE, help="Slowdown that counts as a regression")
+    run.add_argument('--no-save', action='store_true', help="Don't add the results to the history")
+    args = parser.parse_args(argv)
+
+    if args.command == 'record':
+        record()
+        return 0
+
+    if args.synthetic:
+        inputs = 'synthetic'
+        base_queues = {code: synthetic_queue(code) for code in ISO_COLUMNS}
+        base_raw = {'PJM': synthetic_pjm_xml(), 'SPP': synthetic_spp_csv()}
+        golden = None
+    else:
+        if not os.path.exists(os.path.join(FIXTURE_DIR, 'golden.pkl')):
+            print(f"No fixtures in {FIXTURE_DIR}, run main.py and then 'python benchmark.py record' (or use --synthetic)")
+            return 1
+        inputs = 'recorded'
+        base_queues = load_recorded()
+        base_raw = load_raw()
+        golden = pd.read_pickle(os.path.join(FIXTURE_DIR, 'golden.pkl'))
+
+    history = load_history()
+    failed = False
+    for scale in args.scale:
+        queues = {code: scale_queue(queue, scale) for code, queue in base_queues.items()}
+        raw = {code: scale_raw(code, content, scale) for code, content in base_raw.items()}
+        seconds, rows, cleaned = run_benchmark(queues, raw, args.repeat)
+
+        result = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': _commit(),
+            'machine': platform.node(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'inputs': inputs,
+            'scale': scale,
+            'seconds': seconds,
+            'rows': rows,
+        }
+
+        print(f"\n{inputs} inputs x{scale} ({rows['combine']} rows)")
+        for stage, value in seconds.items():
+            print(f"  {stage:<75} {value:>9.4f}s")
+
+        problems = check_golden(cleaned, golden if scale == 1 else None)
+        regressions = find_regressions(result, history, args.tolerance)
+        for problem in problems:
+            print(f"  OUTPUT CHANGED: {problem}")
+        for stage, before, now in regressions:
+            print(f"  REGRESSION: {stage} {before:.4f}s -> {now:.4f}s")
+        failed = failed or bool(problems or regressions)
+
+        if not args.no_save:
+            save_result(result)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+# Author: Selorm Kwami Dzakpasu
+
+import os
+import pickle
+import tempfile
+import numpy as np
+import pandas as pd
+from instrumentation import STAGES, peak_rss_mb
+from queue_cleanup import queue_cleanup
+from compaction import compact_queue_frame, restore_plain_dtypes
+from parallel_cleanup import first_date_rows
+from status_rules import print_unmatched, unmatched_statuses, count_unmatched
+from outputs import STREAM_WRITERS
+from geocode import COUNTY_GAZETTEER
+from iso_queues import ISO_COLUMNS
+
+# Chunked mode, for queues too big to combine and clean in memory at once (e.g. many historical snapshots)
+# The combined queue is never built:
+#   1. each ISO's queue is classified a chunk of rows at a time, and the rows are spilled to SPILL_DIR by partition and matched rule
+#   2. each partition is read back in the order split_by_status() puts it in, cleaned a chunk of rows at a time and appended to the output files
+# Memory stays at a few chunks of rows however long the queues are, and the cleaned queues come out the same as a normal run's
+# With compact=True every chunk is classified and spilled compacted (see "compaction.py") and restored when it is read back,
+# like a normal run compacts the combined queue and queue_cleanup() restores each partition
+
+# Folder the classified rows are spilled to (deleted when the run is done)
+SPILL_DIR = os.path.join('.cache', 'chunks')
+
+
+# Columns (and their types) of the combined queue pd.concat would build, without building it
+# Columns of ISOs that are missing (or that an ISO dropped) are added like split_queues() adds them
+def _combined_layout(queues):
+    head = pd.concat([queue.iloc[:1] for queue in queues.values()], ignore_index=True)
+    missing = []
+    for columns in ISO_COLUMNS.values():
+        missing += [col for col in columns if col not in head.columns and col not in missing]
+    return list(head.columns) + missing, head.dtypes.to_dict(), missing
+
+# Rows of a queue in chunks with the combined queue's columns and column types
+def _batches(queue, layout, chunk_rows):
+    columns, dtypes, missing = layout
+    for start in range(0, len(queue), chunk_rows):
+        batch = queue.iloc[start:start + chunk_rows].reindex(columns=columns).astype(dtypes)
+        batch[missing] = None
+        yield batch
+
+
+# Appends a DataFrame to a spill file (a spill file is a series of pickled DataFrames)
+def _spill(path, df):
+    with open(path, 'ab') as f:
+        pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+def _read_spilled(paths):
+    for path in paths:
+        with open(path, 'rb') as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    break
+
+# Regroups DataFrames into chunks of chunk_rows rows (the last one can be shorter)
+def _rechunk(frames, chunk_rows):
+    buffered, rows = [], 0
+    for df in frames:
+        while len(df):
+            take = df.iloc[:chunk_rows - rows]
+            buffered.append(take)
+            rows += len(take)
+            df = df.iloc[len(take):]
+            if rows == chunk_rows:
+                yield pd.concat(buffered) if len(buffered) > 1 else buffered[0]
+                buffered, rows = [], 0
+    if buffered:
+        yield pd.concat(buffered) if len(buffered) > 1 else buffered[0]
+
+
+# Spills every ISO's rows by partition and matched rule
+# Returns {partition code: spill files in the order split_by_status() puts their rows in} and the rows no rule matched
+def _classify(queues, classify, layout, chunk_rows, spill_dir, compact):
+    files = {}
+    unmatched = []
+    for queue in queues.values():
+        for batch in _batches(queue, layout, chunk_rows):
+            if compact:
+                batch, _ = compact_queue_frame(batch, verbose=False)
+            labels, rule_numbers = classify(batch)
+            codes = labels.cat.codes.to_numpy()
+            spill_rules = np.where(labels == classify.default, -1, rule_numbers) # The default partition keeps its rows in order
+            for code, rule in np.unique(np.stack([codes, spill_rules], axis=1), axis=0):
+                path = os.path.join(spill_dir, f"{code}_{rule + 1}.pkl")
+                _spill(path, batch.iloc[np.flatnonzero((codes == code) & (spill_rules == rule))])
+                files.setdefault(int(code), {})[int(rule)] = path
+            if (rule_numbers < 0).any():
+                unmatched.append(unmatched_statuses(batch, rule_numbers))
+
+    # Same counts split_by_status() gives
+    unmatched = count_unmatched(unmatched)
+    return {code: [rules[rule] for rule in sorted(rules)] for code, rules in files.items()}, unmatched
+
+
+# Cleans a partition a chunk at a time
+# Every chunk is cleaned together with the rows the whole partition's date formats are guessed from (see parallel_cleanup.py),
+# labelled with negative numbers and dropped again, so every chunk is cleaned exactly like the whole partition would be
+def _clean_partition(chunks, empty, cleanup):
+    anchors = {} # {date column: (row position in the partition, row)}
+    offset = 0
+    for chunk in chunks:
+        chunk = chunk.set_axis(pd.RangeIndex(offset, offset + len(chunk)))
+        if anchors:
+            rows = sorted(anchors.values(), key=lambda anchor: anchor[0])
+            prefix = pd.concat([row for _, row in rows])
+            cleaned = cleanup(pd.concat([prefix.set_axis(np.arange(-len(prefix), 0)), chunk]))
+            cleaned = cleaned[cleaned.index >= 0]
+        else:
+            cleaned = cleanup(chunk)
+
+        # The first date of a column in the first chunk that has one is the first date of the whole partition
+        for target, position in first_date_rows(chunk).items():
+            if target not in anchors and position is not None:
+                anchors[target] = (offset + position, chunk.iloc[[position]])
+        offset += len(chunk)
+        yield cleaned
+
+    if not offset: # Cleaned like split_by_status() leaves an empty partition, so the output still has its columns
+        yield cleanup(empty)
+
+
+@STAGES.timed('chunked_pipeline')
+def run_chunked(queues, classify, outputs=('excel',), chunk_rows=50000, name='Cleaned_ISO_Queues', directory='.',
+                geocoder=None, cleanup=queue_cleanup, compact=True):
+    """Split, clean and save the ISO queues a chunk of rows at a time
+
+    Gives the same cleaned queues as split_queues(), queue_cleanup() and write_outputs() on the whole combined queue,
+    with or without compaction.
+
+    Args:
+        queues (dict): ISO queues keyed by Balancing Authority Code, in the order they are combined in
+        classify (function): compiled status rules from compile_status_rules()
+        outputs (list): Keys of STREAM_WRITERS
+        chunk_rows (int): Rows classified, cleaned and written at a time
+        name (str): Base file name
+        directory (str): Folder to write to
+        geocoder (Geocoder): Fills in Latitude/Longitude of every cleaned chunk (None to skip it)
+        cleanup (function): Cleanup applied to every chunk
+        compact (bool): Classify and spill the chunks with compact column types (COMPACT_COMBINED_QUEUES in "main.py")
+
+    Returns:
+        dict: "paths" written, "rows" per partition, "unmatched" rows (see split_by_status()) and "geocoding" stats
+    """
+    unknown = [fmt for fmt in outputs if fmt not in STREAM_WRITERS]
+    if unknown:
+        raise ValueError(f"Output format(s) {unknown} can't be written a chunk at a time, expected any of {list(STREAM_WRITERS)}")
+    if geocoder and not geocoder.load():
+        print(f"Geocoding skipped, no county gazetteer ({COUNTY_GAZETTEER}) in {geocoder.gazetteer_dir}")
+        geocoder = None
+
+    layout = _combined_layout(queues)
+    empty = pd.DataFrame(columns=layout[0]).astype(layout[1])
+    os.makedirs(SPILL_DIR, exist_ok=True)
+    os.makedirs(directory, exist_ok=True)
+    base_path = os.path.join(directory, name)
+
+    rows = {}
+    geocoding = {}
+    with tempfile.TemporaryDirectory(dir=SPILL_DIR) as spill_dir:
+        with STAGES.stage('chunked classify') as stage:
+            files, unmatched = _classify(queues, classify, layout, chunk_rows, spill_dir, compact)
+            stage.details = {'spilled_mb': round(sum(os.path.getsize(path) for paths in files.values() for path in paths) / 2**20, 1)}
+        print_unmatched(unmatched, classify.default)
+
+        streams = [STREAM_WRITERS[fmt](base_path, classify.partitions) for fmt in outputs]
+        with STAGES.stage('chunked cleanup and write') as stage:
+            for code, partition in enumerate(classify.partitions):
+                rows[partition] = 0
+                spilled = _read_spilled(files.get(code, []))
+                if compact: # Chunks compacted apart can have different categories, so they are restored before being put together
+                    spilled = (restore_plain_dtypes(df) for df in spilled)
+                chunks = _rechunk(spilled, chunk_rows)
+                for cleaned in _clean_partition(chunks, empty, cleanup):
+                    if geocoder:
+                        cleaned, stats = geocoder.geocode(cleaned)
+                        for key, value in stats.items():
+                            geocoding[key] = geocoding.get(key, 0) + value
+                    for stream in streams:
+                        stream.append(partition, cleaned)
+                    rows[partition] += len(cleaned)
+            for stream in streams:
+                stream.close()
+            stage.rows_out = sum(rows.values())
+            stage.details = {'chunk_rows': chunk_rows, 'compact': compact, 'rows': rows, 'geocoding': geocoding or None}
+
+    if geocoder:
+        geocoder.save()
+        print(f"Geocoding: {geocoding.get('location', 0)} rows by Interconnection Location, {geocoding.get('county', 0)} by county, "
+              f"{geocoding.get('missed', 0)} not found")
+    print(f"Chunked run: {', '.join(f'{partition} {count}' for partition, count in rows.items())} rows "
+          f"in chunks of {chunk_rows} (peak memory {peak_rss_mb()} MB)")
+    return {'paths': [path for stream in streams for path in stream.paths], 'rows': rows, 'unmatched': unmatched,
+            'geocoding': geocoding or None}
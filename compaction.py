@@ -0,0 +1,95 @@
+# Author: Selorm Kwami Dzakpasu
+
+import pandas as pd
+from instrumentation import STAGES
+
+# Capacity columns stored as nullable numbers (Int64 when every value is a whole number, Float64 otherwise)
+# Only text columns holding nothing but numbers of one kind are converted, so restore_plain_dtypes() gives back the same values
+CAPACITY_COLUMNS = [
+    'Capacity (MW)', 'Summer Capacity (MW)', 'Winter Capacity (MW)', 'MW-1', 'MW-2', 'MW-3',
+    'dp1ErisMw', 'dp1NrisMw', 'dp2ErisMw', 'dp2NrisMw', 'MW In Service',
+]
+
+# Text columns with at most this share of distinct values become categoricals
+# This catches the repeated labels (Status, State, Balancing Authority Code/Name, Technology, ...) and the
+# ISO specific columns that are empty for every other ISO, which then take 1 byte per row instead of 8
+MAX_CATEGORY_RATIO = 0.5
+
+
+# Whole frame memory use in bytes, per column
+def _memory(df):
+    return df.memory_usage(deep=True, index=False)
+
+# Kind of values in a text column ("string", "floating", "integer", "empty", "mixed", ...)
+def _value_kind(values):
+    return pd.api.types.infer_dtype(values.dropna(), skipna=False)
+
+# The one value a column uses for its blanks (None, NaN, ...), or False when it mixes several
+# queue_cleanup() doesn't treat them all alike (str() of a blank, infer_objects() on a column of blanks), so they have to come back as they were
+def _blank_value(values):
+    blanks = pd.unique(values[values.isna()].to_numpy())
+    if not len(blanks):
+        return None
+    return blanks[0] if len(blanks) == 1 else False
+
+
+@STAGES.timed('compact_queue_frame')
+def compact_queue_frame(df, verbose=True):
+    """Store the combined queue with compact column types
+
+    Args:
+        df (pandas.DataFrame): combined queue
+        verbose (bool): print the memory saved
+
+    Returns:
+        tuple: (compacted DataFrame, report DataFrame with the type and memory before/after of every column)
+    """
+    before = _memory(df)
+    before_types = df.dtypes.astype(str)
+    df = df.copy()
+    blanks = {} # {converted column: its blank value}, kept in df.attrs for restore_plain_dtypes()
+
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        blank = _blank_value(df[col])
+        if blank is False:
+            continue
+        kind = _value_kind(df[col])
+        if col in CAPACITY_COLUMNS and kind in ('integer', 'floating'):
+            df[col] = df[col].astype('Int64' if kind == 'integer' else 'Float64')
+        elif kind in ('string', 'empty') and df[col].nunique() <= MAX_CATEGORY_RATIO * len(df):
+            df[col] = df[col].astype('category')
+        else:
+            continue
+        blanks[col] = blank
+    df.attrs['blank_values'] = blanks
+
+    after = _memory(df)
+    report = pd.DataFrame({
+        'Type (Before)': before_types,
+        'Type (After)': df.dtypes.astype(str),
+        'Memory (Before)': before,
+        'Memory (After)': after,
+    })
+
+    if verbose:
+        print(f"Combined queue memory: {before.sum() / 1e6:.1f} MB -> {after.sum() / 1e6:.1f} MB "
+              f"({1 - after.sum() / max(before.sum(), 1):.0%} saved)")
+
+    return df, report
+
+
+# Undoes the categorical and nullable number types of compact_queue_frame so the cleanup steps see the columns as they were published
+# Blanks get back the value they had (kept in df.attrs, which pandas carries over to slices like the status partitions)
+def restore_plain_dtypes(df):
+    blanks = df.attrs.get('blank_values', {})
+    columns = {}
+    for col, dtype in df.dtypes.items():
+        if isinstance(dtype, (pd.CategoricalDtype, pd.Int64Dtype, pd.Float64Dtype)):
+            values = df[col].astype(object)
+            columns[col] = values.where(values.notna(), blanks.get(col))
+        else:
+            columns[col] = df[col]
+    # Building a new frame (rather than converting column by column) always copies and keeps the columns in a few blocks
+    return pd.DataFrame(columns, index=df.index)
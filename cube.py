@@ -0,0 +1,153 @@
+# Author: Selorm Kwami Dzakpasu
+
+import argparse
+import itertools
+import os
+import sys
+import pandas as pd
+from instrumentation import STAGES
+
+# Precomputed MW and project counts of the cleaned queues for every combination of CUBE_DIMENSIONS,
+# so summaries (e.g. MW of Active solar by state) don't need the cleaned workbook reloaded and pivoted
+#
+# From another script:
+#     from cube import query_cube
+#     query_cube(['State', 'Technology'], where={'Partition': 'Active', 'Planned Operation Year': [2026, 2027]})
+# Or from the command line:
+#     python cube.py State Technology --where Partition=Active "Planned Operation Year=2026,2027"
+
+# Columns the queues can be summarized by ("Partition" is Active/Withdrawn/Completed)
+CUBE_DIMENSIONS = ['Partition', 'Technology', 'State', 'Balancing Authority Code', 'Planned Operation Year']
+
+# Saved next to the cleaned queues, rebuilt only when the cleaned queues change
+CUBE_PATH = 'Cleaned_ISO_Queues_Cube.pkl'
+
+# Bump this whenever the cube's layout changes so cubes saved by older code are rebuilt
+CUBE_VERSION = 1
+
+
+# The dimension and measure columns of every partition in one DataFrame
+def _facts(partitions):
+    frames = []
+    for name, df in partitions.items():
+        frames.append(pd.DataFrame({
+            'Partition': name,
+            **{col: df[col].to_numpy() for col in CUBE_DIMENSIONS[1:]},
+            'Capacity (MW)': pd.to_numeric(df['Capacity (MW)'], errors='coerce').to_numpy(),
+        }))
+    facts = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=CUBE_DIMENSIONS + ['Capacity (MW)'])
+    facts['Planned Operation Year'] = pd.to_numeric(facts['Planned Operation Year'], errors='coerce').astype('Int64')
+    return facts
+
+# Fingerprint of the cube's inputs, the cube is rebuilt when it changes
+def _signature(facts):
+    return f"v{CUBE_VERSION}-{len(facts)}-{pd.util.hash_pandas_object(facts, index=False).sum()}"
+
+
+def build_cube(partitions):
+    """Precompute MW and project counts for every combination of CUBE_DIMENSIONS
+
+    Args:
+        partitions (dict): cleaned DataFrames keyed by status partition
+
+    Returns:
+        dict: "signature" of the inputs and "cuboids", {dimension tuple (in CUBE_DIMENSIONS order): DataFrame}
+    """
+    facts = _facts(partitions)
+
+    # The finest level is grouped from the rows, every other level from the finest (a few thousand rows)
+    base = facts.groupby(CUBE_DIMENSIONS, dropna=False, observed=True).agg(
+        **{'Capacity (MW)': ('Capacity (MW)', 'sum'), 'Projects': ('Capacity (MW)', 'size')}).reset_index()
+    cuboids = {}
+    for size in range(len(CUBE_DIMENSIONS) + 1):
+        for dims in itertools.combinations(CUBE_DIMENSIONS, size):
+            cuboids[dims] = _rollup(base, list(dims))
+    return {'signature': _signature(facts), 'cuboids': cuboids}
+
+def _rollup(cuboid, dims):
+    if not dims:
+        return pd.DataFrame({'Capacity (MW)': [cuboid['Capacity (MW)'].sum()], 'Projects': [cuboid['Projects'].sum()]})
+    return cuboid.groupby(dims, dropna=False, observed=True)[['Capacity (MW)', 'Projects']].sum().reset_index()
+
+
+def load_cube(path=CUBE_PATH):
+    if not os.path.exists(path):
+        return None
+    return pd.read_pickle(path)
+
+@STAGES.timed('update_cube')
+def update_cube(partitions, path=CUBE_PATH):
+    """Rebuild and save the cube if the cleaned queues changed since it was saved
+
+    Returns:
+        dict: the cube (see build_cube)
+    """
+    cube = load_cube(path)
+    if cube is not None and cube['signature'] == _signature(_facts(partitions)):
+        return cube
+
+    cube = build_cube(partitions)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pd.to_pickle(cube, tmp_path)
+    os.replace(tmp_path, path)
+    return cube
+
+
+def query_cube(by=(), where=None, cube=None, path=CUBE_PATH):
+    """MW and project counts from the cube
+
+    Args:
+        by (list): Dimensions to group by, any of CUBE_DIMENSIONS (none for the grand total)
+        where (dict): {dimension: value or list of values} to keep
+        cube (dict): Cube to query. Defaults to the one saved at path.
+        path (str): Saved cube
+
+    Returns:
+        DataFrame: the "by" columns, "Capacity (MW)" and "Projects", largest capacity first
+    """
+    by = list(by)
+    where = where or {}
+    unknown = [dim for dim in by + list(where) if dim not in CUBE_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown dimension(s) {unknown}, expected any of {CUBE_DIMENSIONS}")
+
+    cube = cube or load_cube(path)
+    if cube is None:
+        raise RuntimeError(f"No cube at {path}, run main.py first")
+
+    # The precomputed level with every dimension grouped by or filtered on
+    dims = tuple(dim for dim in CUBE_DIMENSIONS if dim in by or dim in where)
+    result = cube['cuboids'][dims]
+    for dim, values in where.items():
+        values = values if isinstance(values, (list, tuple, set)) else [values]
+        result = result[result[dim].isin(values)]
+
+    result = _rollup(result, by) if len(by) < len(dims) else result[by + ['Capacity (MW)', 'Projects']] # Cuboid columns are in CUBE_DIMENSIONS order
+    return result.sort_values('Capacity (MW)', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MW and project counts of the cleaned queues")
+    # Not choices=CUBE_DIMENSIONS, argparse checks an empty list against the choices too (see query_cube() for the check)
+    parser.add_argument('by', nargs='*', help=f"Dimensions to group by, any of {CUBE_DIMENSIONS} (none for the grand total)")
+    parser.add_argument('--where', nargs='+', default=[], metavar='DIMENSION=VALUES', help="Keep only these values (comma separated)")
+    parser.add_argument('--cube', default=CUBE_PATH, help="Saved cube")
+    args = parser.parse_args(argv)
+
+    where = {}
+    for condition in args.where:
+        dim, _, values = condition.partition('=')
+        values = values.split(',')
+        where[dim] = [int(value) for value in values] if dim == 'Planned Operation Year' else values
+
+    try:
+        result = query_cube(args.by, where, path=args.cube)
+    except (ValueError, RuntimeError) as e:
+        parser.error(str(e))
+    with pd.option_context('display.max_rows', None, 'display.width', None):
+        print(result.to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+# Author: Selorm Kwami Dzakpasu
+
+import re
+import numpy as np
+import pandas as pd
+from instrumentation import STAGES
+from geocode import state_code, county_key, location_key, COUNTY_SEPARATORS
+
+# Finds projects listed more than once in the cleaned queues, either by two ISOs (e.g. on the PJM/MISO seam)
+# or as the components of a hybrid project (e.g. solar and storage at the same point of interconnection on the same day)
+#
+# Comparing every pair of 30k projects would take hours, so projects are only compared within blocks:
+#   capacity: same State, County and Interconnection Location, and capacities in the same or a neighbouring CAPACITY_BUCKET_RATIO bucket
+#   hybrid:   same ISO, State, Interconnection Location and Queue Date
+# Nothing is removed from the cleaned queues, the linked projects are saved to "Linked_Projects" for review
+
+# Capacities are bucketed on a log scale, two projects within this ratio of each other are always in the same or neighbouring buckets
+CAPACITY_BUCKET_RATIO = 1.25
+
+# Weights of the duplicate score (0 to 1) and the score a pair needs to be linked
+SCORE_WEIGHTS = {'name': 0.4, 'capacity': 0.3, 'location': 0.2, 'queue_date': 0.1}
+DUPLICATE_SCORE = 0.75 # Projects at the same location with the same capacity and date still need similar names
+
+# Name similarity hybrid components need (e.g. "NY37 Solar" and "NY37 Energy Storage"), cluster ISOs give whole clusters the same queue date
+HYBRID_NAME_SIMILARITY = 0.5
+
+# Queue dates within this many days count as the same request
+QUEUE_DATE_DAYS = 365
+
+# Words that say nothing about which project it is (most names end in their technology)
+NAME_STOPWORDS = {
+    'PROJECT', 'LLC', 'INC', 'CENTER', 'FACILITY', 'THE', 'OF', 'AND', 'MW', 'KV', 'ENERGY', 'POWER', 'GENERATING', 'STATION',
+    'SOLAR', 'PV', 'WIND', 'OFFSHORE', 'FARM', 'STORAGE', 'BATTERY', 'BESS', 'GAS', 'HYBRID',
+}
+
+
+# Set of words of a project name, for the name similarity
+def _name_tokens(value):
+    if value is None or pd.isna(value):
+        return frozenset()
+    words = re.sub(r'[^A-Z0-9 ]', ' ', str(value).upper()).split()
+    return frozenset(word for word in words if word not in NAME_STOPWORDS and not word.isdigit())
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+# One row per project with the normalized blocking and scoring columns
+def _projects(partitions):
+    frames = []
+    for name, df in partitions.items():
+        frames.append(pd.DataFrame({
+            'Partition': name,
+            'Balancing Authority Code': df['Balancing Authority Code'].astype(str).to_numpy(),
+            'Queue ID': df['Queue ID'].to_numpy(),
+            'Project Name': df['Project Name'].to_numpy(),
+            'State': df['State'].to_numpy(),
+            'County': df['County'].to_numpy(),
+            'Interconnection Location': df['Interconnection Location'].to_numpy(),
+            'Capacity (MW)': pd.to_numeric(df['Capacity (MW)'], errors='coerce').to_numpy(),
+            'Technology': df['Technology'].to_numpy(),
+            'Queue Date': pd.to_datetime(df['Queue Date'], errors='coerce').to_numpy(),
+        }))
+    projects = pd.concat(frames, ignore_index=True)
+
+    # Normalized once per distinct value, the same labels repeat across thousands of rows
+    for col, normalize in (('State', state_code), ('Interconnection Location', location_key), ('Technology', lambda value: str(value).strip().upper())):
+        codes, uniques = pd.factorize(projects[col].astype(object).where(projects[col].notna(), ''))
+        projects[f"_{col}"] = np.array([normalize(value) for value in uniques], dtype=object)[codes] if len(uniques) else ''
+    codes, uniques = pd.factorize(projects['County'].astype(object).where(projects['County'].notna(), ''))
+    first_county = [county_key(COUNTY_SEPARATORS.split(str(value).upper())[0]) for value in uniques]
+    projects['_County'] = np.array(first_county, dtype=object)[codes] if len(uniques) else ''
+
+    capacity = projects['Capacity (MW)']
+    projects['_bucket'] = np.floor(np.log(capacity.where(capacity > 0)) / np.log(CAPACITY_BUCKET_RATIO)).fillna(-1).astype(int)
+    return projects
+
+
+# Pairs of row numbers of projects sharing a block (each pair once, lower row number first)
+def _block_pairs(projects, keys, usable, neighbour_column=None):
+    rows = projects.loc[usable, keys].copy()
+    rows['_row'] = rows.index
+    if neighbour_column is None:
+        other = rows
+    else:
+        # Also match the next bucket up so projects on either side of a bucket boundary meet
+        other = pd.concat([rows, rows.assign(**{neighbour_column: rows[neighbour_column] - 1})])
+    pairs = rows.merge(other, on=keys, suffixes=('_a', '_b'))[['_row_a', '_row_b']].to_numpy()
+    pairs = np.sort(pairs, axis=1)
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    return np.unique(pairs, axis=0) if len(pairs) else pairs.reshape(0, 2)
+
+
+# Connected groups of linked row numbers (union-find)
+def _groups(pairs):
+    parent = {}
+
+    def find(row):
+        parent.setdefault(row, row)
+        while parent[row] != row:
+            parent[row] = parent[parent[row]]
+            row = parent[row]
+        return row
+
+    for a, b in pairs:
+        parent[find(a)] = find(b)
+    return {row: find(row) for row in parent}
+
+
+@STAGES.timed('find_linked_projects')
+def find_linked_projects(partitions):
+    """Find duplicate and hybrid projects across the cleaned queues
+
+    Args:
+        partitions (dict): cleaned DataFrames keyed by status partition
+
+    Returns:
+        tuple: (groups DataFrame with one row per linked project and its "Group" number,
+                pairs DataFrame with every linked pair, its "Link" ("Cross-ISO", "Duplicate" or "Hybrid") and "Score")
+    """
+    projects = _projects(partitions)
+    located = projects['_State'].ne('') & (projects['_County'].ne('') | projects['_Interconnection Location'].ne(''))
+
+    capacity_pairs = _block_pairs(projects, ['_State', '_County', '_Interconnection Location', '_bucket'],
+                                  located & projects['_bucket'].ge(0), neighbour_column='_bucket')
+    hybrid_pairs = _block_pairs(projects, ['Balancing Authority Code', '_State', '_Interconnection Location', 'Queue Date'],
+                                located & projects['_Interconnection Location'].ne('') & projects['Queue Date'].notna())
+    candidates = np.unique(np.concatenate([capacity_pairs, hybrid_pairs]), axis=0)
+
+    a = projects.iloc[candidates[:, 0]].reset_index(drop=True)
+    b = projects.iloc[candidates[:, 1]].reset_index(drop=True)
+
+    same_location = (a['_Interconnection Location'] == b['_Interconnection Location']) & a['_Interconnection Location'].ne('')
+    same_iso = a['Balancing Authority Code'] == b['Balancing Authority Code']
+    capacity = (1 - (a['Capacity (MW)'] - b['Capacity (MW)']).abs() / np.maximum(a['Capacity (MW)'], b['Capacity (MW)'])).clip(lower=0).fillna(0)
+    queue_date = ((a['Queue Date'] - b['Queue Date']).abs() <= pd.Timedelta(days=QUEUE_DATE_DAYS)).fillna(False)
+    tokens = {}
+    name = pd.Series([_jaccard(tokens.setdefault(x, _name_tokens(x)), tokens.setdefault(y, _name_tokens(y)))
+                      for x, y in zip(a['Project Name'], b['Project Name'])], dtype=float)
+
+    score = (SCORE_WEIGHTS['name'] * name + SCORE_WEIGHTS['capacity'] * capacity
+             + SCORE_WEIGHTS['location'] * same_location + SCORE_WEIGHTS['queue_date'] * queue_date)
+
+    # Components of a hybrid share the ISO, point of interconnection, queue date and name but not the technology
+    hybrid = (same_iso & same_location & (a['Queue Date'] == b['Queue Date']) & (name >= HYBRID_NAME_SIMILARITY)
+              & a['_Technology'].ne('') & b['_Technology'].ne('') & (a['_Technology'] != b['_Technology']))
+    link = np.where(hybrid, 'Hybrid', np.where(same_iso, 'Duplicate', 'Cross-ISO'))
+    linked = (hybrid | (score >= DUPLICATE_SCORE)).to_numpy()
+
+    pairs = pd.DataFrame({
+        'Link': link,
+        'Score': score.round(3),
+        'Partition A': a['Partition'], 'Balancing Authority Code A': a['Balancing Authority Code'], 'Queue ID A': a['Queue ID'], 'Project Name A': a['Project Name'],
+        'Partition B': b['Partition'], 'Balancing Authority Code B': b['Balancing Authority Code'], 'Queue ID B': b['Queue ID'], 'Project Name B': b['Project Name'],
+    })[linked].reset_index(drop=True)
+
+    roots = _groups(candidates[linked])
+    rows = np.array(sorted(roots), dtype=int)
+    group_numbers = pd.Series([roots[row] for row in rows]).factorize()[0] + 1
+    groups = projects.iloc[rows][['Partition', 'Balancing Authority Code', 'Queue ID', 'Project Name', 'State', 'County',
+                                  'Interconnection Location', 'Capacity (MW)', 'Technology', 'Queue Date']]
+    groups.insert(0, 'Group', group_numbers)
+    groups = groups.sort_values(['Group', 'Balancing Authority Code'], kind='stable').reset_index(drop=True)
+
+    print(f"Linked projects: {len(candidates)} candidate pairs compared, {len(pairs)} linked "
+          f"({(pairs['Link'] == 'Cross-ISO').sum()} cross-ISO, {(pairs['Link'] == 'Duplicate').sum()} duplicate, "
+          f"{(pairs['Link'] == 'Hybrid').sum()} hybrid) in {groups['Group'].nunique()} groups")
+    return groups, pairs
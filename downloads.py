@@ -0,0 +1,274 @@
+# Author: Selorm Kwami Dzakpasu
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+# Folder the raw ISO files are cached in
+CACHE_DIR = os.path.join('.cache', 'http')
+
+# Seconds a cached file is used without checking back with the ISO's server
+DEFAULT_TTL = 60 * 60
+
+# Cached files not used for this many seconds are deleted
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60
+
+# Cache size limit in bytes, the least recently used files are deleted first
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+
+# Number of retries after a failed download, and the base/maximum seconds to wait between attempts (doubles each retry, with jitter)
+DEFAULT_RETRIES = 4
+DEFAULT_BACKOFF = 2
+MAX_BACKOFF = 60
+
+# Seconds to wait for the connection and for each read from the server
+DEFAULT_TIMEOUT = (15, 300)
+
+# Seconds a retry needs at least, no retry is started closer than this to a download's deadline
+MIN_ATTEMPT_SECONDS = 5
+
+# Responses worth another try (rate limited or a temporary server error)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Downloads are written to disk in chunks of this many bytes instead of being held in memory
+CHUNK_SIZE = 1024 * 1024
+
+
+# Session with a connection pool so connections to the same ISO are kept alive and reused
+def make_session(pool_size=10):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+# Shared by every download
+SESSION = make_session()
+
+
+# Response from HTTPCache.get
+# changed is False when the content is the same file we already had (still fresh, or the server answered 304 Not Modified)
+# sha256 is the hex digest of the content
+# attempts has the outcome and seconds taken of every request made (empty when the cache was still fresh)
+class CachedResponse:
+    def __init__(self, url, content, sha256, from_cache, changed, attempts=None):
+        self.url = url
+        self.content = content
+        self.sha256 = sha256
+        self.from_cache = from_cache
+        self.changed = changed
+        self.attempts = attempts or []
+
+
+# On-disk cache of raw responses keyed by URL, revalidated with ETag/Last-Modified
+class HTTPCache:
+    def __init__(self, directory=CACHE_DIR, ttl=DEFAULT_TTL, max_age=DEFAULT_MAX_AGE, max_bytes=DEFAULT_MAX_BYTES,
+                 retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, timeout=DEFAULT_TIMEOUT, session=None):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = session or SESSION
+        self._lock = threading.Lock()
+
+    # Paths of the cached body and its metadata for a URL
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, key)
+        return base + '.body', base + '.json'
+
+    def _load_meta(self, url):
+        body_path, meta_path = self._paths(url)
+        if not (os.path.exists(body_path) and os.path.exists(meta_path)):
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def _save_meta(self, url, meta):
+        _, meta_path = self._paths(url)
+        _write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+
+    def _read_body(self, url):
+        body_path, _ = self._paths(url)
+        with open(body_path, 'rb') as f:
+            return f.read()
+
+    def get(self, url, refresh=False, deadline=None, **kwargs):
+        """Get a URL through the cache
+
+        Args:
+            url (str): URL to fetch
+            refresh (bool): Check with the server even if the cached file is still fresh
+            deadline (float): time.monotonic() by which the download has to be done. Every request's timeouts are cut to the
+                time left, no retry is started that can't finish in time, and a download still running at the deadline is given up.
+            **kwargs: Passed on to Session.get (e.g. timeout to override the cache's)
+
+        Returns:
+            CachedResponse: the response body and whether it changed since the last fetch
+        """
+        body_path, _ = self._paths(url)
+        meta = self._load_meta(url)
+        now = time.time()
+
+        # Still fresh, don't ask the server at all
+        if meta is not None and not refresh and now - meta['fetched'] < self.ttl:
+            meta['used'] = now
+            self._save_meta(url, meta)
+            return CachedResponse(url, self._read_body(url), meta['sha256'], from_cache=True, changed=False)
+
+        # Ask the server to only send the file if it changed
+        headers = dict(kwargs.pop('headers', None) or {})
+        if meta is not None:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{body_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            response, digest, size, attempts = self._download(url, headers, tmp_path, deadline, **kwargs)
+
+            if response.status_code == 304 and meta is not None:
+                meta['fetched'] = meta['used'] = now
+                self._save_meta(url, meta)
+                return CachedResponse(url, self._read_body(url), meta['sha256'], from_cache=True, changed=False, attempts=attempts)
+
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {url} failed: {response}")
+
+            os.replace(tmp_path, body_path)
+        finally:
+            _remove(tmp_path)
+
+        # Some servers don't support conditional requests, so compare the content as well
+        changed = meta is None or meta.get('sha256') != digest
+
+        self._save_meta(url, {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'sha256': digest,
+            'size': size,
+            'fetched': now,
+            'used': now,
+        })
+
+        content = self._read_body(url) # Before evicting, which can delete the file just downloaded (when it alone is over max_bytes)
+        self.evict()
+        return CachedResponse(url, content, digest, from_cache=False, changed=changed, attempts=attempts)
+
+    # Requests the URL, retrying connection errors, timeouts and RETRY_STATUSES with exponential backoff and jitter
+    # A 200 response body is streamed into tmp_path while it is hashed
+    # With a deadline, the last response (or error) is given up on as soon as there is no time left for another attempt
+    # Returns the last response, the body's digest and size (None for other statuses) and every attempt's outcome and latency
+    def _download(self, url, headers, tmp_path, deadline=None, **kwargs):
+        timeout = kwargs.pop('timeout', self.timeout)
+        attempts = []
+
+        for attempt in range(self.retries + 1):
+            started = time.monotonic()
+            retry_after = None
+            error = None
+            if deadline is not None and started >= deadline:
+                raise TimeoutError(f"GET {url} did not finish before its deadline ({len(attempts)} attempts)")
+            try:
+                with self.session.get(url, headers=headers, stream=True, timeout=_cut_timeout(timeout, deadline), **kwargs) as response:
+                    if response.status_code == 200:
+                        digest, size = _stream_to_file(response, tmp_path, deadline)
+                    else:
+                        digest, size = None, None
+                        retry_after = response.headers.get('Retry-After')
+
+                attempts.append({'attempt': attempt + 1, 'status': response.status_code, 'seconds': round(time.monotonic() - started, 3)})
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    return response, digest, size, attempts
+
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                attempts.append({'attempt': attempt + 1, 'error': repr(e), 'seconds': round(time.monotonic() - started, 3)})
+                if attempt == self.retries:
+                    raise
+                error = e
+
+            delay = random.uniform(0, min(MAX_BACKOFF, self.backoff * 2 ** attempt))
+            if retry_after is not None and retry_after.isdigit():
+                delay = max(delay, min(MAX_BACKOFF, int(retry_after)))
+            outcome = attempts[-1].get('error') or attempts[-1]['status']
+            if deadline is not None and time.monotonic() + delay + MIN_ATTEMPT_SECONDS > deadline:
+                print(f"GET {url} attempt {attempt + 1} failed ({outcome}), no time left to retry")
+                if error is not None:
+                    raise error
+                return response, digest, size, attempts
+            print(f"GET {url} attempt {attempt + 1} failed ({outcome}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+    def evict(self):
+        """Delete cache entries unused for longer than max_age, then the least recently used until under max_bytes"""
+        with self._lock:
+            if not os.path.isdir(self.directory):
+                return
+
+            entries = []
+            for name in os.listdir(self.directory):
+                if not name.endswith('.json'):
+                    continue
+                meta_path = os.path.join(self.directory, name)
+                try:
+                    with open(meta_path) as f:
+                        meta = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                entries.append((meta.get('used', 0), meta.get('size', 0), meta_path[:-len('.json')]))
+
+            now = time.time()
+            total = sum(size for _, size, _ in entries)
+            for used, size, base in sorted(entries):
+                if now - used > self.max_age or total > self.max_bytes:
+                    for suffix in ('.body', '.json'):
+                        _remove(base + suffix)
+                    total -= size
+
+
+# Request timeout (seconds, or a (connect, read) tuple) cut to the seconds left before a deadline
+def _cut_timeout(timeout, deadline):
+    if deadline is None:
+        return timeout
+    left = max(deadline - time.monotonic(), 0.001)
+    if isinstance(timeout, tuple):
+        return tuple(left if part is None else min(part, left) for part in timeout)
+    return left if timeout is None else min(timeout, left)
+
+# Writes a streamed response body to a file chunk by chunk, returning its sha256 hex digest and size
+# The read timeout only bounds each read, so a slow but steady download is also stopped at the deadline (TimeoutError)
+def _stream_to_file(response, path, deadline=None):
+    sha256 = hashlib.sha256()
+    size = 0
+    with open(path, 'wb') as f:
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"GET {response.url} did not finish before its deadline ({size} bytes read)")
+            f.write(chunk)
+            sha256.update(chunk)
+            size += len(chunk)
+    return sha256.hexdigest(), size
+
+# Writes to a temporary file first so a crash never leaves half a file in the cache
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
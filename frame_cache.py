@@ -0,0 +1,110 @@
+# Author: Selorm Kwami Dzakpasu
+
+import hashlib
+import json
+import os
+import time
+import pandas as pd
+
+# Folder the formatted ISO queues are cached in
+FRAME_CACHE_DIR = os.path.join('.cache', 'frames')
+
+# Bump this whenever a parser or the column formatting changes so frames cached by older code are not reused
+SCHEMA_VERSION = 1
+
+# Number of parsed versions of each ISO's file to keep
+DEFAULT_KEEP = 3
+
+
+# Cache of each ISO's formatted queue DataFrame
+# Frames are pickled (not Parquet) because the formatted queues have mixed type columns that must come back unchanged
+class FrameCache:
+    def __init__(self, directory=FRAME_CACHE_DIR, version=SCHEMA_VERSION, keep=DEFAULT_KEEP):
+        self.directory = directory
+        self.version = version
+        self.keep = keep
+        self._last_parsed = {} # ISO -> (DataFrame, file name) from the latest parse() call
+
+    def _iso_dir(self, iso):
+        path = os.path.join(self.directory, iso)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def parse(self, iso, content, parse, sha256=None):
+        """Parse a raw ISO file, reusing the frame cached for the same bytes and schema version
+
+        Args:
+            iso (str): Balancing Authority Code
+            content (bytes): raw file content
+            parse (function): turns the raw content into the formatted DataFrame
+            sha256 (str): hex digest of content if already known
+
+        Returns:
+            pandas.DataFrame: the formatted queue
+        """
+        sha256 = sha256 or hashlib.sha256(content).hexdigest()
+        file_name = f"{sha256}-v{self.version}.pkl"
+        path = os.path.join(self._iso_dir(iso), file_name)
+
+        if os.path.exists(path):
+            df = pd.read_pickle(path)
+            os.utime(path) # Keeps recently used frames from being evicted
+        else:
+            df = parse(content)
+            _to_pickle_atomic(df, path)
+            self._evict(iso)
+
+        self._last_parsed[iso] = (df, file_name)
+        return df
+
+    def remember(self, iso, df):
+        """Record df as the last good queue for an ISO, used by load_latest() when a later fetch fails"""
+        last = self._last_parsed.get(iso)
+        if last is not None and last[0] is df:
+            file_name = last[1] # Already on disk from parse()
+        else:
+            file_name = f"fetched-v{self.version}.pkl"
+            _to_pickle_atomic(df, os.path.join(self._iso_dir(iso), file_name))
+
+        latest = {'file': file_name, 'version': self.version, 'saved': time.time()}
+        with open(os.path.join(self._iso_dir(iso), 'latest.json'), 'w') as f:
+            json.dump(latest, f)
+
+    def load_latest(self, iso):
+        """Load the last good queue for an ISO
+
+        Returns:
+            tuple: (DataFrame, time it was saved) or None if nothing usable is cached
+        """
+        latest_path = os.path.join(self.directory, iso, 'latest.json')
+        if not os.path.exists(latest_path):
+            return None
+
+        with open(latest_path) as f:
+            latest = json.load(f)
+        path = os.path.join(self.directory, iso, latest['file'])
+        if latest['version'] != self.version or not os.path.exists(path):
+            return None
+
+        return pd.read_pickle(path), latest['saved']
+
+    # Keeps the most recently used parsed frames (plus whatever latest.json points to)
+    def _evict(self, iso):
+        iso_dir = self._iso_dir(iso)
+        latest_path = os.path.join(iso_dir, 'latest.json')
+        protected = None
+        if os.path.exists(latest_path):
+            with open(latest_path) as f:
+                protected = json.load(f)['file']
+
+        parsed = [name for name in os.listdir(iso_dir) if name.endswith('.pkl') and not name.startswith('fetched-')]
+        parsed.sort(key=lambda name: os.path.getmtime(os.path.join(iso_dir, name)), reverse=True)
+        for name in parsed[self.keep:]:
+            if name != protected:
+                os.remove(os.path.join(iso_dir, name))
+
+
+def _to_pickle_atomic(df, path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
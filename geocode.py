@@ -0,0 +1,248 @@
+# Author: Selorm Kwami Dzakpasu
+
+import glob
+import hashlib
+import os
+import re
+import pandas as pd
+from instrumentation import STAGES
+
+# Fills in Latitude/Longitude of the cleaned queues from gazetteer files on disk, nothing is looked up online
+#
+# Counties: the Census Bureau's national county gazetteer (e.g. "2024_Gaz_counties_national.txt"), unzipped into GAZETTEER_DIR
+#   https://www.census.gov/geographies/reference-files/time-series/geo/gazetteer-files.html
+# Interconnection Locations (optional): "locations.csv" in GAZETTEER_DIR with State, Name, Latitude and Longitude columns
+#   (e.g. a list of substations), used before the county when a project's location is found in it
+GAZETTEER_DIR = 'gazetteer'
+COUNTY_GAZETTEER = '*Gaz_counties_national*.txt'
+LOCATION_GAZETTEER = 'locations.csv'
+
+# Folder the lookup index (built once per gazetteer version) and the memo of resolved locations are kept in
+GEOCODE_CACHE_DIR = os.path.join('.cache', 'geocode')
+
+# Columns a location is resolved from
+GEOCODE_COLUMNS = ['State', 'County', 'Interconnection Location']
+
+# Some ISOs spell out the state
+STATE_CODES = {
+    'ALABAMA': 'AL', 'ALASKA': 'AK', 'ARIZONA': 'AZ', 'ARKANSAS': 'AR', 'CALIFORNIA': 'CA', 'COLORADO': 'CO',
+    'CONNECTICUT': 'CT', 'DELAWARE': 'DE', 'DISTRICT OF COLUMBIA': 'DC', 'FLORIDA': 'FL', 'GEORGIA': 'GA', 'HAWAII': 'HI',
+    'IDAHO': 'ID', 'ILLINOIS': 'IL', 'INDIANA': 'IN', 'IOWA': 'IA', 'KANSAS': 'KS', 'KENTUCKY': 'KY', 'LOUISIANA': 'LA',
+    'MAINE': 'ME', 'MARYLAND': 'MD', 'MASSACHUSETTS': 'MA', 'MICHIGAN': 'MI', 'MINNESOTA': 'MN', 'MISSISSIPPI': 'MS',
+    'MISSOURI': 'MO', 'MONTANA': 'MT', 'NEBRASKA': 'NE', 'NEVADA': 'NV', 'NEW HAMPSHIRE': 'NH', 'NEW JERSEY': 'NJ',
+    'NEW MEXICO': 'NM', 'NEW YORK': 'NY', 'NORTH CAROLINA': 'NC', 'NORTH DAKOTA': 'ND', 'OHIO': 'OH', 'OKLAHOMA': 'OK',
+    'OREGON': 'OR', 'PENNSYLVANIA': 'PA', 'RHODE ISLAND': 'RI', 'SOUTH CAROLINA': 'SC', 'SOUTH DAKOTA': 'SD',
+    'TENNESSEE': 'TN', 'TEXAS': 'TX', 'UTAH': 'UT', 'VERMONT': 'VT', 'VIRGINIA': 'VA', 'WASHINGTON': 'WA',
+    'WEST VIRGINIA': 'WV', 'WISCONSIN': 'WI', 'WYOMING': 'WY', 'PUERTO RICO': 'PR',
+}
+
+# Words dropped from county names ("Kern County", "Orleans Parish") and separators between several counties in one cell
+COUNTY_WORDS = re.compile(r'\b(COUNTY|COUNTIES|PARISH|BOROUGH|CENSUS AREA|MUNICIPALITY|CITY AND BOROUGH)\b')
+COUNTY_SEPARATORS = re.compile(r'\s*(?:,|/|&|;|\+|\bAND\b|-)\s*')
+
+# Voltages, bus numbers and words dropped from Interconnection Locations ("Astoria 138 kV substation"), and line endpoints ("Milan - Churchtown 115kV")
+LOCATION_WORDS = re.compile(r'\b\d+(?:\.\d+)?\s*KV\b|^\d+\s+|\b(SUBSTATION|SUB|STATION|SWITCHING|SWITCHYARD|SS|LINE|TAP|BUS|POI)\b')
+LOCATION_SEPARATORS = re.compile(r'\s+(?:-|TO)\s+')
+
+
+def _text(value):
+    return '' if value is None or pd.isna(value) else str(value).strip().upper()
+
+def _squash(text):
+    return ' '.join(re.sub(r'[^A-Z0-9 ]', ' ', text).split())
+
+def state_code(value):
+    text = _text(value)
+    return text if len(text) == 2 else STATE_CODES.get(_squash(text), '')
+
+def county_key(value):
+    return _squash(COUNTY_WORDS.sub(' ', _text(value).replace('SAINT ', 'ST ')))
+
+def location_key(value):
+    return _squash(LOCATION_WORDS.sub(' ', _text(value)))
+
+
+# Keys to try for a county cell, the whole cell first and then each county listed in it ("Kings, Queens, New York, Bronx")
+def _county_candidates(value):
+    text = _text(value)
+    return [county_key(value)] + [county_key(part) for part in COUNTY_SEPARATORS.split(text)]
+
+# Keys to try for an Interconnection Location, the whole location first and then each end of a line
+def _location_candidates(value):
+    text = _text(value)
+    return [location_key(value)] + [location_key(part) for part in LOCATION_SEPARATORS.split(text)]
+
+
+# Offline geocoder with a lookup index of the gazetteers and a memo of every (State, County, Interconnection Location) resolved so far
+# Both are saved in GEOCODE_CACHE_DIR and start over when a gazetteer file changes
+class Geocoder:
+    def __init__(self, gazetteer_dir=GAZETTEER_DIR, cache_dir=GEOCODE_CACHE_DIR):
+        self.gazetteer_dir = gazetteer_dir
+        self.cache_dir = cache_dir
+        self._index = None
+        self._memo = None
+        self._version = None
+
+    def _files(self):
+        counties = sorted(glob.glob(os.path.join(self.gazetteer_dir, COUNTY_GAZETTEER)))
+        locations = os.path.join(self.gazetteer_dir, LOCATION_GAZETTEER)
+        return (counties[-1] if counties else None), (locations if os.path.exists(locations) else None)
+
+    def load(self):
+        """Load (or build) the lookup index and memo
+
+        Returns:
+            bool: False when there is no county gazetteer
+        """
+        counties, locations = self._files()
+        if counties is None:
+            return False
+
+        digest = hashlib.sha256()
+        for path in (counties, locations):
+            if path:
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+        version = digest.hexdigest()[:16]
+        if version == self._version:
+            return True
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        index_path = os.path.join(self.cache_dir, f"index-{version}.pkl")
+        if os.path.exists(index_path):
+            self._index = pd.read_pickle(index_path)
+        else:
+            self._index = {'counties': _county_index(counties), 'locations': _location_index(locations) if locations else {}}
+            _to_pickle_atomic(self._index, index_path)
+
+        memo_path = os.path.join(self.cache_dir, f"memo-{version}.pkl")
+        self._memo = pd.read_pickle(memo_path) if os.path.exists(memo_path) else {}
+        self._version = version
+        return True
+
+    def resolve(self, state, county, location):
+        """Coordinates of one project
+
+        Returns:
+            tuple: (latitude, longitude, matched on "location" or "county"), or None when nothing matches
+        """
+        state = state_code(state)
+        if not state:
+            return None
+        for key in _location_candidates(location):
+            if key and (state, key) in self._index['locations']:
+                return (*self._index['locations'][(state, key)], 'location')
+        for key in _county_candidates(county):
+            if key and (state, key) in self._index['counties']:
+                return (*self._index['counties'][(state, key)], 'county')
+        return None
+
+    def geocode(self, df):
+        """Fill in the blank Latitude/Longitude of a DataFrame
+
+        Every distinct (State, County, Interconnection Location) is resolved once, from the memo if an earlier run resolved it.
+
+        Returns:
+            tuple: (DataFrame, stats dict with the rows matched on location/county, the rows missed and the memo hits/misses)
+        """
+        stats = {'rows': len(df), 'location': 0, 'county': 0, 'missed': 0, 'memo_hits': 0, 'memo_misses': 0}
+        if df.empty:
+            return df, stats
+
+        keys = pd.MultiIndex.from_arrays([
+            df[col].astype(object).where(df[col].notna(), None) if col in df.columns else pd.Series(None, index=df.index, dtype=object)
+            for col in GEOCODE_COLUMNS
+        ])
+        codes, uniques = keys.factorize()
+
+        resolved = []
+        for key in uniques:
+            key = tuple(None if value is None or pd.isna(value) else value for value in key)
+            if key in self._memo:
+                stats['memo_hits'] += 1
+            else:
+                self._memo[key] = self.resolve(*key)
+                stats['memo_misses'] += 1
+            resolved.append(self._memo[key])
+
+        found = pd.DataFrame([match or (None, None, None) for match in resolved], columns=['Latitude', 'Longitude', 'Match'])
+        found = found.iloc[codes].set_axis(df.index)
+        blank = df['Latitude'].isna() & df['Longitude'].isna() # Coordinates an ISO published are kept
+
+        df = df.copy()
+        df['Latitude'] = pd.to_numeric(df['Latitude'], errors='coerce').where(~blank, found['Latitude'].astype(float))
+        df['Longitude'] = pd.to_numeric(df['Longitude'], errors='coerce').where(~blank, found['Longitude'].astype(float))
+
+        matched = found.loc[blank, 'Match']
+        stats['location'] = int((matched == 'location').sum())
+        stats['county'] = int((matched == 'county').sum())
+        stats['missed'] = int(matched.isna().sum())
+        return df, stats
+
+    def save(self):
+        """Save the memo for the next run"""
+        if self._memo is not None:
+            _to_pickle_atomic(self._memo, os.path.join(self.cache_dir, f"memo-{self._version}.pkl"))
+
+
+# (USPS state code, county key) -> (latitude, longitude) of the county's internal point
+# Independent cities ("Baltimore city") are also found by their plain name when no county has it
+def _county_index(path):
+    gazetteer = pd.read_csv(path, sep='\t', dtype={'GEOID': str}, encoding='latin-1')
+    gazetteer.columns = gazetteer.columns.str.strip() # The last column name has trailing spaces
+    index = {}
+    cities = []
+    for state, name, lat, lon in gazetteer[['USPS', 'NAME', 'INTPTLAT', 'INTPTLONG']].itertuples(index=False):
+        key = county_key(name)
+        index[(state, key)] = (lat, lon)
+        if key.endswith(' CITY'):
+            cities.append((state, key[:-len(' CITY')], (lat, lon)))
+    for state, key, point in cities:
+        index.setdefault((state, key), point)
+    return index
+
+# (USPS state code, location key) -> (latitude, longitude)
+def _location_index(path):
+    locations = pd.read_csv(path)
+    index = {}
+    for state, name, lat, lon in locations[['State', 'Name', 'Latitude', 'Longitude']].itertuples(index=False):
+        index.setdefault((state_code(state), location_key(name)), (lat, lon))
+    return index
+
+
+def _to_pickle_atomic(data, path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pd.to_pickle(data, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def geocode_partitions(partitions, geocoder=None):
+    """Fill in Latitude/Longitude of every partition from the offline gazetteers
+
+    Args:
+        partitions (dict): cleaned DataFrames keyed by status partition
+        geocoder (Geocoder): Defaults to one using GAZETTEER_DIR and GEOCODE_CACHE_DIR
+
+    Returns:
+        tuple: (partitions with Latitude/Longitude filled in, stats dict)
+            The partitions are returned unchanged (and the stats are None) when there is no county gazetteer.
+    """
+    geocoder = geocoder or Geocoder()
+    if not geocoder.load():
+        print(f"Geocoding skipped, no county gazetteer ({COUNTY_GAZETTEER}) in {geocoder.gazetteer_dir}")
+        return partitions, None
+
+    geocoded = {}
+    totals = {}
+    with STAGES.stage('geocode', partitions) as stage:
+        for name, df in partitions.items():
+            geocoded[name], stats = geocoder.geocode(df)
+            for key, value in stats.items():
+                totals[key] = totals.get(key, 0) + value
+        geocoder.save()
+        stage.set_output(geocoded)
+        stage.details = totals # Hit/miss counts in the run report
+
+    print(f"Geocoding: {totals['location']} rows by Interconnection Location, {totals['county']} by county, {totals['missed']} not found "
+          f"({totals['memo_hits']} locations from the memo, {totals['memo_misses']} resolved)")
+    return geocoded, totals
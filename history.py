@@ -0,0 +1,270 @@
+# Author: Selorm Kwami Dzakpasu
+
+# Keeps every run's cleaned queues in a local SQLite database so earlier queues can be looked up
+# ("when did this MISO project move to Withdrawn", "what did the queue look like on 1/1/2025")
+#
+# The database is append only: a run adds a row to "runs" and a version of every project that was added, changed,
+# moved to another status or removed since the previous run. Unchanged projects are not stored again.
+#
+# From another script:
+#     from history import project_history, queue_as_of
+#     project_history('MISO', 'J1234')
+#     queue_as_of('2025-01-01')
+# Or from the command line:
+#     python history.py project MISO J1234
+#     python history.py as-of 2025-01-01 --iso MISO PJM
+
+import argparse
+import json
+import sqlite3
+import sys
+from contextlib import closing
+from datetime import datetime
+import pandas as pd
+from instrumentation import STAGES
+from incremental import _keys, queue_id_text
+from outputs import SHORT_DATE_COLUMNS, write_outputs
+from status_rules import load_status_rules
+
+# Database the queue history is kept in
+HISTORY_DB = 'queue_history.sqlite'
+
+# Indexes keep both lookups from scanning every stored version:
+#   versions_by_project: one project's versions, and the latest version of every project as of a run
+#   runs_by_date:        the last run on or before a date
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    run_date TEXT NOT NULL,
+    isos TEXT NOT NULL,
+    columns TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS versions (
+    iso TEXT NOT NULL,
+    queue_id TEXT NOT NULL,
+    occurrence INTEGER NOT NULL,
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    change TEXT NOT NULL,
+    status TEXT,
+    position INTEGER,
+    row_hash INTEGER,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS versions_by_project ON versions (iso, queue_id, occurrence, run_id);
+CREATE INDEX IF NOT EXISTS runs_by_date ON runs (run_date);
+"""
+
+# Latest version of every project still in the queue as of a run (removed projects are stored without data)
+LATEST_VERSIONS = """
+SELECT v.iso, v.queue_id, v.occurrence, v.status, v.position, v.row_hash, v.data, r.run_date
+FROM versions v
+JOIN (
+    SELECT iso, queue_id, occurrence, MAX(run_id) AS run_id
+    FROM versions
+    WHERE run_id <= ?
+    GROUP BY iso, queue_id, occurrence
+) latest USING (iso, queue_id, occurrence, run_id)
+JOIN runs r USING (run_id)
+WHERE v.data IS NOT NULL
+"""
+
+
+def connect(path=HISTORY_DB):
+    connection = sqlite3.connect(path)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+# Each row of a partition as JSON (columns sorted so a change in column order alone is not a change)
+# and a hash of it, which tells whether a project changed since the last run
+def _row_json(df):
+    df = df[sorted(df.columns)]
+    lines = df.to_json(orient='records', lines=True, date_format='iso').splitlines() if len(df) else []
+    hashes = pd.util.hash_array(pd.Series(lines, dtype=object).to_numpy()).view('int64') # SQLite stores signed integers
+    return lines, hashes
+
+
+# Latest version of every project of the given ISOs as of a run, as a DataFrame
+def _latest(connection, run_id, isos=None):
+    query = LATEST_VERSIONS
+    params = [run_id]
+    if isos is not None:
+        query += f" AND v.iso IN ({', '.join('?' * len(isos))})"
+        params += list(isos)
+    return pd.read_sql_query(query, connection, params=params)
+
+
+@STAGES.timed('record_history')
+def record_history(cleaned, isos=None, run_date=None, path=HISTORY_DB):
+    """Add a run's cleaned queues to the history
+
+    Only projects that were added, changed, moved to another status or removed since the last run are stored.
+
+    Args:
+        cleaned (dict): cleaned DataFrames keyed by status partition ("Active", "Withdrawn", "Completed")
+        isos (list): ISOs the run fetched, only their projects are stored (projects of other ISOs are not marked as removed).
+            Defaults to the ISOs found in cleaned.
+        run_date (datetime): Date of the run. Defaults to now, can't be before the last recorded run.
+        path (str): History database
+
+    Returns:
+        DataFrame: the change set stored, one row per added, updated, status changed or removed project
+    """
+    run_date = (run_date or datetime.now()).isoformat(timespec='seconds')
+    all_keys = _keys(cleaned)
+
+    rows = []
+    for name, df in cleaned.items():
+        lines, hashes = _row_json(df)
+        keys = all_keys[name].to_frame(index=False)
+        keys.columns = ['iso', 'queue_id', 'occurrence']
+        rows.append(keys.assign(status=name, position=range(len(df)), row_hash=hashes, data=lines))
+    current = pd.concat(rows, ignore_index=True) if rows else pd.DataFrame(
+        columns=['iso', 'queue_id', 'occurrence', 'status', 'position', 'row_hash', 'data'])
+    # Nullable integers so the hashes of added/removed projects don't turn the column into lossy floats
+    current = current.astype({'position': 'Int64', 'row_hash': 'Int64'})
+    if isos is None:
+        isos = sorted(current['iso'].unique())
+    current = current[current['iso'].isin(isos)]
+
+    with closing(connect(path)) as connection, connection:
+        last_run = connection.execute("SELECT run_id, run_date FROM runs ORDER BY run_id DESC LIMIT 1").fetchone()
+        if last_run and run_date < last_run[1]:
+            raise ValueError(f"Run date {run_date} is before the last recorded run ({last_run[1]}), the history is append only")
+
+        previous = _latest(connection, last_run[0] if last_run else 0, isos).astype({'row_hash': 'Int64'})
+
+        merged = current.merge(previous[['iso', 'queue_id', 'occurrence', 'status', 'row_hash']],
+                               on=['iso', 'queue_id', 'occurrence'], how='outer', suffixes=('', '_before'), indicator=True)
+        change = pd.Series('Updated', index=merged.index, dtype=object)
+        change[merged['_merge'] == 'left_only'] = 'Added'
+        change[merged['_merge'] == 'right_only'] = 'Removed'
+        change[(merged['_merge'] == 'both') & (merged['status'] != merged['status_before'])] = 'Status Changed'
+        same = ((merged['_merge'] == 'both') & (merged['status'] == merged['status_before'])
+                & (merged['row_hash'] == merged['row_hash_before']).fillna(False))
+        changes = merged.assign(change=change)[~same]
+
+        columns = json.dumps([str(col) for col in next(iter(cleaned.values())).columns] if cleaned else []) # Versions are stored with sorted columns
+        run_id = connection.execute("INSERT INTO runs (run_date, isos, columns) VALUES (?, ?, ?)", (run_date, ','.join(isos), columns)).lastrowid
+        stored = changes[['iso', 'queue_id', 'occurrence', 'change', 'status', 'position', 'row_hash', 'data']].astype(object)
+        stored = stored.where(stored.notna(), None)
+        connection.executemany(
+            "INSERT INTO versions (iso, queue_id, occurrence, run_id, change, status, position, row_hash, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((iso, queue_id, int(occurrence), run_id, change, status, position, row_hash, data)
+             for iso, queue_id, occurrence, change, status, position, row_hash, data in stored.itertuples(index=False)),
+        )
+
+    print(f"History: run {run_id} stored {len(changes)} added/changed/removed projects of {len(current)}")
+    return pd.DataFrame({
+        'Balancing Authority Code': changes['iso'],
+        'Queue ID': changes['queue_id'],
+        'Change': changes['change'],
+        'Previous Status': changes['status_before'],
+        'Status': changes['status'],
+    }).reset_index(drop=True)
+
+
+# Turns stored JSON rows back into a DataFrame with the cleaned queue's date columns (and column order, if given)
+def _rows(data, columns=None):
+    df = pd.DataFrame([json.loads(line) for line in data])
+    if columns:
+        df = df[[col for col in columns if col in df.columns] + [col for col in df.columns if col not in columns]]
+    for col in SHORT_DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    return df
+
+
+def project_history(iso, queue_id, path=HISTORY_DB):
+    """Every recorded version of a project, oldest first
+
+    Args:
+        iso (str): Balancing Authority Code (e.g. "MISO")
+        queue_id (str): Queue ID (a whole number can be given as a number)
+        path (str): History database
+
+    Returns:
+        DataFrame: "Run Date", "Change" (Added, Updated, Status Changed or Removed) and "Partition" (Active, Withdrawn or Completed)
+            of every version, followed by the project's cleaned columns. Projects whose Queue ID repeats within the ISO are told apart by "Occurrence".
+    """
+    with closing(connect(path)) as connection:
+        columns = (connection.execute("SELECT columns FROM runs ORDER BY run_id DESC LIMIT 1").fetchone() or ['[]'])[0]
+        versions = pd.read_sql_query(
+            """SELECT r.run_date, v.change, v.status, v.occurrence, v.data
+               FROM versions v JOIN runs r USING (run_id)
+               WHERE v.iso = ? AND v.queue_id = ?
+               ORDER BY v.occurrence, v.run_id""",
+            connection, params=[iso, queue_id_text([queue_id])[0]], # Stored the same way, so 1234 and 1234.0 both find "1234"
+        )
+
+    details = _rows(versions['data'].fillna('{}'), json.loads(columns)) # Removed versions have no details
+    versions = versions.drop(columns='data').rename(columns={
+        'run_date': 'Run Date', 'change': 'Change', 'status': 'Partition', 'occurrence': 'Occurrence'})
+    versions['Run Date'] = pd.to_datetime(versions['Run Date'])
+    return pd.concat([versions, details], axis=1)
+
+
+def queue_as_of(date, isos=None, path=HISTORY_DB):
+    """The cleaned queues as they were after the last run on or before a date
+
+    Args:
+        date (str or datetime): e.g. "2025-01-01" (the whole day is included)
+        isos (list): Balancing Authority Codes to include. Defaults to all.
+        path (str): History database
+
+    Returns:
+        dict: cleaned DataFrames keyed by status partition, like the pipeline's cleaned queues (empty if nothing was recorded by then).
+            Queue Date and Planned Operation Date are dates again, the other columns come back as stored in JSON (e.g. raw dates as text).
+    """
+    date = pd.Timestamp(date)
+    if date == date.normalize():
+        date += pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+
+    with closing(connect(path)) as connection:
+        run, columns = connection.execute(
+            "SELECT run_id, columns FROM runs WHERE run_date <= ? ORDER BY run_date DESC, run_id DESC LIMIT 1", (date.isoformat(timespec='seconds'),)
+        ).fetchone() or (None, None)
+        if run is None:
+            return {}
+        latest = _latest(connection, run, isos)
+
+    # Partitions in the order of "status_rules.json" (Active, Withdrawn, Completed), rows in the order of the run that stored them
+    order = load_status_rules()['partitions']
+    latest = latest.sort_values('position', kind='stable')
+    groups = dict(tuple(latest.groupby('status', sort=False)))
+    return {name: _rows(groups[name]['data'], json.loads(columns)) for name in sorted(groups, key=lambda name: order.index(name) if name in order else len(order))}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Look up earlier ISO interconnection queues")
+    parser.add_argument('--db', default=HISTORY_DB, help="History database")
+    commands = parser.add_subparsers(dest='command', required=True)
+    project = commands.add_parser('project', help="Print every recorded version of a project")
+    project.add_argument('iso', help="Balancing Authority Code, e.g. MISO")
+    project.add_argument('queue_id', help="Queue ID")
+    as_of = commands.add_parser('as-of', help="Save the cleaned queues as of a date")
+    as_of.add_argument('date', help="Date, e.g. 2025-01-01")
+    as_of.add_argument('--iso', nargs='+', help="ISOs to include (default: all)")
+    as_of.add_argument('--output', nargs='+', default=['excel'], help="Output formats")
+    args = parser.parse_args(argv)
+
+    if args.command == 'project':
+        versions = project_history(args.iso, args.queue_id, args.db)
+        if versions.empty:
+            print(f"No history for {args.iso} {args.queue_id}")
+            return 1
+        with pd.option_context('display.max_columns', None, 'display.width', None):
+            print(versions[['Run Date', 'Change', 'Partition', 'Occurrence', 'Status']].to_string(index=False))
+        return 0
+
+    partitions = queue_as_of(args.date, args.iso, args.db)
+    if not partitions:
+        print(f"Nothing was recorded on or before {args.date}")
+        return 1
+    paths = write_outputs(partitions, args.output, name=f"ISO_Queues_as_of_{pd.Timestamp(args.date):%Y-%m-%d}")
+    print(f"Saved {', '.join(paths)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+# Author: Selorm Kwami Dzakpasu
+
+import os
+import numpy as np
+import pandas as pd
+from queue_cleanup import queue_cleanup
+from parallel_cleanup import first_date_rows
+from instrumentation import STAGES
+
+# Folder the previous run's queues are kept in for incremental cleanup
+SNAPSHOT_DIR = os.path.join('.cache', 'snapshot')
+
+# Bump this whenever queue_cleanup() changes so rows cleaned by older code are cleaned again
+CLEANUP_VERSION = 2
+
+# A project is identified by its ISO and Queue ID
+# Some ISOs repeat a Queue ID, so repeats are told apart by the order they appear in ("Occurrence")
+KEY_COLUMNS = ['Balancing Authority Code', 'Queue ID', 'Occurrence']
+
+
+# Queue IDs as text, a whole number read as a float (1234.0, e.g. in a column with blanks) as the ISO publishes it ("1234")
+def queue_id_text(values):
+    values = pd.Series(values, dtype=object)
+    return values.map(lambda value: str(int(value)) if isinstance(value, float) and value.is_integer() else str(value))
+
+# Keys of every row of every partition (Occurrence counts across partitions so keys are unique overall)
+def _keys(partitions):
+    keys = pd.concat([pd.DataFrame({'Balancing Authority Code': df['Balancing Authority Code'].astype(str).to_numpy(),
+                                    'Queue ID': queue_id_text(df['Queue ID']).to_numpy()})
+                      for df in partitions.values()], ignore_index=True)
+    keys['Occurrence'] = keys.groupby(['Balancing Authority Code', 'Queue ID']).cumcount()
+
+    split = {}
+    start = 0
+    for name, df in partitions.items():
+        split[name] = pd.MultiIndex.from_frame(keys.iloc[start:start + len(df)])
+        start += len(df)
+    return split
+
+# Hash of every row's contents (columns sorted so a change in column order alone is not a change)
+def _row_hashes(df):
+    return pd.util.hash_pandas_object(df[sorted(df.columns)], index=False).to_numpy()
+
+
+# Previous run's row hashes and cleaned partitions
+def load_snapshot(directory=SNAPSHOT_DIR):
+    path = os.path.join(directory, 'snapshot.pkl')
+    if not os.path.exists(path):
+        return None
+    snapshot = pd.read_pickle(path)
+    if snapshot['version'] != CLEANUP_VERSION:
+        return None
+    return snapshot
+
+def save_snapshot(snapshot, directory=SNAPSHOT_DIR):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, 'snapshot.pkl')
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pd.to_pickle(snapshot, tmp_path)
+    os.replace(tmp_path, path)
+
+
+# Lists added, removed, moved and updated projects between the previous and new row hashes
+def _change_set(previous, current):
+    keys = previous.index.union(current.index)
+    previous_partition = previous['Partition'].reindex(keys)
+    partition = current['Partition'].reindex(keys)
+    # fill_value keeps the hashes uint64 (NaN would turn them into lossy floats)
+    same_hash = previous['Row Hash'].reindex(keys, fill_value=0) == current['Row Hash'].reindex(keys, fill_value=0)
+
+    change = pd.Series('Updated', index=keys, dtype=object)
+    change[previous_partition.isna()] = 'Added'
+    change[partition.isna()] = 'Removed'
+    change[previous_partition.notna() & partition.notna() & (previous_partition != partition)] = 'Status Changed'
+    same = (previous_partition == partition) & same_hash
+
+    changes = pd.DataFrame({
+        'Change': change,
+        'Previous Status': previous_partition,
+        'Status': partition,
+    })[~same.to_numpy()]
+    return changes.reset_index().drop(columns='Occurrence')
+
+
+# Cleans the new/changed rows of a partition
+# They are cleaned together with the rows the whole partition's date formats are guessed from (see parallel_cleanup.py),
+# labelled with negative numbers and dropped again, so they are cleaned exactly like they would be with the whole partition
+def _clean_changed(raw, changed_rows, cleanup):
+    anchors = sorted({position for position in first_date_rows(raw).values() if position is not None})
+    if not anchors:
+        return cleanup(changed_rows)
+    prefix = raw.iloc[anchors].set_axis(np.arange(-len(anchors), 0))
+    cleaned = cleanup(pd.concat([prefix, changed_rows]))
+    return cleaned[cleaned.index >= 0]
+
+
+@STAGES.timed('incremental_cleanup')
+def incremental_cleanup(partitions, directory=SNAPSHOT_DIR, cleanup=queue_cleanup):
+    """Clean only the rows that are new or changed since the previous run
+
+    Rows whose contents and status partition are the same as last run reuse last run's cleaned rows.
+    The result has the same rows in the same order as running cleanup on every partition.
+
+    Args:
+        partitions (dict): combined (not yet cleaned) DataFrames keyed by status partition ("Active", "Withdrawn", "Completed")
+        directory (str): Folder the previous run is kept in
+        cleanup (function): Cleanup applied to new/changed rows
+
+    Returns:
+        tuple: (cleaned partitions dict, change set DataFrame)
+            The change set has one row per added, removed, status changed or updated project.
+            On the first run (or after CLEANUP_VERSION changes) everything is cleaned and the change set lists every project as added.
+    """
+    snapshot = load_snapshot(directory)
+    previous_hashes = snapshot['hashes'] if snapshot else pd.DataFrame(
+        {'Partition': pd.Series(dtype=object), 'Row Hash': pd.Series(dtype='uint64')},
+        index=pd.MultiIndex.from_tuples([], names=KEY_COLUMNS),
+    )
+
+    all_keys = _keys(partitions)
+
+    cleaned = {}
+    new_cleaned = {}
+    hashes = []
+    for name, raw in partitions.items():
+        raw = raw.reset_index(drop=True)
+        keys = all_keys[name]
+        current = pd.DataFrame({'Partition': name, 'Row Hash': _row_hashes(raw)}, index=keys)
+        hashes.append(current)
+
+        # Rows that look exactly like last run and were in the same partition
+        before = previous_hashes.reindex(keys, fill_value=0)
+        unchanged = ((before['Partition'] == name) & (before['Row Hash'] == current['Row Hash'])).to_numpy()
+
+        # Clean the new/changed rows (index = position in raw)
+        changed_rows = raw[~unchanged]
+        cleaned_changed = _clean_changed(raw, changed_rows, cleanup) if len(changed_rows) else None
+
+        # Reuse last run's cleaned rows for the rest (rows cleanup dropped last time stay dropped)
+        previous_cleaned = snapshot['cleaned'][name] if snapshot else None
+        reused = None
+        if previous_cleaned is not None and unchanged.any():
+            unchanged_keys = keys[unchanged]
+            positions = pd.Series(range(len(raw)), index=keys)[unchanged]
+            found = unchanged_keys.isin(previous_cleaned.index)
+            reused = previous_cleaned.loc[unchanged_keys[found]]
+            reused.index = positions[found].to_numpy()
+
+        parts = [part for part in (reused, cleaned_changed) if part is not None]
+        if parts:
+            result = pd.concat(parts).sort_index()
+        else:
+            result = cleanup(raw)
+        if cleaned_changed is not None and reused is not None:
+            result = result[cleaned_changed.columns]
+
+        # Stored by key for the next run, returned by position
+        new_cleaned[name] = result.set_axis(keys[result.index.to_numpy()])
+        cleaned[name] = result.reset_index(drop=True)
+
+        print(f"{name}: cleaned {len(changed_rows)} new/changed rows, reused {len(raw) - len(changed_rows)}")
+
+    current_hashes = pd.concat(hashes)
+    changes = _change_set(previous_hashes, current_hashes)
+
+    save_snapshot({'version': CLEANUP_VERSION, 'hashes': current_hashes, 'cleaned': new_cleaned}, directory)
+    return cleaned, changes
@@ -0,0 +1,226 @@
+# Author: Selorm Kwami Dzakpasu
+
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource # Not available on Windows, peak RSS is left out there
+except ImportError:
+    resource = None
+
+
+# Peak resident memory of the whole process so far in MB (None where the OS doesn't report it)
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+# Rows and columns of a DataFrame (or anything with a length), None for anything else
+def _shape(value):
+    if value is None:
+        return None, None
+    if hasattr(value, 'shape') and len(value.shape) == 2:
+        return value.shape
+    if hasattr(value, '__len__'):
+        return len(value), None
+    return None, None
+
+
+# Record of one stage, filled in by Instrumentation.stage()
+# Set rows_out (or call set_output) inside the stage when the output is not returned by a decorated function
+class Stage:
+    def __init__(self, name, parent, data_in):
+        self.name = name
+        self.parent = parent
+        self.thread = threading.current_thread().name
+        self.rows_in, self.columns_in = _shape(data_in)
+        self.rows_out = self.columns_out = None
+        self.started = None
+        self.seconds = None
+        self.peak_rss_mb = None
+        self.peak_traced_mb = None
+        self.error = None
+        self.details = None # Anything else worth reporting about the stage (e.g. the geocoder's hit/miss counts)
+
+    def set_output(self, data_out):
+        self.rows_out, self.columns_out = _shape(data_out)
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'parent': self.parent,
+            'thread': self.thread,
+            'seconds': self.seconds,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'columns_in': self.columns_in,
+            'columns_out': self.columns_out,
+            'peak_rss_mb': self.peak_rss_mb,
+            'peak_traced_mb': self.peak_traced_mb,
+            'error': self.error,
+            'details': self.details,
+        }
+
+
+# Registry of the stages of a run
+# Stages nest (a cleanup step is recorded under its queue_cleanup call) and can run in several threads at once
+# tracemalloc is process wide, so stages that overlap in different threads (the ISO fetches) share their traced peak
+class Instrumentation:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = []
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profiler = None
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def reset(self):
+        """Forget the stages recorded so far (e.g. at the start of another run in the same process)"""
+        with self._lock:
+            self.stages = []
+            self.started = time.time()
+
+    def trace_memory(self):
+        """Also record the peak Python memory of every stage with tracemalloc (slows the run down noticeably)"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name, data_in=None):
+        """Time a stage and record its rows/columns in and out and peak memory
+
+        Args:
+            name (str): Stage name
+            data_in (pandas.DataFrame): input of the stage, for its row and column count
+
+        Yields:
+            Stage: call set_output() with the stage's result to record its row and column count
+        """
+        stack = self._stack()
+        record = Stage(name, stack[-1].name if stack else None, data_in)
+        del data_in # Only its shape is needed, holding on to it would keep the frame (and any frame it was sliced from) alive
+        if not self.enabled:
+            yield record
+            return
+
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            # Keep the enclosing stage's peak so far before starting a new measurement for this one
+            if stack:
+                stack[-1].peak_traced_mb = max(stack[-1].peak_traced_mb or 0, tracemalloc.get_traced_memory()[1] / 1e6)
+            tracemalloc.reset_peak()
+
+        stack.append(record)
+        with self._lock:
+            self.stages.append(record)
+        record.started = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record.error = record.error or repr(e) # A step left open keeps the error it was ended with
+            raise
+        finally:
+            # Not on the stack when an exception left it open (a step) and the stage around it already ended it
+            if record in stack:
+                ended = time.perf_counter()
+                position = stack.index(record)
+                for open_record in stack[position:]: # Steps left open by an exception end with this stage
+                    open_record.seconds = round(ended - open_record.started, 4)
+                    open_record.peak_rss_mb = peak_rss_mb()
+                    open_record.error = open_record.error or record.error
+                if tracing:
+                    record.peak_traced_mb = round(max(record.peak_traced_mb or 0, tracemalloc.get_traced_memory()[1] / 1e6), 1)
+                del stack[position:]
+                if tracing and stack:
+                    stack[-1].peak_traced_mb = max(stack[-1].peak_traced_mb or 0, record.peak_traced_mb)
+
+    def timed(self, name=None):
+        """Decorator recording every call of a function as a stage
+
+        The first argument is taken as the stage's input and the return value as its output.
+        """
+        def decorator(function):
+            stage_name = name or function.__name__
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(stage_name, args[0] if args else None) as record:
+                    result = function(*args, **kwargs)
+                    record.set_output(result[0] if isinstance(result, tuple) else result)
+                    return result
+            return wrapper
+        return decorator
+
+    def steps(self):
+        """Record the steps of a long function one after another without indenting them
+
+        Call start(name, df) at the beginning of every step and finish(df) after the last one.
+        Each step ends when the next one starts.
+        """
+        return _Steps(self)
+
+    def start_profile(self):
+        """Start collecting a cProfile profile of the run"""
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+
+    def write_report(self, path='run_report.json', profile_path='run_profile.prof'):
+        """Write the JSON run report (and the cProfile dump if start_profile() was called)
+
+        Returns:
+            list: Paths of the files written
+        """
+        report = {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'seconds': round(time.time() - self.started, 2),
+            'peak_rss_mb': peak_rss_mb(),
+            'stages': [stage.as_dict() for stage in self.stages],
+        }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        paths = [path]
+
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(profile_path) # View with "python -m pstats run_profile.prof" or snakeviz
+            paths.append(profile_path)
+        return paths
+
+
+# Steps of one call of a long function (see Instrumentation.steps)
+class _Steps:
+    def __init__(self, instruments):
+        self.instruments = instruments
+        self._current = None
+
+    def start(self, name, df):
+        self.finish(df)
+        self._current = self.instruments.stage(name, df)
+        self._record = self._current.__enter__()
+
+    def finish(self, df):
+        if self._current is not None:
+            self._record.set_output(df)
+            self._current.__exit__(None, None, None)
+            self._current = None
+
+
+# Shared by every module, main.py decides whether to write the report
+STAGES = Instrumentation()
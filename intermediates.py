@@ -0,0 +1,28 @@
+# Author: Selorm Kwami Dzakpasu
+
+import os
+import pandas as pd
+
+# Results a pipeline run saves for a later run to start from (see PIPELINE_STAGES in "main.py")
+# Kept out of main.py so readers of the saved results (e.g. serve.py) don't import the whole pipeline
+
+# Folder the status partitions and cleaned queues of the last run are saved in
+PIPELINE_DIR = os.path.join('.cache', 'pipeline')
+
+
+def save_intermediate(name, data):
+    os.makedirs(PIPELINE_DIR, exist_ok=True)
+    path = intermediate_path(name)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pd.to_pickle(data, tmp_path)
+    os.replace(tmp_path, path)
+
+def load_intermediate(name):
+    path = intermediate_path(name)
+    if not os.path.exists(path):
+        raise RuntimeError(f"Nothing to resume from, {path} has not been saved by an earlier run")
+    return pd.read_pickle(path)
+
+# File a result is saved in ("partitions" or "cleaned")
+def intermediate_path(name):
+    return os.path.join(PIPELINE_DIR, f"{name}.pkl")
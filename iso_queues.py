@@ -0,0 +1,263 @@
+# Author: Selorm Kwami Dzakpasu
+
+import io
+import re
+import xml.etree.ElementTree as ET
+import pandas as pd
+from pandas.io.parsers import TextParser
+from instrumentation import STAGES
+
+# Parsers for the ISO queues main.py downloads itself (PJM and SPP) and the columns every ISO's queue has
+# Kept out of main.py so they can be used (e.g. by benchmark.py) without fetching anything
+# gridstatus is only imported by the parsers that need it
+
+# Files PJM and SPP publish their queues in
+PJM_QUEUE_URL = "https://www.pjm.com/pjmfiles/media/planning/queues-data/PlanningQueues.xml"
+SPP_QUEUE_URL = "https://opsportal.spp.org/Studies/GenerateSummaryCSV"
+
+# Status parse_spp_interconnection_queue() gives each SPP status (the values of gridstatus' InterconnectionQueueStatus)
+# Statuses not listed here are left blank, their original is kept in "Status (Original)"
+SPP_STATUSES = {
+    "IA FULLY EXECUTED/COMMERCIAL OPERATION": "Completed",
+    "IA FULLY EXECUTED/ON SCHEDULE": "Completed",
+    "IA FULLY EXECUTED/ON SUSPENSION": "Completed",
+    "IA PENDING": "Active",
+    "DISIS STAGE": "Active",
+    "None": "Active",
+    "WITHDRAWN": "Withdrawn",
+}
+
+# Columns of the formatted queue every ISO has (gridstatus' standard interconnection queue columns)
+STANDARD_COLUMNS = [
+    "Queue ID", "Project Name", "Interconnecting Entity", "County", "State", "Interconnection Location",
+    "Transmission Owner", "Generation Type", "Capacity (MW)", "Summer Capacity (MW)", "Winter Capacity (MW)",
+    "Queue Date", "Status", "Proposed Completion Date", "Withdrawn Date", "Withdrawal Comment", "Actual Completion Date",
+]
+
+# ISO specific columns (on top of the standard gridstatus columns) each queue contributes to the combined queue
+# Used to keep the combined queue's shape when an ISO fails to fetch
+ISO_COLUMNS = {
+    'NYISO': ['Proposed In-Service Date', 'Proposed Initial-Sync Date', 'Last Updated Date', 'Z', 'S', 'Availability of Studies',
+              'SGIA Tender Date'],
+    'CAISO': ['Type-1', 'Type-2', 'Type-3', 'Fuel-1', 'Fuel-2', 'Fuel-3', 'MW-1', 'MW-2', 'MW-3',
+              'Interconnection Request Receive Date', 'Interconnection Agreement Status', 'Study Process',
+              'Proposed On-line Date (as filed with IR)', 'System Impact Study or Phase I Cluster Study',
+              'Facilities Study (FAS) or Phase II Cluster Study', 'Optional Study (OS)', 'Full Capacity, Partial or Energy Only (FC/P/EO)',
+              'Off-Peak Deliverability and Economic Only', 'Feasibility Study or Supplemental Review'],
+    'SPP': ['In-Service Date', 'Commercial Operation Date', 'Cessation Date', 'Current Cluster', 'Cluster Group',
+            'Original Generator Commercial Op Date', 'Service Type', 'Status (Original)'],
+    'ERCOT': ['Fuel', 'Technology', 'GIM Study Phase', 'Screening Study Started', 'Screening Study Complete', 'FIS Requested',
+              'FIS Approved', 'Economic Study Required', 'IA Signed', 'Air Permit', 'GHG Permit', 'Water Availability',
+              'Meets Planning', 'Meets All Planning', 'CDR Reporting Zone', 'Approved for Energization',
+              'Approved for Synchronization', 'Comment'],
+    'MISO': ['facilityType', 'Post Generator Interconnection Agreement Status', 'Interconnection Approval Date', 'inService',
+             'giaToExec', 'studyCycle', 'studyGroup', 'studyPhase', 'svcType', 'dp1ErisMw', 'dp1NrisMw', 'dp2ErisMw',
+             'dp2NrisMw', 'sisPhase1'],
+    'NEISO': ['Updated', 'Unit', 'Op Date', 'Sync Date', 'Serv', 'I39', 'Dev', 'Zone', 'System Impact Study Completed',
+              'Feasiblity Study Status', 'System Impact Study Status', 'Optional Interconnection Study Status',
+              'Facilities Study Status', 'Interconnection Agreement Status', 'Project Status'],
+    'PJM': ['Service Type', 'MW In Service', 'Commercial Name', 'Initial Study', 'Feasibility Study', 'Feasibility Study Status',
+            'System Impact Study', 'System Impact Study Status', 'Facilities Study', 'Facilities Study Status',
+            'Interim-Interconnection Service-Generation Interconnection Agreement',
+            'Interim-Interconnection Service-Generation Interconnection Agreement-Status',
+            'Wholesale Market Participation Agreement', 'Construction Service Agreement', 'Construction Service Agreement Status',
+            'Upgrade Construction Service Agreement', 'Upgrade Construction Service Agreement Status', 'Backfeed Date',
+            'Long Term Firm Service Start Date', 'Long Term Firm Service End Date', 'Test Energy Date'],
+}
+
+
+# Drops a namespace from a tag or attribute name like read_xml does
+def _local_name(name):
+    return name.split("}")[1] if "}" in name else name
+
+# Reads the projects in PlanningQueues.xml one at a time, keeping only those of the given project type
+# Same result as pd.read_xml followed by the project type filter, without building the whole document tree in memory first:
+# the columns and their types come from every project (a field only other project types have is still a column,
+# and a value like "abc" on a transmission project keeps a generation project's "1" as text), then the other projects are dropped
+def read_pjm_xml(content, project_type="Generation Interconnection"):
+    columns = {} # Column name -> position, in the order read_xml finds them
+    rows = [] # Every project's values, by column position
+    keep = [] # Whether each project is of project_type
+    depth = 0
+    root = None
+    fields = None
+
+    for event, el in ET.iterparse(io.BytesIO(content), events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if depth == 1:
+                root = el
+            elif depth == 2: # A project
+                fields = {}
+            continue
+
+        if depth == 3: # A project field
+            fields[_local_name(el.tag)] = el.text if el.text else None
+
+        elif depth == 2:
+            # Attributes, then the project's own text, then its fields (the order read_xml puts them in)
+            project = {_local_name(name): value for name, value in el.attrib.items()}
+            if el.text and not el.text.isspace():
+                project[_local_name(el.tag)] = el.text
+            project.update(fields)
+
+            row = [None] * len(columns)
+            for col, value in project.items():
+                if col not in columns:
+                    columns[col] = len(columns)
+                    row.append(None)
+                row[columns[col]] = value
+            rows.append(row)
+            keep.append(project.get("ProjectType") == project_type)
+
+            # Free the parsed project
+            root.clear()
+
+        depth -= 1
+
+    # Infer column types over every project the same way pd.read_xml does
+    for row in rows:
+        row.extend([None] * (len(columns) - len(row)))
+    with TextParser(rows, names=list(columns)) as parser:
+        queue = parser.read()
+
+    # Drop other project types (e.g. transmission)
+    return queue[keep].reset_index(drop=True)
+
+# Formats the raw PlanningQueues.xml content
+def parse_pjm_interconnection_queue(content):
+    from gridstatus import utils
+
+    # Stream the XML content into a DataFrame of Generation Interconnection projects
+    queue = read_pjm_xml(content)
+    
+    # Update column names: add spaces between capital letters
+    queue.columns = [re.sub(r'(?<=[a-z])(?=[A-Z])', ' ', col) for col in queue.columns]
+    
+    # Add spaces after "MW"
+    queue.columns = [re.sub(r'(?<=MW)(?=[A-Z])', ' ', col) for col in queue.columns]
+
+    # Add spaces before "or"
+    queue.columns = [re.sub(r'(?<=\w)(or)(?=\w)', ' or ', col) for col in queue.columns]
+    
+    # print(queue.columns)
+
+    queue["Capacity (MW)"] = queue[["Maximum Facility Output", "MW In Service"]].min(axis=1)
+
+    rename = {
+        "Project Number": "Queue ID",
+        "Name": "Project Name",
+        "County": "County",
+        "State": "State",
+        "Transmission Owner": "Transmission Owner",
+        "Submitted Date": "Queue Date",
+        "Withdrawal Date": "Withdrawn Date",
+        "Withdrawn Remarks": "Withdrawal Comment",
+        "Status": "Status",
+        "Revised In Service Date": "Proposed Completion Date",
+        "Actual In Service Date": "Actual Completion Date",
+        "Fuel": "Generation Type",
+        "MW Capacity": "Summer Capacity (MW)",
+        "MW Energy": "Winter Capacity (MW)",
+        "Project Type": "Service Type"
+    }
+
+    extra = [
+        "Service Type",
+        "MW In Service",
+        "Commercial Name",
+        "Initial Study",
+        "Feasibility Study",
+        "Feasibility Study Status",
+        "System Impact Study",
+        "System Impact Study Status",
+        "Facilities Study",
+        "Facilities Study Status",
+        "Interim-Interconnection Service-Generation Interconnection Agreement",
+        "Interim-Interconnection Service-Generation Interconnection Agreement-Status",
+        "Wholesale Market Participation Agreement",
+        "Construction Service Agreement",
+        "Construction Service Agreement Status",
+        "Upgrade Construction Service Agreement",
+        "Upgrade Construction Service Agreement Status",
+        "Backfeed Date",
+        "Long Term Firm Service Start Date",
+        "Long Term Firm Service End Date",
+        "Test Energy Date"
+    ]
+
+    missing = ["Interconnecting Entity", "Interconnection Location"]
+
+    with STAGES.stage('PJM format_interconnection_df', queue) as stage:
+        queue = utils.format_interconnection_df(
+            queue,
+            rename,
+            extra=extra,
+            missing=missing,
+        )
+        stage.set_output(queue)
+
+    return queue # Only Generation Interconnection entries (filtered while reading the XML)
+
+# Formats the raw GenerateSummaryCSV content
+def parse_spp_interconnection_queue(content):
+    from gridstatus import utils
+
+    raw_data = io.BytesIO(content)
+    
+    queue = pd.read_csv(raw_data, skiprows=1)
+
+    queue["Status (Original)"] = queue["Status"]
+    queue["Status"] = queue["Status"].map(SPP_STATUSES)
+
+    queue["Generation Type"] = queue[["Generation Type", "Fuel Type"]].apply(
+        lambda x: " - ".join(x.dropna()),
+        axis=1,
+    )
+
+    queue["Proposed Completion Date"] = queue["Commercial Operation Date"]
+
+    rename = {
+        "Generation Interconnection Number": "Queue ID",
+        " Nearest Town or County": "County",
+        "State": "State",
+        "TO at POI": "Transmission Owner",
+        "Capacity": "Capacity (MW)",
+        "MAX Summer MW": "Summer Capacity (MW)",
+        "MAX Winter MW": "Winter Capacity (MW)",
+        "Generation Type": "Generation Type",
+        "Request Received": "Queue Date",
+        "Substation or Line": "Interconnection Location",
+        "Date Withdrawn": "Withdrawn Date",
+    }
+
+    # todo: there are a few columns being parsed
+    # as "unamed" that aren't being included but should
+    extra_columns = [
+        "In-Service Date",
+        "Commercial Operation Date",
+        "Cessation Date",
+        "Current Cluster",
+        "Cluster Group",
+        "Original Generator Commercial Op Date",
+        "Service Type",
+        "Status (Original)",
+    ]
+
+    missing = [
+        "Project Name",
+        "Interconnecting Entity",
+        "Withdrawal Comment",
+        "Actual Completion Date",
+    ]
+
+    with STAGES.stage('SPP format_interconnection_df', queue) as stage:
+        queue = utils.format_interconnection_df(
+            queue=queue,
+            rename=rename,
+            extra=extra_columns,
+            missing=missing,
+        )
+        stage.set_output(queue)
+
+    return queue
@@ -1,291 +1,466 @@
 # Author: Selorm Kwami Dzakpasu
 
-import gridstatus # Only compatible with Python 3.11
-import requests
+import argparse
 import pandas as pd
-from gridstatus import utils
-from gridstatus.base import InterconnectionQueueStatus
-import re
+import threading
+import time
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+from queue_cleanup import queue_cleanup
+from outputs import write_outputs, OUTPUT_WRITERS
+from downloads import HTTPCache
+from frame_cache import FrameCache
+from incremental import incremental_cleanup
+from history import record_history
+from geocode import Geocoder, geocode_partitions
+from dedupe import find_linked_projects
+from cube import update_cube, CUBE_PATH
+from parallel_cleanup import parallel_cleanup
+from chunked import run_chunked
+from intermediates import save_intermediate, load_intermediate
+from compaction import compact_queue_frame
+from status_rules import load_status_rules, compile_status_rules, split_by_status
+from schemas import load_schemas, compile_schemas, check_schema
+from instrumentation import STAGES
+from iso_queues import PJM_QUEUE_URL, SPP_QUEUE_URL, ISO_COLUMNS, parse_pjm_interconnection_queue, parse_spp_interconnection_queue
+
+# Set to True to also save the combined queues (before cleanup) to "Combined_ISO_Queues"
+WRITE_COMBINED_QUEUES = False
+
+# Set to False to keep the combined queue in the column types the ISOs publish (uses a lot more memory)
+COMPACT_COMBINED_QUEUES = True
+
+# Set to True to only clean the projects that are new or changed since the last run (the rest is reused from ".cache/snapshot")
+# Also saves the list of added, removed, status changed and updated projects to "Queue_Changes"
+INCREMENTAL_CLEANUP = False
+
+# Number of processes cleaning the Active/Withdrawn/Completed partitions at the same time (1 cleans them one after another)
+# CLEANUP_CHUNK_ROWS also splits each partition into chunks of that many rows so a big partition is spread over several processes
+# The cleaned queues are the same either way (incremental cleanup always runs in one process)
+CLEANUP_WORKERS = 1
+CLEANUP_CHUNK_ROWS = None
+
+# Set to a number of rows to split, clean and save the queues that many rows at a time, for queues too big to clean in memory at once
+# The cleaned queues are the same, but only Excel and CSV can be written that way, and the cleaned queues are not kept for
+# incremental cleanup, the history, the cube, linked projects or starting a later run at the write stage (they need the whole queues)
+CHUNKED_ROWS = None
+
+# Formats to save the queues in: any of 'excel', 'parquet', 'feather' (Arrow IPC) and 'csv' (gzip)
+# Excel writes a single workbook with a sheet per status, the others write one file per status
+OUTPUT_FORMATS = ['excel']
+
+# Cache of the raw PJM and SPP files (".cache/http" in the folder the script is run from)
+# Files are only downloaded again when the ISO publishes a new version, failed downloads are retried with backoff
+HTTP_CACHE = HTTPCache()
+
+# Cache of each ISO's formatted queue (".cache/frames")
+# PJM and SPP files are only parsed again when their bytes changed, and the last good queue of every ISO is kept for when a fetch fails
+FRAME_CACHE = FrameCache()
+
+# Set to Geocoder() to fill in Latitude/Longitude of the cleaned queues from the county gazetteer (and optional list of locations) in "gazetteer"
+# Off by default because the gazetteer isn't included (it is downloaded once from the Census Bureau, see "geocode.py" for the files it needs)
+# Nothing is looked up online
+GEOCODER = None
+
+# Set to True to also look for projects listed twice (by two ISOs, or as the components of a hybrid project)
+# Linked projects are saved to "Linked_Projects" for review, the cleaned queues are not changed
+# Off by default so a run only saves the cleaned queues unless the review file is wanted
+FIND_LINKED_PROJECTS = False
+
+# Use the last good cached queue when an ISO fails to fetch
+USE_STALE_QUEUES = True
+
+# Rules that split the combined queue into Active/Withdrawn/Completed, compiled once when the script starts
+# Edit "status_rules.json" to handle new status strings
+STATUS_CLASSIFIER = compile_status_rules(load_status_rules())
+
+# Expected columns, column types and statuses of every ISO's queue, checked right after it is fetched (None to skip it)
+# A queue that lost a column or whose statuses are all new is quarantined like a failed fetch, edit "iso_schemas.json" when an ISO changes on purpose
+SCHEMA_VALIDATOR = compile_schemas(load_schemas())
+
+# Where to save the run report (seconds, rows/columns in and out and peak memory of every fetch, parse and cleanup step), None to skip it
+RUN_REPORT = 'run_report.json'
+
+# Database every run's cleaned queues are added to (only the projects that changed), None to skip it
+# "python history.py project MISO J1234" lists a project's status history, "python history.py as-of 2025-01-01" saves the queues as of a date
+QUEUE_HISTORY = 'queue_history.sqlite'
+
+# Where to save the precomputed MW/project count rollups of the cleaned queues (rebuilt only when the queues change), None to skip it
+# "python cube.py State Technology --where Partition=Active" or query_cube() from "cube.py" answer summaries from it in milliseconds
+QUEUE_CUBE = CUBE_PATH
+
+# Set to True to also record the peak Python memory of every stage in the run report (uses tracemalloc, slows the run down)
+TRACE_MEMORY = False
+
+# Set to True to also save a cProfile profile of the whole run to "run_profile.prof"
+PROFILE_RUN = False
+
+# Download deadline of an ISO whose fetch has to be done by deadline (time.monotonic()), leaving PARSE_SECONDS to parse the file
+def download_deadline(deadline):
+    return None if deadline is None else deadline - PARSE_SECONDS
 
 # PJM Get Queue Function
-def get_pjm_interconnection_queue():
+def get_pjm_interconnection_queue(refresh=False, deadline=None):
     
-    # Fetch the XML data from the URL
-    url = "https://www.pjm.com/pjmfiles/media/planning/queues-data/PlanningQueues.xml"
-    response = requests.get(url)
-
-    # Use pandas to read the XML content directly into a DataFrame
-    queue = pd.read_xml(response.content)
-    
-    # Update column names: add spaces between capital letters
-    queue.columns = [re.sub(r'(?<=[a-z])(?=[A-Z])', ' ', col) for col in queue.columns]
-    
-    # Add spaces after "MW"
-    queue.columns = [re.sub(r'(?<=MW)(?=[A-Z])', ' ', col) for col in queue.columns]
-
-    # Add spaces before "or"
-    queue.columns = [re.sub(r'(?<=\w)(or)(?=\w)', ' or ', col) for col in queue.columns]
-    
-    # print(queue.columns)
-
-    queue["Capacity (MW)"] = queue[["Maximum Facility Output", "MW In Service"]].min(axis=1)
-
-    rename = {
-        "Project Number": "Queue ID",
-        "Name": "Project Name",
-        "County": "County",
-        "State": "State",
-        "Transmission Owner": "Transmission Owner",
-        "Submitted Date": "Queue Date",
-        "Withdrawal Date": "Withdrawn Date",
-        "Withdrawn Remarks": "Withdrawal Comment",
-        "Status": "Status",
-        "Revised In Service Date": "Proposed Completion Date",
-        "Actual In Service Date": "Actual Completion Date",
-        "Fuel": "Generation Type",
-        "MW Capacity": "Summer Capacity (MW)",
-        "MW Energy": "Winter Capacity (MW)",
-        "Project Type": "Service Type"
-    }
-
-    extra = [
-        "Service Type",
-        "MW In Service",
-        "Commercial Name",
-        "Initial Study",
-        "Feasibility Study",
-        "Feasibility Study Status",
-        "System Impact Study",
-        "System Impact Study Status",
-        "Facilities Study",
-        "Facilities Study Status",
-        "Interim-Interconnection Service-Generation Interconnection Agreement",
-        "Interim-Interconnection Service-Generation Interconnection Agreement-Status",
-        "Wholesale Market Participation Agreement",
-        "Construction Service Agreement",
-        "Construction Service Agreement Status",
-        "Upgrade Construction Service Agreement",
-        "Upgrade Construction Service Agreement Status",
-        "Backfeed Date",
-        "Long Term Firm Service Start Date",
-        "Long Term Firm Service End Date",
-        "Test Energy Date"
-    ]
-
-    missing = ["Interconnecting Entity", "Interconnection Location"]
-
-    queue = utils.format_interconnection_df(
-        queue,
-        rename,
-        extra=extra,
-        missing=missing,
-    )
-    
-    queue = queue[queue["Service Type"] == "Generation Interconnection"] # Returns only Generation Interconnection entries
-
+    # Fetch the XML data from the URL (or the cache if PJM hasn't changed it)
+    url = PJM_QUEUE_URL
+    with STAGES.stage('PJM download'):
+        response = HTTP_CACHE.get(url, refresh=refresh, deadline=download_deadline(deadline))
+
+    with STAGES.stage('PJM parse') as stage:
+        queue = FRAME_CACHE.parse('PJM', response.content, parse_pjm_interconnection_queue, sha256=response.sha256)
+        stage.set_output(queue)
     return queue
 
 # SPP Get Queue Function    
-def get_spp_interconnection_queue():
+def get_spp_interconnection_queue(refresh=False, deadline=None):
     """Get interconnection queue
 
+    Args:
+        refresh (bool): check with SPP even if the cached file is still fresh
+        deadline (float): time.monotonic() the queue has to be fetched by (the download gives up PARSE_SECONDS before it)
+
     Returns:
         pandas.DataFrame: Interconnection queue
     """
-    url = "https://opsportal.spp.org/Studies/GenerateSummaryCSV"
-    response = requests.get(url)
-    raw_data = utils.get_response_blob(response)
-    
-    queue = pd.read_csv(raw_data, skiprows=1)
-
-    queue["Status (Original)"] = queue["Status"]
-    completed_val = InterconnectionQueueStatus.COMPLETED.value
-    active_val = InterconnectionQueueStatus.ACTIVE.value
-    withdrawn_val = InterconnectionQueueStatus.WITHDRAWN.value
-    queue["Status"] = queue["Status"].map(
-        {
-            "IA FULLY EXECUTED/COMMERCIAL OPERATION": completed_val,
-            "IA FULLY EXECUTED/ON SCHEDULE": completed_val,
-            "IA FULLY EXECUTED/ON SUSPENSION": completed_val,
-            "IA PENDING": active_val,
-            "DISIS STAGE": active_val,
-            "None": active_val,
-            "WITHDRAWN": withdrawn_val,
-        },
-    )
-
-    queue["Generation Type"] = queue[["Generation Type", "Fuel Type"]].apply(
-        lambda x: " - ".join(x.dropna()),
-        axis=1,
-    )
-
-    queue["Proposed Completion Date"] = queue["Commercial Operation Date"]
-
-    rename = {
-        "Generation Interconnection Number": "Queue ID",
-        " Nearest Town or County": "County",
-        "State": "State",
-        "TO at POI": "Transmission Owner",
-        "Capacity": "Capacity (MW)",
-        "MAX Summer MW": "Summer Capacity (MW)",
-        "MAX Winter MW": "Winter Capacity (MW)",
-        "Generation Type": "Generation Type",
-        "Request Received": "Queue Date",
-        "Substation or Line": "Interconnection Location",
-        "Date Withdrawn": "Withdrawn Date",
-    }
-
-    # todo: there are a few columns being parsed
-    # as "unamed" that aren't being included but should
-    extra_columns = [
-        "In-Service Date",
-        "Commercial Operation Date",
-        "Cessation Date",
-        "Current Cluster",
-        "Cluster Group",
-        "Original Generator Commercial Op Date",
-        "Service Type",
-        "Status (Original)",
-    ]
-
-    missing = [
-        "Project Name",
-        "Interconnecting Entity",
-        "Withdrawal Comment",
-        "Actual Completion Date",
-    ]
-
-    queue = utils.format_interconnection_df(
-        queue=queue,
-        rename=rename,
-        extra=extra_columns,
-        missing=missing,
-    )
+    url = SPP_QUEUE_URL
+    with STAGES.stage('SPP download'):
+        response = HTTP_CACHE.get(url, refresh=refresh, deadline=download_deadline(deadline))
 
+    with STAGES.stage('SPP parse') as stage:
+        queue = FRAME_CACHE.parse('SPP', response.content, parse_spp_interconnection_queue, sha256=response.sha256)
+        stage.set_output(queue)
     return queue
 
-# NYISO
-nyiso = gridstatus.NYISO()
-nyiso_queue = nyiso.get_interconnection_queue()
-nyiso_queue['Balancing Authority Code'] = 'NYISO' # Adding Balancing Authority Code column
-nyiso_queue['Balancing Authority Name'] = 'New York Independent System Operator' # Adding Balancing Authority Name column
-nyiso_queue['Latitude'] = None # Adding Latitude column
-nyiso_queue['Longitude'] = None # Adding Longitude column
-# nyiso_queue.to_excel("test.xlsx", index=False, engine='openpyxl')
-
-
-# CAISO
-caiso = gridstatus.CAISO()
-caiso_queue = caiso.get_interconnection_queue()
-caiso_queue['Balancing Authority Code'] = 'CAISO'
-caiso_queue['Balancing Authority Name'] = 'California Independent System Operator'
-caiso_queue['Latitude'] = None
-caiso_queue['Longitude'] = None
-# caiso_queue.to_excel("test1.xlsx", index=False, engine='openpyxl')
-
-
-# SPP
-spp_queue = get_spp_interconnection_queue()
-spp_queue['Balancing Authority Code'] = 'SPP'
-spp_queue['Balancing Authority Name'] = 'Southwest Power Pool'
-spp_queue['Latitude'] = None 
-spp_queue['Longitude'] = None 
-# spp_queue.to_excel("test2.xlsx", index=False, engine='openpyxl')
-
-
-# ERCOT
-ercot = gridstatus.Ercot()
-ercot_queue = ercot.get_interconnection_queue()
-ercot_queue['Balancing Authority Code'] = 'ERCOT'
-ercot_queue['Balancing Authority Name'] = 'Electric Reliability Council of Texas'
-ercot_queue['Latitude'] = None
-ercot_queue['Longitude'] = None 
-# ercot_queue.to_excel("test3.xlsx", index=False, engine='openpyxl')
-
-
-# MISO
-miso = gridstatus.MISO()
-miso_queue = miso.get_interconnection_queue()
-miso_queue['Balancing Authority Code'] = 'MISO'
-miso_queue['Balancing Authority Name'] = 'Midcontinent Independent Transmission System Operator'
-miso_queue['Latitude'] = None
-miso_queue['Longitude'] = None 
-# miso_queue.to_excel("test4.xlsx", index=False, engine='openpyxl')
-
-
-# NEISO
-isone = gridstatus.ISONE()
-neiso_queue = isone.get_interconnection_queue()
-neiso_queue['Balancing Authority Code'] = 'NEISO'
-neiso_queue['Balancing Authority Name'] = 'New England Independent System Operator'
-neiso_queue['Latitude'] = None
-neiso_queue['Longitude'] = None 
-# neiso_queue.to_excel("test5.xlsx", index=False, engine='openpyxl')
-
-
-# PJM
-# pjm_queue = requests.get("https://www.pjm.com/pjmfiles/media/planning/queues-data/PlanningQueues.xml")
-# with open("pjm_queue.xml", "wb") as f:
-#     f.write(pjm_queue.content) # Saves fetched file
-
-pjm_queue = get_pjm_interconnection_queue()
-pjm_queue['Balancing Authority Code'] = 'PJM'
-pjm_queue['Balancing Authority Name'] = 'PJM Interconnection, LLC'
-pjm_queue['Latitude'] = None
-pjm_queue['Longitude'] = None 
-# pjm_queue.to_excel("test6.xlsx", index=False, engine='openpyxl')
-
-
-# Combine all queues
-queues = [nyiso_queue, caiso_queue, spp_queue, ercot_queue, miso_queue, neiso_queue, pjm_queue]
-combined_df = pd.concat(queues, ignore_index=True)
-
-# List of statuses to remove (Withdrawn/Deactivated)
-statuses_withdrawn = [
-    "Annulled", "Canceled", "Deactivated", "Retracted", "Suspended", "WITHDRAWN", "Withdrawn"
-]
-
-# Create a DataFrame for entries with withdrawn status
-withdrawn_df_1 = combined_df[combined_df["Status"].isin(statuses_withdrawn)] # Check "Status" for withdrawn entries
-not_withdrawn_df = combined_df[~combined_df["Status"].isin(statuses_withdrawn)]
-
-withdrawn_df_2 = not_withdrawn_df[not_withdrawn_df["Status (Original)"] == "TERMINATED"] # Check "Status (Original)" for terminated entries
-
-withdrawn = [withdrawn_df_1, withdrawn_df_2]
-withdrawn_df = pd.concat(withdrawn, ignore_index=True)
+# Fetcher for an ISO whose queue gridstatus downloads and formats
+# gridstatus is only imported once one of these ISOs is fetched (it has no cache or timeout, so refresh and deadline change nothing)
+def gridstatus_fetcher(iso_class):
+    def fetch(refresh=False, deadline=None):
+        import gridstatus # Only compatible with Python 3.11
+        return getattr(gridstatus, iso_class)().get_interconnection_queue()
+    return fetch
+
+# Balancing Authority Name and queue fetcher for each ISO, keyed by Balancing Authority Code
+# The order here is the order the queues are combined in
+ISO_SOURCES = {
+    'NYISO': ('New York Independent System Operator', gridstatus_fetcher('NYISO')),
+    'CAISO': ('California Independent System Operator', gridstatus_fetcher('CAISO')),
+    'SPP': ('Southwest Power Pool', get_spp_interconnection_queue),
+    'ERCOT': ('Electric Reliability Council of Texas', gridstatus_fetcher('Ercot')),
+    'MISO': ('Midcontinent Independent Transmission System Operator', gridstatus_fetcher('MISO')),
+    'NEISO': ('New England Independent System Operator', gridstatus_fetcher('ISONE')),
+    'PJM': ('PJM Interconnection, LLC', get_pjm_interconnection_queue),
+}
+
+# Seconds to wait for each ISO before giving up on it (PJM's website is the slowest)
+DEFAULT_FETCH_TIMEOUT = 600
+ISO_FETCH_TIMEOUTS = {'PJM': 900}
+
+# Seconds of an ISO's timeout kept for parsing its file, PJM and SPP downloads (and their retries) give up this long before the timeout
+PARSE_SECONDS = 60
+
+# Fetch a single ISO queue and add the Balancing Authority columns
+# refresh checks with the ISO even if the cached file is still fresh, and never falls back to a stale queue
+# deadline is the time.monotonic() the fetch is given up at, passed on so the download stops retrying in time
+def fetch_iso_queue(code, refresh=False, deadline=None):
+    name, fetcher = ISO_SOURCES[code]
+    try:
+        # Times the whole fetch (gridstatus ISOs download, parse and format in one call)
+        with STAGES.stage(f'{code} fetch') as stage:
+            queue = fetcher(refresh=refresh, deadline=deadline)
+            stage.set_output(queue)
+        # Catch a format change now, before the other ISOs are combined with it (raises SchemaDriftError)
+        if SCHEMA_VALIDATOR:
+            check_schema(SCHEMA_VALIDATOR, code, queue)
+    except Exception as e:
+        # Fall back to the last good queue so one flaky ISO doesn't leave a hole in the output
+        queue = load_stale_queue(code, e, refresh)
+        if queue is None:
+            raise
+        return queue
+    FRAME_CACHE.remember(code, queue)
+    return add_balancing_authority(queue, code)
+
+# Last good queue of an ISO whose fetch failed or timed out, None when there is none (or USE_STALE_QUEUES is off, or refresh is set)
+def load_stale_queue(code, error, refresh=False):
+    cached = FRAME_CACHE.load_latest(code) if USE_STALE_QUEUES and not refresh else None
+    if cached is None:
+        return None
+    queue, saved = cached
+    print(f"{code}: fetch failed ({error!r}), using the queue cached on {time.strftime('%m/%d/%Y %H:%M', time.localtime(saved))}")
+    return add_balancing_authority(queue, code)
+
+# Last good queue of an ISO from FRAME_CACHE, without fetching
+def load_cached_queue(code):
+    cached = FRAME_CACHE.load_latest(code)
+    if cached is None:
+        raise RuntimeError(f"No cached {code} queue, run the fetch stage first")
+    return add_balancing_authority(cached[0], code)
+
+def add_balancing_authority(queue, code):
+    name = ISO_SOURCES[code][0]
+    queue['Balancing Authority Code'] = code # Adding Balancing Authority Code column
+    queue['Balancing Authority Name'] = name # Adding Balancing Authority Name column
+    queue['Latitude'] = None # Adding Latitude column
+    queue['Longitude'] = None # Adding Longitude column
+    return queue
 
-# Remove rows with withdrawn/terminated status from the main dataframe
-combined_df = combined_df[~combined_df["Status"].isin(statuses_withdrawn)]
-combined_df = combined_df[combined_df["Status (Original)"] != "TERMINATED"]
+# Runs function(*args) in a daemon thread and returns a Future with its result
+# A fetch past its deadline can't be stopped, and a daemon thread (unlike a ThreadPoolExecutor's) doesn't hold up the interpreter's exit waiting for it
+def run_in_daemon_thread(name, function, *args):
+    future = Future()
 
-# Create a DataFrame for entries with in-service status
-completed_df_1 = combined_df[combined_df["Status"] == "In Service"]
-active_df_1 = combined_df[combined_df["Status"] != "In Service"]
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(function(*args))
+        except BaseException as e:
+            future.set_exception(e)
 
-completed_df_2 = active_df_1[active_df_1["Status (Original)"] == "IA FULLY EXECUTED/COMMERCIAL OPERATION"]
-active_df_2 = active_df_1[active_df_1["Status (Original)"] != "IA FULLY EXECUTED/COMMERCIAL OPERATION"]
+    threading.Thread(target=run, name=name, daemon=True).start()
+    return future
 
-completed_df_3 = active_df_2[active_df_2["Project Status"] == "In Service"]
-active_df_3 = active_df_2[active_df_2["Project Status"] != "In Service"]
+# Fetch all ISO queues at the same time
+def fetch_all_queues(isos=None, timeouts=None, refresh=False):
+    """Fetch interconnection queues concurrently, one daemon thread per ISO
 
-# Ensure the "S" column is converted to integers
-completed_df_4 = active_df_3[active_df_3["S"] == 14] # "14" represents "In Service Commercial"
-active_df_4 = active_df_3[active_df_3["S"] != 14]
+    Args:
+        isos (list): Balancing Authority Codes to fetch. Defaults to all of ISO_SOURCES.
+        timeouts (dict): Seconds to wait per Balancing Authority Code. Defaults to ISO_FETCH_TIMEOUTS.
+        refresh (bool): Passed on to fetch_iso_queue
 
-completed_df_5 = active_df_4[active_df_4["Post Generator Interconnection Agreement Status"] == "In Service"]
-active_df_5 = active_df_4[active_df_4["Post Generator Interconnection Agreement Status"] != "In Service"]
+    Returns:
+        tuple: (queues, errors) dicts keyed by Balancing Authority Code.
+            queues holds the fetched DataFrames in ISO_SOURCES order, errors the exception for every ISO that failed
+            (a SchemaDriftError for a queue quarantined because it doesn't match its schema).
+            An ISO that failed or timed out with a last good queue cached (USE_STALE_QUEUES) is in queues with that queue instead.
+    """
+    isos = list(ISO_SOURCES) if isos is None else list(isos)
+    timeouts = {**ISO_FETCH_TIMEOUTS, **(timeouts or {})}
+
+    results = {}
+    errors = {}
+
+    started = time.monotonic()
+    deadlines = {code: started + timeouts.get(code, DEFAULT_FETCH_TIMEOUT) for code in isos}
+    pending = {run_in_daemon_thread(f'fetch-{code}', fetch_iso_queue, code, refresh, deadlines[code]): code for code in isos}
+
+    # Collect results as they finish, waking up early enough to enforce the nearest deadline
+    while pending:
+        next_deadline = min(deadlines[code] for code in pending.values())
+        done, _ = wait(pending, timeout=max(next_deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+
+        for future in done:
+            code = pending.pop(future)
+            try:
+                results[code] = future.result()
+                print(f"{code}: {len(results[code])} rows in {time.monotonic() - started:.1f}s")
+            except Exception as e: # One ISO failing should not throw away the others
+                errors[code] = e
+                print(f"{code}: failed ({e!r})")
+
+        # Give up on any ISO past its deadline (the thread is abandoned, not killed, and ends with the interpreter)
+        now = time.monotonic()
+        for future, code in list(pending.items()):
+            if now >= deadlines[code]:
+                pending.pop(future)
+                error = TimeoutError(f"{code} did not finish within {timeouts.get(code, DEFAULT_FETCH_TIMEOUT)}s")
+                print(f"{code}: timed out")
+                stale = load_stale_queue(code, error, refresh)
+                if stale is None:
+                    errors[code] = error
+                else:
+                    results[code] = stale
+
+    queues = {code: results[code] for code in isos if code in results}
+    return queues, errors
 
-completed = [completed_df_1, completed_df_2, completed_df_3, completed_df_4, completed_df_5]
-completed_df = pd.concat(completed, ignore_index=True)
 
-# Active entries remain after removing rows with in service status from the main dataframe
-active_df = active_df_5
+# PJM
+# pjm_queue = requests.get("https://www.pjm.com/pjmfiles/media/planning/queues-data/PlanningQueues.xml")
+# with open("pjm_queue.xml", "wb") as f:
+#     f.write(pjm_queue.content) # Saves fetched file
 
-# Export DataFrames to an Excel file
-with pd.ExcelWriter("Combined_ISO_Queues.xlsx", engine='openpyxl') as writer: # "Combined_ISO_Queues.xlsx" can be replaced with the desired file path & name
-    active_df.to_excel(writer, index=False, sheet_name="Active") # Active entries
-    withdrawn_df.to_excel(writer, index=False, sheet_name="Withdrawn") # Withdrawn/deactivated entries
-    completed_df.to_excel(writer, index=False, sheet_name="Completed") # Entries with completed/in-service status
+# Stages of the pipeline, in order
+#   fetch:   download the ISO queues
+#   split:   combine the queues and split them into Active/Withdrawn/Completed
+#   cleanup: clean the status partitions
+#   write:   save the cleaned queues
+# A run can stop after any stage, and start at a later one with the results an earlier run saved:
+# starting at split uses the cached ISO queues (".cache/frames"), cleanup and write the partitions/cleaned queues in PIPELINE_DIR ("intermediates.py")
+PIPELINE_STAGES = ['fetch', 'split', 'cleanup', 'write']
+
+
+# Combine the ISO queues into one DataFrame and split it by status
+def split_queues(queues):
+    # Combine all queues
+    combined_df = pd.concat(list(queues.values()), ignore_index=True)
+
+    # Add back the columns of any ISO that is missing (failed or not requested) or dropped a column, so the status split and cleanup still find them
+    for columns in ISO_COLUMNS.values():
+        for col in columns:
+            if col not in combined_df.columns:
+                combined_df[col] = None
+
+    # Store the combined queue with compact column types (categoricals, nullable numbers), the cleaned queues come out the same without it
+    if COMPACT_COMBINED_QUEUES:
+        combined_df, _ = compact_queue_frame(combined_df)
+
+    # Split into Active, Withdrawn (withdrawn/deactivated/terminated) and Completed (in service) entries
+    # The rules are in "status_rules.json", rows no rule matches stay Active and are listed in the second value returned
+    return split_by_status(combined_df, STATUS_CLASSIFIER)
+
+
+def run_pipeline(isos=None, outputs=None, cache=True, start='fetch', stop='write', incremental=None, workers=None, chunk_rows=None,
+                 history=None, report=None, chunked=None):
+    """Fetch, combine, clean and save the ISO interconnection queues
+
+    Args:
+        isos (list): Balancing Authority Codes to include. Defaults to all of ISO_SOURCES.
+        outputs (list): Output formats, see OUTPUT_FORMATS (the default)
+        cache (bool): False to check the PJM/SPP files with their servers even if the cached files are still fresh,
+            and to fail instead of using a stale queue when an ISO can't be fetched
+        start (str): Stage of PIPELINE_STAGES to start at, the earlier stages' results are loaded from the last run
+        stop (str): Last stage of PIPELINE_STAGES to run
+        incremental (bool): Only clean projects that are new or changed since the last run. Defaults to INCREMENTAL_CLEANUP.
+        workers (int): Number of processes cleaning the partitions. Defaults to CLEANUP_WORKERS.
+        chunk_rows (int): Rows per cleanup chunk when workers > 1. Defaults to CLEANUP_CHUNK_ROWS.
+        history (str): History database the cleaned queues are added to. Defaults to QUEUE_HISTORY, False to skip it.
+        report (str): Where to save the run report. Defaults to RUN_REPORT, False to skip it.
+        chunked (int): Split, clean and save the queues this many rows at a time (see "chunked.py"). Defaults to CHUNKED_ROWS.
 
-# Run Queue Cleanup
-exec(open("queue_cleanup.py").read())
\ No newline at end of file
+    Returns:
+        dict: Results of the stages that ran: "queues" and "errors" (fetch), "partitions" and "unmatched" (split),
+            "cleaned", "changes" and "geocoding" (cleanup), "cube", "linked" (groups and pairs), "paths" and "history" (write)
+            A chunked run gives "queues" and "errors", then "rows" (per partition), "unmatched", "geocoding" and "paths"
+    """
+    isos = list(ISO_SOURCES) if isos is None else [code for code in ISO_SOURCES if code in isos]
+    outputs = OUTPUT_FORMATS if outputs is None else outputs
+    incremental = INCREMENTAL_CLEANUP if incremental is None else incremental
+    workers = CLEANUP_WORKERS if workers is None else workers
+    chunk_rows = CLEANUP_CHUNK_ROWS if chunk_rows is None else chunk_rows
+    history = QUEUE_HISTORY if history is None else history
+    report = RUN_REPORT if report is None else report
+    chunked = CHUNKED_ROWS if chunked is None else chunked
+    first, last = PIPELINE_STAGES.index(start), PIPELINE_STAGES.index(stop)
+    if first > last:
+        raise ValueError(f"Can't start at {start} and stop at {stop}")
+    if chunked and (first > PIPELINE_STAGES.index('split') or stop != 'write'):
+        raise ValueError("A chunked run splits, cleans and saves the queues in one go, it has to start at fetch or split and stop at write")
+    runs = lambda stage: first <= PIPELINE_STAGES.index(stage) <= last
+
+    STAGES.reset()
+    if TRACE_MEMORY:
+        STAGES.trace_memory()
+    if PROFILE_RUN:
+        STAGES.start_profile()
+
+    results = {}
+
+    # Fetch the queues (or take the last good ones from the cache when starting at split)
+    if runs('fetch'):
+        iso_queues, fetch_errors = fetch_all_queues(isos, refresh=not cache)
+        if not iso_queues:
+            raise RuntimeError(f"All ISO queue fetches failed: {fetch_errors}")
+        if fetch_errors:
+            print(f"Continuing without: {', '.join(fetch_errors)}")
+        results.update(queues=iso_queues, errors=fetch_errors)
+    elif runs('split'):
+        results.update(queues={code: load_cached_queue(code) for code in isos}, errors={})
+
+    # Split, clean and save the queues a chunk of rows at a time, which does all the stages below
+    if chunked:
+        results.update(run_chunked(results['queues'], STATUS_CLASSIFIER, outputs, chunked, geocoder=GEOCODER,
+                                   compact=COMPACT_COMBINED_QUEUES))
+        last = PIPELINE_STAGES.index('fetch')
+
+    if runs('split'):
+        partitions, status_unmatched = split_queues(results['queues'])
+        save_intermediate('partitions', partitions)
+        results.update(partitions=partitions, unmatched=status_unmatched)
+
+        # Export DataFrames (only needed to inspect the queues before cleanup or to rerun queue_cleanup.py on its own)
+        if WRITE_COMBINED_QUEUES:
+            write_outputs(partitions, outputs, name="Combined_ISO_Queues") # "Combined_ISO_Queues" can be replaced with the desired file name
+    elif runs('cleanup'):
+        partitions = load_intermediate('partitions')
+        # Only the requested ISOs
+        results['partitions'] = {name: df[df['Balancing Authority Code'].isin(isos)] for name, df in partitions.items()}
+
+    # Run Queue Cleanup on the DataFrames in memory
+    if runs('cleanup'):
+        if incremental:
+            # Only new/changed projects are cleaned, the rest is reused from the last run
+            cleaned, changes = incremental_cleanup(results['partitions'])
+            results['changes'] = changes
+        elif workers > 1:
+            cleaned = parallel_cleanup(results['partitions'], workers, chunk_rows)
+        else:
+            cleaned = {name: queue_cleanup(df) for name, df in results['partitions'].items()}
+
+        # Fill in Latitude/Longitude from the offline gazetteers
+        if GEOCODER:
+            cleaned, results['geocoding'] = geocode_partitions(cleaned, GEOCODER)
+        save_intermediate('cleaned', cleaned)
+        results['cleaned'] = cleaned
+    elif runs('write'):
+        cleaned = load_intermediate('cleaned')
+        results['cleaned'] = {name: df[df['Balancing Authority Code'].isin(isos)].reset_index(drop=True) for name, df in cleaned.items()}
+
+    # Save the cleaned DataFrames
+    if runs('write'):
+        paths = write_outputs(results['cleaned'], outputs) # Defaults to "Cleaned_ISO_Queues"
+        if 'changes' in results:
+            paths += write_outputs({'Changes': results['changes']}, outputs, name='Queue_Changes') # Added/removed/status changed/updated projects
+        if QUEUE_CUBE and set(isos) == set(ISO_SOURCES):
+            results['cube'] = update_cube(results['cleaned'], QUEUE_CUBE)
+        elif QUEUE_CUBE: # The cube summarizes every ISO, a run of a few of them would replace it with just theirs
+            print(f"Cube not updated, only {', '.join(isos)} were run")
+        if FIND_LINKED_PROJECTS:
+            groups, pairs = results['linked'] = find_linked_projects(results['cleaned'])
+            paths += write_outputs({'Groups': groups, 'Pairs': pairs}, outputs, name='Linked_Projects')
+        results['paths'] = paths
+
+        # Add the cleaned queues to the history (only when the queues were fetched by this run, so every run date has the queues of that date)
+        if history and runs('fetch'):
+            results['history'] = record_history(results['cleaned'], isos=list(results['queues']), path=history)
+
+    # Save the run report (and profile)
+    if report:
+        print(f"Run report saved to {', '.join(STAGES.write_report(report))}")
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch, combine and clean the ISO interconnection queues")
+    parser.add_argument('--iso', nargs='+', choices=list(ISO_SOURCES), help="ISOs to include (default: all)")
+    parser.add_argument('--output', nargs='+', choices=list(OUTPUT_WRITERS), help=f"Output formats (default: {' '.join(OUTPUT_FORMATS)})")
+    parser.add_argument('--no-cache', action='store_true', help="Check every cached file with its ISO and never use a stale queue")
+    parser.add_argument('--start', choices=PIPELINE_STAGES, default='fetch', help="Stage to start at, using the earlier stages' results from the last run")
+    parser.add_argument('--stop', choices=PIPELINE_STAGES, default='write', help="Last stage to run")
+    parser.add_argument('--incremental', action=argparse.BooleanOptionalAction, default=INCREMENTAL_CLEANUP,
+                        help="Only clean projects that are new or changed since the last run")
+    parser.add_argument('--workers', type=int, default=CLEANUP_WORKERS, help="Number of processes cleaning the partitions")
+    parser.add_argument('--chunk-rows', type=int, default=CLEANUP_CHUNK_ROWS, help="Split partitions into chunks of this many rows for the cleanup processes")
+    parser.add_argument('--chunked', type=int, default=CHUNKED_ROWS, metavar='ROWS',
+                        help="Split, clean and save the queues this many rows at a time (for queues too big to clean in memory)")
+    parser.add_argument('--history', default=QUEUE_HISTORY, help="History database to add the cleaned queues to ('' to skip it)")
+    parser.add_argument('--report', default=RUN_REPORT, help="Where to save the run report")
+    parser.add_argument('--trace-memory', action='store_true', help="Record each stage's peak Python memory in the run report")
+    parser.add_argument('--profile', action='store_true', help="Save a cProfile profile of the run")
+    args = parser.parse_args(argv)
+
+    if args.trace_memory:
+        STAGES.trace_memory()
+    if args.profile:
+        STAGES.start_profile()
+
+    run_pipeline(args.iso, args.output, cache=not args.no_cache, start=args.start, stop=args.stop,
+                 incremental=args.incremental, workers=args.workers,
+                 chunk_rows=args.chunk_rows, history=args.history, report=args.report, chunked=args.chunked)
+
+
+# Running this file runs the whole pipeline (see "python main.py --help" for running part of it)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# Author: Selorm Kwami Dzakpasu
+
+import gzip
+import os
+import pandas as pd
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from instrumentation import STAGES
+
+# Date columns of the cleaned queues
+# "Queue Date" and "Planned Operation Date" are datetime after queue_cleanup() and saved to Excel as short dates (MM/DD/YYYY)
+# In the combined queues (WRITE_COMBINED_QUEUES) all four are still text in each ISO's own format
+SHORT_DATE_COLUMNS = ['Queue Date', 'Planned Operation Date']
+RAW_DATE_COLUMNS = ['Withdrawal Date', 'Cessation Date']
+
+# Whole number columns that hold blanks (stored as nullable integers instead of floats)
+NULLABLE_INT_COLUMNS = ['Planned Operation Month', 'Planned Operation Year']
+
+# Numeric columns that can come through as object (e.g. Latitude/Longitude are filled with None)
+FLOAT_COLUMNS = ['Latitude', 'Longitude', 'MW-1', 'MW-2', 'MW-3']
+
+
+# Date column as datetime64, dates already parsed by queue_cleanup() are kept as they are
+# Text dates can be in any format (each ISO has its own) and drop any time after a "T", text that isn't a date is reported and left blank
+def _as_dates(values, name):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    text = values.astype('string').str.replace(r'(?<=\d)T.*$', '', regex=True).str.strip()
+    dates = pd.to_datetime(text, format='mixed', errors='coerce')
+    not_dates = dates.isna() & text.notna() & (text != '')
+    if not_dates.any():
+        print(f"{name}: {not_dates.sum()} values that aren't dates saved as blanks (e.g. {text[not_dates].iloc[0]!r})")
+    return dates
+
+# Converts a partition to proper column types for the columnar formats
+# Dates become datetime64, whole numbers nullable integers and the remaining mixed object columns strings
+def typed_partition(df):
+    df = df.copy()
+
+    for col in SHORT_DATE_COLUMNS + RAW_DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = _as_dates(df[col], col)
+
+    for col in NULLABLE_INT_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
+
+    for col in FLOAT_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+
+    # Mixed object columns (e.g. Queue IDs that are numbers for some ISOs and text for others) can't be stored by Arrow
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].astype('string')
+
+    return df.reset_index(drop=True)
+
+
+# Excel number format of the date cells (Excel short date)
+EXCEL_DATE_FORMAT = 'mm/dd/yyyy'
+
+
+# Rows of a partition as lists of Python values (dates as Timestamps), blanks as None
+# Columns are converted once each instead of cell by cell, mixed columns keep their values as they are (numbers stay numbers)
+def _excel_rows(df):
+    columns = []
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = values.dt.tz_localize(None) if values.dt.tz is not None else values # Excel has no time zones
+        values = values.astype(object)
+        columns.append(values.where(values.notna(), None).tolist())
+    return zip(*columns)
+
+
+# Writes a workbook a chunk of rows at a time with openpyxl's write-only mode, without building every cell in memory like pd.ExcelWriter does
+# Sheets are created up front in the order given, each sheet's header is written with its first chunk
+class _OpenpyxlStream:
+    def __init__(self, path, sheets):
+        self.path = path
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.bold = Font(bold=True)
+        self.worksheets = {name: self.workbook.create_sheet(name) for name in sheets}
+        self.started = set()
+        self.paths = [path]
+
+    def append(self, name, df):
+        worksheet = self.worksheets[name]
+        if name not in self.started:
+            header = []
+            for col in df.columns:
+                cell = WriteOnlyCell(worksheet, value=str(col))
+                cell.font = self.bold
+                header.append(cell)
+            worksheet.append(header)
+            self.started.add(name)
+
+        date_columns = [i for i, col in enumerate(df.columns) if pd.api.types.is_datetime64_any_dtype(df[col])]
+        for values in _excel_rows(df):
+            values = list(values)
+            for i in date_columns:
+                if values[i] is not None:
+                    cell = WriteOnlyCell(worksheet, value=values[i])
+                    cell.number_format = EXCEL_DATE_FORMAT
+                    values[i] = cell
+            worksheet.append(values)
+
+    def close(self):
+        self.workbook.save(self.path)
+
+# Gzip CSV files (one per partition) written a chunk of rows at a time
+class _CSVStream:
+    def __init__(self, base_path, sheets):
+        self.file_paths = {name: f"{base_path}_{name}.csv.gz" for name in sheets}
+        self.files = {}
+        self.paths = list(self.file_paths.values())
+
+    def append(self, name, df):
+        first = name not in self.files
+        if first:
+            self.files[name] = gzip.open(self.file_paths[name], 'wt', newline='', encoding='utf-8')
+        typed_partition(df).to_csv(self.files[name], index=False, header=first, date_format='%Y-%m-%d')
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+
+def excel_stream(base_path, sheets):
+    return _OpenpyxlStream(f"{base_path}.xlsx", sheets)
+
+def csv_stream(base_path, sheets):
+    return _CSVStream(base_path, sheets)
+
+
+# Writers for each output format
+# Each takes the partitions ({sheet/partition name: DataFrame}) and a base path without extension and returns the files written
+def write_excel(partitions, base_path):
+    stream = excel_stream(base_path, list(partitions))
+    for name, df in partitions.items():
+        stream.append(name, df)
+    stream.close()
+    return stream.paths
+
+def write_parquet(partitions, base_path):
+    paths = []
+    for name, df in partitions.items():
+        path = f"{base_path}_{name}.parquet"
+        typed_partition(df).to_parquet(path, index=False) # Requires pyarrow
+        paths.append(path)
+    return paths
+
+def write_feather(partitions, base_path):
+    paths = []
+    for name, df in partitions.items():
+        path = f"{base_path}_{name}.feather"
+        typed_partition(df).to_feather(path) # Arrow IPC, requires pyarrow
+        paths.append(path)
+    return paths
+
+def write_csv(partitions, base_path):
+    paths = []
+    for name, df in partitions.items():
+        path = f"{base_path}_{name}.csv.gz"
+        typed_partition(df).to_csv(path, index=False, compression='gzip', date_format='%Y-%m-%d')
+        paths.append(path)
+    return paths
+
+# Output formats that can be requested, new formats can be added here
+OUTPUT_WRITERS = {
+    'excel': write_excel,
+    'parquet': write_parquet,
+    'feather': write_feather,
+    'csv': write_csv,
+}
+
+
+# Output formats that can be written a chunk of rows at a time (by the chunked pipeline)
+# Each takes a base path without extension and the partition names and returns a stream with append(name, df), close() and the paths it writes
+# Parquet and Feather files need every row's column types up front, so they are only written from whole partitions
+STREAM_WRITERS = {
+    'excel': excel_stream,
+    'csv': csv_stream,
+}
+
+
+# Writes the partitions in every requested format
+def write_outputs(partitions, formats=('excel',), name='Cleaned_ISO_Queues', directory='.'):
+    """Write status partitions to one or more output formats
+
+    Args:
+        partitions (dict): DataFrames keyed by partition name (e.g. "Active", "Withdrawn", "Completed")
+        formats (list): Keys of OUTPUT_WRITERS. Excel writes one workbook with a sheet per partition,
+            the other formats write one file per partition.
+        name (str): Base file name
+        directory (str): Folder to write to
+
+    Returns:
+        list: Paths of the files written
+    """
+    unknown = [fmt for fmt in formats if fmt not in OUTPUT_WRITERS]
+    if unknown:
+        raise ValueError(f"Unknown output format(s) {unknown}, expected any of {list(OUTPUT_WRITERS)}")
+
+    os.makedirs(directory, exist_ok=True)
+    base_path = os.path.join(directory, name)
+
+    paths = []
+    for fmt in formats:
+        with STAGES.stage(f'write {name} ({fmt})'):
+            paths += OUTPUT_WRITERS[fmt](partitions, base_path)
+    return paths
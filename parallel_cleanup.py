@@ -0,0 +1,123 @@
+# Author: Selorm Kwami Dzakpasu
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from instrumentation import STAGES
+from queue_cleanup import queue_cleanup, coalesce, rows_containing
+
+# Columns queue_cleanup() parses dates from, with pd.to_datetime guessing the format from the first date it sees
+# Every chunk of a partition is cleaned together with the partition's rows up to the first of these dates,
+# so each chunk guesses the same format the whole partition would
+DATE_SOURCES = {
+    'Queue Date': ['Queue Date'],
+    'Planned Operation Date': [
+        'Actual Completion Date', 'Proposed Completion Date', 'inService',
+        'Backfeed Date', 'Op Date', 'Sync Date', 'Test Energy Date', 'In-Service Date',
+        'Proposed In-Service Date', 'Commercial Operation Date', 'Proposed Initial-Sync Date', 'Proposed On-line Date (as filed with IR)',
+        'Approved for Energization', 'Approved for Synchronization', 'Original Generator Commercial Op Date'
+    ],
+}
+
+# Strings pd.to_datetime skips when looking for the first date (and a few more, skipping too many only adds rows)
+NOT_DATES = {'', 'nat', 'nan', 'none', 'null', 'now', 'today'}
+
+
+# Position of the first row pd.to_datetime would guess a column's format from, or None if there is none
+def _first_date(values):
+    values = pd.Series(values, dtype=object)
+    text = values.astype(str).str.split('T').str[0].str.strip().str.lower() # queue_cleanup() drops the time after a "T"
+    found = values.notna() & ~(values.map(type).eq(str) & text.isin(NOT_DATES))
+    return int(found.to_numpy().argmax()) if found.any() else None
+
+
+# Position of the row queue_cleanup() guesses each date format from ({date column: position}), None where df has no date for it
+# Rows queue_cleanup() drops are skipped over
+def first_date_rows(df):
+    kept = np.flatnonzero(~rows_containing(df, 'jellyfish').to_numpy())
+    rows = df.iloc[kept]
+
+    positions = {}
+    for target, columns in DATE_SOURCES.items():
+        present = [col for col in columns if col in rows.columns]
+        first = None
+        if present and len(rows):
+            values = coalesce(rows, present, blank_length=5) if len(present) > 1 else rows[present[0]]
+            first = _first_date(values)
+        positions[target] = int(kept[first]) if first is not None else None
+    return positions
+
+# Number of leading rows of a partition every chunk needs to be cleaned exactly like the whole partition
+def anchor_rows(df):
+    """Rows (from the top) covering the first date queue_cleanup() guesses each date format from
+
+    Rows queue_cleanup() drops are skipped over, so the anchor rows always reach a row that is kept.
+    """
+    found = [position for position in first_date_rows(df).values() if position is not None]
+    return max(found) + 1 if found else 0
+
+
+# Cleans one chunk in a worker process
+# Rows labelled with a negative number are anchor rows and are dropped from the result
+def _clean_chunk(chunk, cleanup):
+    cleaned = cleanup(chunk)
+    return cleaned[cleaned.index >= 0]
+
+
+# Splits a partition into chunks of about chunk_rows rows, every chunk after the first prefixed with the anchor rows
+# Chunks are indexed by row position (anchor rows by negative numbers)
+def _chunks(df, chunk_rows):
+    df = df.set_axis(pd.RangeIndex(len(df)))
+    if not chunk_rows or len(df) <= chunk_rows:
+        return [df]
+
+    anchors = anchor_rows(df)
+    prefix = df.iloc[:anchors].set_axis(np.arange(-anchors, 0))
+    chunks = []
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        chunks.append(chunk if start == 0 or not anchors else pd.concat([prefix, chunk]))
+    return chunks
+
+
+@STAGES.timed('parallel_cleanup')
+def parallel_cleanup(partitions, workers=None, chunk_rows=None, cleanup=queue_cleanup):
+    """Clean status partitions in a pool of processes
+
+    Gives the same rows in the same order (with the same index) as running cleanup on every partition in turn.
+
+    Args:
+        partitions (dict): combined (not yet cleaned) DataFrames keyed by status partition
+        workers (int): Number of processes. Defaults to the number of CPUs.
+        chunk_rows (int): Also split partitions into chunks of this many rows so a large partition is spread over several processes.
+            Defaults to one chunk per partition.
+        cleanup (function): Cleanup applied to every chunk (must be importable by the worker processes)
+
+    Returns:
+        dict: cleaned DataFrames keyed by status partition, in the order of partitions
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = {name: _chunks(df, chunk_rows) for name, df in partitions.items()}
+
+    # Frames are sent to the workers pickled (protocol 5, numeric and categorical columns are sent as raw buffers)
+    with ProcessPoolExecutor(max_workers=min(workers, sum(len(parts) for parts in chunks.values()))) as executor:
+        futures = {name: [executor.submit(_clean_chunk, chunk, cleanup) for chunk in parts] for name, parts in chunks.items()}
+        results = {name: [future.result() for future in parts] for name, parts in futures.items()}
+
+    cleaned = {}
+    for name, parts in results.items():
+        df = pd.concat(parts) if len(parts) > 1 else parts[0]
+        if len(parts) > 1:
+            df = _same_dtypes(df, parts)
+        cleaned[name] = df.set_axis(partitions[name].index[df.index.to_numpy()])
+    return cleaned
+
+
+# Chunks can end up with different column types (e.g. a column that is all blank in one chunk)
+# Columns that were not the same type in every chunk are inferred again over the whole partition
+def _same_dtypes(df, parts):
+    mixed = [col for col in df.columns if len({str(part[col].dtype) for part in parts}) > 1]
+    if mixed:
+        df[mixed] = df[mixed].astype(object).infer_objects()
+    return df
@@ -2,15 +2,90 @@
 
 import pandas as pd
 import numpy as np
+from outputs import write_outputs
+from compaction import restore_plain_dtypes
+from instrumentation import STAGES
 
 # Load the Combined ISO Queues Excel file
 file_path = 'Combined_ISO_Queues.xlsx'
 
+# Column-wise replacement for df[columns].apply(lambda row: row.dropna().astype(str).iloc[0] if len(row.dropna()) > 0 else '', axis=1)
+# Picks the first non-blank value of each row (left to right) as text, or '' when the whole row is blank
+def first_non_null(df, columns):
+    values = df[columns].to_numpy() # Same common dtype the row-wise apply would see
+    filled = pd.notna(values)
+    first_col = filled.argmax(axis=1)
+    picked = values[np.arange(len(values)), first_col]
+    text = pd.Series(picked, index=df.index, dtype=values.dtype).astype(str)
+    return text.where(filled.any(axis=1), '').astype(object)
+
+# Column-wise replacement for df[columns].apply(lambda row: sep.join(row.dropna().astype(str)), axis=1)
+# Joins the non-blank values of each row (left to right) with the separator, or '' when the whole row is blank
+def join_non_null(df, columns, sep):
+    values = df[columns].to_numpy() # Same common dtype the row-wise apply would see
+    filled = pd.notna(values)
+    result = np.full(len(values), '', dtype=object)
+    started = np.zeros(len(values), dtype=bool)
+    for i in range(values.shape[1]):
+        rows = filled[:, i]
+        if not rows.any():
+            continue
+        text = pd.Series(values[rows, i], dtype=values.dtype).astype(str).to_numpy(dtype=object)
+        result[rows] = np.where(started[rows], result[rows] + sep + text, text)
+        started |= rows
+    return pd.Series(result, index=df.index)
+
+# Replacement for series.apply(transform) that calls transform once per distinct value and broadcasts the results back
+# Label columns (statuses, study phases) repeat a few hundred values across the whole queue
+# Values are told apart by type as well (1, 1.0 and "1" can give different labels), the result has the same type apply would give
+def transform_labels(series, transform):
+    if series.empty:
+        return series.apply(transform)
+    values = series.to_numpy(dtype=object)
+    codes, _ = pd.factorize(values, use_na_sentinel=False)
+    kind_codes = {}
+    kinds = np.fromiter((kind_codes.setdefault(type(value), len(kind_codes)) for value in values), dtype=np.int64, count=len(values))
+    _, first, inverse = np.unique(codes * len(kind_codes) + kinds, return_index=True, return_inverse=True)
+    labels = pd.Series(values[first], dtype=object).apply(transform).to_numpy()
+    return pd.Series(labels[inverse], index=series.index, name=series.name)
+
+# Flags cells whose text is exactly `length` characters long
+# The ISO queues use 5 character placeholders (e.g. Excel serial numbers like "45123") in place of real dates and statuses
+def false_blanks(values, length):
+    values = np.asarray(values, dtype=object)
+    found = pd.notna(values)
+    found[found] = pd.Series(values[found], dtype=object).astype(str).str.len().to_numpy() == length
+    return found
+
+# First usable value of each row across an ordered list of columns, or None when there is none
+# Missing values and empty strings are skipped, as are false blanks when blank_length is given
+def coalesce(df, columns, blank_length=None):
+    values = df[columns].to_numpy(dtype=object)
+    usable = pd.notna(values) & (values != '')
+    if blank_length is not None:
+        usable &= ~false_blanks(values, blank_length)
+    first_col = usable.argmax(axis=1)
+    picked = values[np.arange(len(values)), first_col]
+    return pd.Series(np.where(usable.any(axis=1), picked, None), index=df.index)
+
+# Flags rows where any text cell contains the given string (case insensitive)
+# Numbers and dates can never contain text, so only text columns are searched
+def rows_containing(df, text):
+    found = np.zeros(len(df), dtype=bool)
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(df[col]) or pd.api.types.is_datetime64_any_dtype(df[col]):
+            continue
+        found |= df[col].astype(str).str.contains(text, case=False, regex=False).to_numpy()
+    return pd.Series(found, index=df.index)
+
 # ISO Queue Cleanup Function
+@STAGES.timed('queue_cleanup')
 def queue_cleanup(df):
-    df = df.copy()  # explicitly create a copy to avoid warnings
+    df = restore_plain_dtypes(df)  # explicitly create a copy (with plain column types) to avoid warnings
+    steps = STAGES.steps() # Times each step below
       
     # Step 1 - Developer Cleanup
+    steps.start('Step 1 - Developer Cleanup', df)
 
     # Uses np.where to handle blank values and add separator only when both columns have values
     df['Entity'] = np.where(df['Interconnecting Entity'].isna(), 
@@ -24,13 +99,14 @@ def queue_cleanup(df):
 
 
     # Step 2 - Capacity Cleanup
+    steps.start('Step 2 - Capacity Cleanup', df)
 
     # List of the columns you want to merge into "Capacity (MW)"
     columns_to_merge = ['dp1ErisMw', 'dp1NrisMw', 'dp2ErisMw', 'dp2NrisMw', 'MW In Service']
 
     # Use np.where to prioritize "Capacity (MW)" if it has a value, otherwise merge the other columns
     df['Capacity (MW)'] = np.where(df['Capacity (MW)'].isna(), 
-                                df[columns_to_merge].apply(lambda row: row.dropna().astype(str).iloc[0] if len(row.dropna()) > 0 else '', axis=1),
+                                first_non_null(df, columns_to_merge),
                                 df['Capacity (MW)'])
 
     # Drops the other columns
@@ -53,6 +129,7 @@ def queue_cleanup(df):
 
 
     # Step 3 - Unit Type Cleanup
+    steps.start('Step 3 - Unit Type Cleanup', df)
 
     # List of columns to merge
     columns_to_merge = ['Generation Type', 'facilityType', 'Unit', 'Technology', 'Fuel', 'Fuel-1', 'Fuel-2', 'Fuel-3']
@@ -63,13 +140,16 @@ def queue_cleanup(df):
                                     df['Generation Type'])
 
     # Merge the columns, with "Generation Type" as priority, and fill missing values with others
-    df['Technology'] = df[columns_to_merge].apply(lambda row: row['Generation Type'] if pd.notna(row['Generation Type']) else ' '.join(row.dropna().astype(str)), axis=1)
+    df['Technology'] = np.where(df['Generation Type'].notna(),
+                                df['Generation Type'],
+                                join_non_null(df, columns_to_merge, ' '))
 
     # Drop the original columns used for merging
     df.drop(['Generation Type', 'facilityType', 'Unit', 'Fuel', 'Fuel-1', 'Fuel-2', 'Fuel-3'], axis=1, inplace=True)
 
 
     # Step 4 - Project Name Cleanup
+    steps.start('Step 4 - Project Name Cleanup', df)
 
     # Merge "Project Name" and "Interconnection Location" with "Interconnection Location" as priority
     df['Interconnection Location'] = np.where(df['Interconnection Location'].isna(), 
@@ -89,9 +169,10 @@ def queue_cleanup(df):
 
 
     # Step 5 - Status Cleanup
+    steps.start('Step 5 - Status Cleanup', df)
 
     # Remove row that contains "jellyfish"
-    df = df[~df.apply(lambda row: row.astype(str).str.contains('jellyfish', case=False).any(), axis=1)]
+    df = df[~rows_containing(df, 'jellyfish')].copy()
 
     # Rename contents of column "S" using the mapping
     s_mapping_key = { 
@@ -117,11 +198,11 @@ def queue_cleanup(df):
     df['S'] = pd.to_numeric(df['S'], errors='coerce')  # Converts to numeric (int or float), sets errors to NaN
 
     # Replace using s_mapping_key, where it assumes that 'S' values are now integers
-    df['S'] = df['S'].apply(lambda x: s_mapping_key.get(str(int(x)), x) if pd.notna(x) else x)
+    df['S'] = transform_labels(df['S'], lambda x: s_mapping_key.get(str(int(x)), x) if pd.notna(x) else x)
 
     # Modify "Interconnection Agreement Status" by adding "IA " to non-empty cells
-    df['Interconnection Agreement Status'] = df['Interconnection Agreement Status'].apply(
-        lambda x: f"IA {x}" if pd.notna(x) and x != "" else x
+    df['Interconnection Agreement Status'] = transform_labels(
+        df['Interconnection Agreement Status'], lambda x: f"IA {x}" if pd.notna(x) and x != "" else x
     )
     
     # Remove "completed" and "Done" values from "Status" column. These do not represent the status of the project but rather the interconnection agreement.
@@ -131,7 +212,7 @@ def queue_cleanup(df):
     columns_to_merge = ['Status', 'S', 'Status (Original)', 'Project Status', 
                         'Post Generator Interconnection Agreement Status', 'Interconnection Agreement Status']
 
-    df['Merged Status'] = df[columns_to_merge].apply(lambda row: ' , '.join(row.dropna().astype(str)), axis=1)
+    df['Merged Status'] = join_non_null(df, columns_to_merge, ' , ')
 
     # Drop the original columns used for merging
     df.drop(['Status', 'S', 'Status (Original)', 'Project Status', 'Post Generator Interconnection Agreement Status', 'Interconnection Agreement Status'], axis=1, inplace=True)
@@ -141,6 +222,7 @@ def queue_cleanup(df):
 
 
     # Step 6 - IA Date Cleanup
+    steps.start('Step 6 - IA Date Cleanup', df)
 
     # Drop the unused date columns
     df.drop(['giaToExec', 'SGIA Tender Date', 'Interconnection Approval Date', 'Interconnection Request Receive Date', 
@@ -153,13 +235,14 @@ def queue_cleanup(df):
         return date
 
     # Apply the function to the 'Queue Date' column
-    df['Queue Date'] = df['Queue Date'].apply(correct_date_format)
+    df['Queue Date'] = transform_labels(df['Queue Date'], correct_date_format)
 
-    # Convert the column to datetime format, then apply the Excel short date format (MM/DD/YYYY)
-    df['Queue Date'] = pd.to_datetime(df['Queue Date'], errors='coerce').dt.strftime('%m/%d/%Y')
+    # Convert the column to datetime format (saved with the Excel short date format MM/DD/YYYY by outputs.py)
+    df['Queue Date'] = pd.to_datetime(df['Queue Date'], errors='coerce')
 
 
     # Step 7 - Completion/In-service Date Cleanup
+    steps.start('Step 7 - Completion/In-service Date Cleanup', df)
 
     # Drop the unused columns
     df.drop(['Long Term Firm Service Start Date', 'Long Term Firm Service End Date'], axis=1, inplace=True)
@@ -172,27 +255,15 @@ def queue_cleanup(df):
         'Approved for Energization', 'Approved for Synchronization', 'Original Generator Commercial Op Date'
     ]
         
-    # Create the "Planned Operation Date" column with priority using `apply` and `lambda`
-    def get_planned_operation_date(row):
-        # Replace any cell with length 5 with ''
-        for col in ['Actual Completion Date', 'Proposed Completion Date', 'inService'] + date_columns:
-            if pd.notna(row[col]) and len(str(row[col])) == 5:
-                row[col] = ''  # Replace the value with an empty string
-
-        # Now apply the priority logic, looking for the first non-null value
-        for col in ['Actual Completion Date', 'Proposed Completion Date', 'inService'] + date_columns:
-            if pd.notna(row[col]) and row[col] != '':
-                return row[col]
-        
-        return None  # In case all values are missing or replaced with ''
-
-    df['Planned Operation Date'] = df.apply(get_planned_operation_date, axis=1)
+    # Create the "Planned Operation Date" column from the first usable date in priority order
+    # Cells with length 5 are treated as blank
+    df['Planned Operation Date'] = coalesce(df, date_columns, blank_length=5)
 
     # Drop the original columns
     df.drop(date_columns, axis=1, inplace=True)
 
     # Apply the function to the 'Planned Operation Date' column
-    df['Planned Operation Date'] = df['Planned Operation Date'].apply(correct_date_format)
+    df['Planned Operation Date'] = transform_labels(df['Planned Operation Date'], correct_date_format)
 
     # Convert the column to datetime format
     df['Planned Operation Date'] = pd.to_datetime(df['Planned Operation Date'], errors='coerce')
@@ -201,11 +272,11 @@ def queue_cleanup(df):
     df['Planned Operation Month'] = df['Planned Operation Date'].dt.month
     df['Planned Operation Year'] = df['Planned Operation Date'].dt.year
 
-    # Convert the column to datetime format, then apply the Excel short date format (MM/DD/YYYY)
-    df['Planned Operation Date'] = pd.to_datetime(df['Planned Operation Date'], errors='coerce').dt.strftime('%m/%d/%Y')
+    # The dates stay datetime, outputs.py saves them with the Excel short date format (MM/DD/YYYY)
 
 
     # Step 8 - Availability of Studies Cleanup (FS, SIS, etc.)
+    steps.start('Step 8 - Availability of Studies Cleanup (FS, SIS, etc.)', df)
 
     # Drop the unused columns
     df.drop(['Feasibility Study', 'sisPhase1', 'Facilities Study', 'System Impact Study', 'Initial Study', 'Screening Study Started', 
@@ -220,7 +291,7 @@ def queue_cleanup(df):
     # Apply the function to the relevant columns
     columns_to_update = ['Feasibility Study Status', 'Feasiblity Study Status', 'Feasibility Study or Supplemental Review']
     for col in columns_to_update:
-        df[col] = df[col].apply(prepend_fs)
+        df[col] = transform_labels(df[col], prepend_fs)
         
     # Function to transform the values in the "System Impact Study Completed" column
     def transform_sis_status(value):
@@ -231,7 +302,7 @@ def queue_cleanup(df):
         return value
 
     # Apply the function to the "System Impact Study Completed" column
-    df['System Impact Study Completed'] = df['System Impact Study Completed'].apply(transform_sis_status)
+    df['System Impact Study Completed'] = transform_labels(df['System Impact Study Completed'], transform_sis_status)
 
     # Function to prepend "SIS " for other System Impact Study columns if the cell is non-blank and does not contain "study"
     def prepend_sis(value):
@@ -240,21 +311,19 @@ def queue_cleanup(df):
         return value
 
     # Apply the function to the "System Impact Study or Phase I Cluster Study" column
-    df['System Impact Study or Phase I Cluster Study'] = df['System Impact Study or Phase I Cluster Study'].apply(prepend_sis)
-
-    # Removing false blanks in some cells
-    def remove_false_blanks(row):
-        # Delete contents of any cell with length 5
-        for col in ['System Impact Study Status', 'Facilities Study Status']:
-            if pd.notna(row[col]) and len(str(row[col])) == 5:
-                row[col] = None  # Set the value to None (delete the content)
-        
-        return row  # Return the row after modifying it
+    df['System Impact Study or Phase I Cluster Study'] = transform_labels(df['System Impact Study or Phase I Cluster Study'], prepend_sis)
+
+    # Removing false blanks in some cells (delete contents of any cell with length 5)
+    for col in ['System Impact Study Status', 'Facilities Study Status']:
+        values = df[col].to_numpy(dtype=object)
+        values[false_blanks(values, 5)] = None
+        df[col] = values
 
-    df = df.apply(remove_false_blanks, axis=1)
+    # Keep the column types the frame had when it was rebuilt row by row here
+    df = df.infer_objects()
 
     # Apply the function to the "System Impact Study Status" column
-    df['System Impact Study Status'] = df['System Impact Study Status'].apply(prepend_sis)
+    df['System Impact Study Status'] = transform_labels(df['System Impact Study Status'], prepend_sis)
 
     # Function to prepend "FAS " Facilities Study Columns if the cell is non-blank and does not contain "SGIA"
     def prepend_fas(value):
@@ -269,7 +338,7 @@ def queue_cleanup(df):
     # Apply the function to the relevant columns
     columns_to_update = ['Facilities Study Status', 'Facilities Study (FAS) or Phase II Cluster Study']
     for col in columns_to_update:
-        df[col] = df[col].apply(prepend_fas)
+        df[col] = transform_labels(df[col], prepend_fas)
         
     # Function to prepend "OS " if the cell is non-blank for Optional Interconnection Study columns
     def prepend_os(value):
@@ -280,7 +349,7 @@ def queue_cleanup(df):
     # Apply the function to the relevant columns
     columns_to_update = ['Optional Interconnection Study Status', 'Optional Study (OS)']
     for col in columns_to_update:
-        df[col] = df[col].apply(prepend_os)
+        df[col] = transform_labels(df[col], prepend_os)
         
     # Function to transform the values in the "Economic Study Required" column
     def transform_es(value):
@@ -291,7 +360,7 @@ def queue_cleanup(df):
         return value
 
     # Apply the function to the "Economic Study Required" column
-    df['Economic Study Required'] = df['Economic Study Required'].apply(transform_es)
+    df['Economic Study Required'] = transform_labels(df['Economic Study Required'], transform_es)
 
     # Function to make the cell blank if it contains "GIA" for "studyPhase" column
     def replace_gia(value):
@@ -300,7 +369,7 @@ def queue_cleanup(df):
         return value
 
     # Apply the function to the "studyPhase" column
-    df['studyPhase'] = df['studyPhase'].apply(replace_gia)
+    df['studyPhase'] = transform_labels(df['studyPhase'], replace_gia)
 
     # List of columns to concatenate
     columns_to_concatenate = [
@@ -312,7 +381,7 @@ def queue_cleanup(df):
     ]
 
     # Concatenate the columns
-    df['Concatenated Studies'] = df[columns_to_concatenate].apply(lambda row: ' , '.join(row.dropna().astype(str)), axis=1)
+    df['Concatenated Studies'] = join_non_null(df, columns_to_concatenate, ' , ')
 
     # Drop the original columns
     df.drop(columns_to_concatenate, axis=1, inplace=True)
@@ -322,30 +391,31 @@ def queue_cleanup(df):
 
 
     # Step 9 - Capacity Related Statuses Cleanup
+    steps.start('Step 9 - Capacity Related Statuses Cleanup', df)
 
     # Concatenate 'Full Capacity, Partial or Energy Only (FC/P/EO)' and 'Off-Peak Deliverability and Economic Only' columns
-    df['Capacity Status'] = df[['Full Capacity, Partial or Energy Only (FC/P/EO)', 'Off-Peak Deliverability and Economic Only']
-                            ].apply(lambda row: ' , '.join(row.dropna().astype(str)), axis=1)
+    df['Capacity Status'] = join_non_null(df, ['Full Capacity, Partial or Energy Only (FC/P/EO)', 'Off-Peak Deliverability and Economic Only'], ' , ')
 
     # Drop the original columns
     df.drop(['Full Capacity, Partial or Energy Only (FC/P/EO)', 'Off-Peak Deliverability and Economic Only'], axis=1, inplace=True)
 
 
     # Step 10 - Cluster Group Cleanup
+    steps.start('Step 10 - Cluster Group Cleanup', df)
 
     # Concatenate 'Cluster Group', 'CDR Reporting Zone' and 'studyGroup' columns
-    df['Group'] = df[['Cluster Group', 'CDR Reporting Zone', 'studyGroup']
-                            ].apply(lambda row: ' , '.join(row.dropna().astype(str)), axis=1)
+    df['Group'] = join_non_null(df, ['Cluster Group', 'CDR Reporting Zone', 'studyGroup'], ' , ')
 
     # Drop the original columns
     df.drop(['Cluster Group', 'CDR Reporting Zone', 'studyGroup'], axis=1, inplace=True)
 
 
     # Step 11 - Service Type Cleanup
+    steps.start('Step 11 - Service Type Cleanup', df)
 
     # Use np.where to prioritize "Service Type" if it has a value, otherwise merge the other columns ('Serv' and 'svcType')
     df['Service Type'] = np.where(df['Service Type'].isna(), 
-                                df[['svcType', 'Serv']].apply(lambda row: row.dropna().astype(str).iloc[0] if len(row.dropna()) > 0 else '', axis=1),
+                                first_non_null(df, ['svcType', 'Serv']),
                                 df['Service Type'])
 
     # Drops the other columns
@@ -353,6 +423,7 @@ def queue_cleanup(df):
 
 
     # Step 12 - Cleanup of Currently Irrelevant Data
+    steps.start('Step 12 - Cleanup of Currently Irrelevant Data', df)
 
     # Drop irrelevant columns based on current research needs and goals
     df.drop(['Air Permit', 'GHG Permit', 'Water Availability', 'I39', 'Meets Planning', 'Meets All Planning', 'Interim-Interconnection Service-Generation Interconnection Agreement',
@@ -362,6 +433,7 @@ def queue_cleanup(df):
 
 
     # Step 13 - Reorder columns in dataframe
+    steps.start('Step 13 - Reorder columns in dataframe', df)
 
     # Rename "Withdrawn Date" to "Withdrawal Date"
     df.rename(columns={'Withdrawn Date': 'Withdrawal Date'}, inplace=True)
@@ -378,33 +450,21 @@ def queue_cleanup(df):
 
     # Reorder the DataFrame columns
     df = df[new_column_order]
+    steps.finish(df)
     
     return df
 
 
-# Using the cleanup function to clean active, withdrawn and completed entries
-
-# Load the first sheet into a pandas DataFrame (this contains active entries)
-df = pd.read_excel(file_path, sheet_name="Active")
-# run queue cleanup function and move dataframe to new variable
-df_active = queue_cleanup(df)
-
-
-# Load the second sheet into a pandas DataFrame (this contains withdrawn entries)
-df = pd.read_excel(file_path, sheet_name="Withdrawn")
-# run queue cleanup function and move dataframe to new variable
-df_withdrawn = queue_cleanup(df)
-
-
-# Load the third sheet into a pandas DataFrame (this contains completed entries)
-df = pd.read_excel(file_path, sheet_name="Completed")
-# run queue cleanup function and move dataframe to new variable
-df_completed = queue_cleanup(df)
-
+# main.py passes its DataFrames to queue_cleanup() directly
+# Running this file on its own cleans a previously saved Combined ISO Queues file instead
+if __name__ == "__main__":
+    # Load all three sheets (active, withdrawn and completed entries) in one pass over the workbook
+    sheets = pd.read_excel(file_path, sheet_name=["Active", "Withdrawn", "Completed"])
 
-# Save the updated DataFrames back to an Excel file
-with pd.ExcelWriter('Cleaned_ISO_Queues.xlsx') as writer:
-    df_active.to_excel(writer, sheet_name='Active', index=False)
-    df_withdrawn.to_excel(writer, sheet_name='Withdrawn', index=False)
-    df_completed.to_excel(writer, sheet_name='Completed', index=False)    
+    # run queue cleanup function on each sheet
+    df_active = queue_cleanup(sheets["Active"])
+    df_withdrawn = queue_cleanup(sheets["Withdrawn"])
+    df_completed = queue_cleanup(sheets["Completed"])
 
+    # Save the updated DataFrames back to an Excel file ("Cleaned_ISO_Queues.xlsx")
+    write_outputs({'Active': df_active, 'Withdrawn': df_withdrawn, 'Completed': df_completed})
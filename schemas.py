@@ -0,0 +1,215 @@
+# Author: Selorm Kwami Dzakpasu
+
+import argparse
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+from instrumentation import STAGES
+from iso_queues import STANDARD_COLUMNS, ISO_COLUMNS
+from status_rules import load_status_rules
+
+# Schema of every ISO's formatted queue, checked right after the queue is fetched so a format change (like SPP's in 2025)
+# is reported before anything else runs, instead of as a KeyError deep in queue_cleanup()
+#   columns:  STANDARD_COLUMNS and the ISO's ISO_COLUMNS ("iso_queues.py")
+#   types:    "types" in "iso_schemas.json", "number", "date", "bool" or "text" per column
+#   statuses: "statuses" in "iso_schemas.json" plus the values of the status rules that apply to the ISO ("status_rules.json")
+#
+# A queue missing a standard column or a column its status rules read, with no rows, or with none of its statuses known is quarantined:
+# the run goes on without it (or with its last good queue, see USE_STALE_QUEUES in "main.py").
+# A missing ISO specific column is only reported (the combined queue gets it as a blank column), like new columns, other types and a few unknown statuses.
+#
+# The registry ships without types or recorded statuses (they have to come from the ISOs' real queues, not generated ones):
+# "python schemas.py record" after a run adds the types and statuses of the cached queues, "python schemas.py check" checks them
+SCHEMA_REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'iso_schemas.json')
+
+# Columns main.py adds to every queue after it is fetched
+ADDED_COLUMNS = ['Balancing Authority Code', 'Balancing Authority Name', 'Latitude', 'Longitude']
+
+
+# A queue that doesn't match its schema, raised by check_schema() so the ISO is handled like a failed fetch
+class SchemaDriftError(ValueError):
+    def __init__(self, iso, issues):
+        self.iso = iso
+        self.issues = issues
+        errors = [f"{check} {column}" if column else check for severity, check, column, _ in issues if severity == 'error']
+        super().__init__(f"{iso} queue does not match its schema: {', '.join(errors)}")
+
+
+def load_schemas(path=SCHEMA_REGISTRY_PATH):
+    """Load the schema registry
+
+    Args:
+        path (str): JSON file with the registry
+
+    Returns:
+        dict: the registry
+    """
+    with open(path) as f:
+        return json.load(f)
+
+
+# Type of a column's dtype, as written in the registry
+def column_type(dtype):
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'bool'
+    if pd.api.types.is_numeric_dtype(dtype):
+        return 'number'
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'date'
+    return 'text'
+
+
+def compile_schemas(table, rules=None):
+    """Check a registry once and turn it into a validator
+
+    Args:
+        table (dict): registry from load_schemas()
+        rules (dict): status rule table whose values are known statuses too. Defaults to the rules in STATUS_RULES_PATH.
+
+    Returns:
+        function: validate(iso, queue) -> list of (severity ("error" or "warning"), check, column, detail) tuples, empty when the queue matches
+    """
+    rules = load_status_rules() if rules is None else rules
+    quarantine_share = table.get('quarantine_unknown_statuses', 1.0)
+
+    schemas = {}
+    for iso, schema in table['isos'].items():
+        if iso not in ISO_COLUMNS:
+            raise ValueError(f"Schema for unknown ISO {iso!r}, expected any of {list(ISO_COLUMNS)}")
+        unknown = {kind for kind in schema.get('types', {}).values()} - {'number', 'date', 'bool', 'text'}
+        if unknown:
+            raise ValueError(f"{iso} schema has unknown column type(s) {sorted(unknown)}")
+        statuses = {}
+        for column, values in schema.get('statuses', {}).items():
+            known = set(values)
+            for rule in rules['rules']:
+                if rule['column'] == column and (rule.get('iso') is None or iso in rule['iso']):
+                    known.update(rule['in'])
+            statuses[column] = list(known)
+        # Columns that decide which partition a row goes to can't be filled with blanks
+        required = STANDARD_COLUMNS + [rule['column'] for rule in rules['rules'] if rule.get('iso') is None or iso in rule['iso']]
+        schemas[iso] = (STANDARD_COLUMNS + ISO_COLUMNS[iso], set(required), schema.get('types', {}), statuses)
+
+    def validate(iso, queue):
+        if iso not in schemas:
+            return []
+        columns, required, types, statuses = schemas[iso]
+        issues = []
+        if not len(queue):
+            issues.append(('error', 'no rows', None, "the queue is empty"))
+
+        # Columns and types only look at the column names and dtypes, not the rows
+        present = set(queue.columns)
+        for col in columns:
+            if col in present:
+                continue
+            if col in required:
+                issues.append(('error', 'missing column', col, "the cleanup or the status rules need it"))
+            else:
+                issues.append(('warning', 'missing column', col, "left blank in the combined queue"))
+        expected = set(columns) | set(ADDED_COLUMNS)
+        for col in queue.columns:
+            if col not in expected:
+                issues.append(('warning', 'new column', col, f"{column_type(queue[col].dtype)} column not in the schema"))
+        for col, kind in types.items():
+            if col in present and column_type(queue[col].dtype) != kind and queue[col].notna().any(): # A blank column can have any type
+                issues.append(('warning', 'type', col, f"{column_type(queue[col].dtype)} ({queue[col].dtype}), expected {kind}"))
+
+        # Statuses are checked in one isin() per column
+        for col, known in statuses.items():
+            if col not in present:
+                continue
+            values = queue[col]
+            unknown = values.notna() & ~values.isin(known)
+            if not unknown.any():
+                continue
+            share = unknown.sum() / values.notna().sum()
+            counts = values[unknown].astype(str).value_counts()
+            detail = (f"{unknown.sum()} rows ({share:.0%}) with unknown statuses: "
+                      + ", ".join(f"{value!r} {rows}" for value, rows in counts.head(5).items()) + (", ..." if len(counts) > 5 else ""))
+            issues.append(('error' if share >= quarantine_share else 'warning', 'statuses', col, detail))
+        return issues
+
+    validate.isos = list(schemas)
+    return validate
+
+
+def check_schema(validate, iso, queue):
+    """Validate a freshly fetched queue and print any drift
+
+    Raises:
+        SchemaDriftError: when the queue has to be quarantined
+    """
+    with STAGES.stage(f'{iso} validate', queue) as stage:
+        issues = validate(iso, queue)
+        stage.details = [list(issue) for issue in issues] or None # The drift is in the run report too
+
+    if issues: # One write (print() writes the line ending separately) so the lines of ISOs fetched at the same time don't interleave
+        print("".join(f"{iso}: schema {severity}, {check}{f' {column!r}' if column else ''}: {detail}\n"
+                      for severity, check, column, detail in issues), end='')
+    if any(severity == 'error' for severity, _, _, _ in issues):
+        raise SchemaDriftError(iso, issues)
+    return issues
+
+
+def record_schemas(queues, table):
+    """Add the types and statuses of queues that matched their schema to the registry
+
+    The types of the ISO's columns with any values are (re)written, statuses are added to the known ones.
+
+    Args:
+        queues (dict): formatted queues keyed by Balancing Authority Code
+        table (dict): registry from load_schemas()
+
+    Returns:
+        dict: the updated registry
+    """
+    for iso, queue in queues.items():
+        schema = table['isos'].setdefault(iso, {'types': {}, 'statuses': {'Status': []}})
+        types = schema.setdefault('types', {})
+        for col in STANDARD_COLUMNS + ISO_COLUMNS[iso]:
+            if col in queue.columns and queue[col].notna().any():
+                types[col] = column_type(queue[col].dtype)
+        for col, known in schema.get('statuses', {}).items():
+            if col in queue.columns:
+                seen = pd.unique(queue[col].dropna().to_numpy())
+                known += [value.item() if isinstance(value, np.generic) else value for value in seen if value not in known]
+    return table
+
+
+def main(argv=None):
+    from frame_cache import FrameCache
+
+    parser = argparse.ArgumentParser(description="Check the cached ISO queues against the schema registry")
+    parser.add_argument('command', choices=['check', 'record'], help="check: list any drift, record: add the queues' types and statuses to the registry")
+    parser.add_argument('--registry', default=SCHEMA_REGISTRY_PATH)
+    args = parser.parse_args(argv)
+
+    table = load_schemas(args.registry)
+    validate = compile_schemas(table)
+    cache = FrameCache()
+    queues = {}
+    for iso in validate.isos:
+        cached = cache.load_latest(iso)
+        if cached is None:
+            print(f"{iso}: no cached queue")
+            continue
+        try:
+            check_schema(validate, iso, cached[0])
+        except SchemaDriftError:
+            continue # Not recorded, a broken queue shouldn't become the schema
+        queues[iso] = cached[0]
+
+    if args.command == 'record':
+        tmp_path = f"{args.registry}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(record_schemas(queues, table), f, indent=4)
+        os.replace(tmp_path, args.registry)
+        print(f"Recorded the types and statuses of {', '.join(queues) or 'no queues'} to {args.registry}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
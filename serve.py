@@ -0,0 +1,242 @@
+# Author: Selorm Kwami Dzakpasu
+
+# Read-only HTTP/JSON service over the latest cleaned queues, so other teams don't each open Cleaned_ISO_Queues.xlsx
+#
+#     python serve.py                      (http://127.0.0.1:8765)
+#
+#     GET /queues?iso=MISO,PJM&status=Active&limit=50&offset=100     JSON page: {"total", "offset", "limit", "rows"}
+#     GET /queues?state=TX&format=csv                                every matching row as CSV (or format=ndjson), streamed
+#     GET /health                                                    rows per partition and when the queues were loaded
+#
+# Filters (comma separated values, any of them matches): queue_id, iso, state, status (the ISO's status text), partition
+# The queues are the ones the last main.py run cleaned (".cache/pipeline/cleaned.pkl"), checked for a newer run every POLL_SECONDS
+# and swapped in at once, requests already running finish on the queues they started with
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+import pandas as pd
+from intermediates import intermediate_path
+
+# Address the service listens on (only this machine by default)
+HOST = '127.0.0.1'
+PORT = 8765
+
+# Seconds between checks for a newer pipeline run
+POLL_SECONDS = 5
+
+# Rows per JSON page when no limit is given, and the most a page can have
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 10000
+
+# Rows written at a time to CSV/NDJSON responses
+STREAM_ROWS = 1000
+
+# Query parameter -> indexed column ("Partition" is Active/Withdrawn/Completed)
+FILTERS = {
+    'queue_id': 'Queue ID',
+    'iso': 'Balancing Authority Code',
+    'state': 'State',
+    'status': 'Status',
+    'partition': 'Partition',
+}
+
+
+# Index key of a cell (Queue IDs can be numbers for some ISOs and text for others, 123.0 is found as "123")
+def _key(value):
+    if value is None or pd.isna(value):
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip().upper()
+
+
+# Cleaned queues of one pipeline run with an index (value -> row positions) on every FILTERS column
+class Dataset:
+    def __init__(self, partitions, source=None, modified=None):
+        frames = [df.assign(Partition=name) for name, df in partitions.items()]
+        self.df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=list(FILTERS.values()))
+        self.source = source
+        self.modified = modified
+        self.loaded = time.time()
+        self.counts = {name: len(df) for name, df in partitions.items()}
+
+        self.indexes = {}
+        for col in FILTERS.values():
+            values = self.df[col] if col in self.df.columns else pd.Series('', index=self.df.index)
+            codes, uniques = pd.factorize(values.astype(object))
+            keys = [_key(value) for value in uniques]
+            order = np.argsort(codes, kind='stable') # Row positions grouped by value, in row order
+            bounds = np.cumsum(np.bincount(codes[codes >= 0], minlength=len(uniques)))
+            index = {}
+            for key, rows in zip(keys, np.split(order[np.sum(codes < 0):], bounds[:-1])):
+                index[key] = np.union1d(index[key], rows) if key in index else rows
+            self.indexes[col] = index
+
+    @classmethod
+    def load(cls, path):
+        return cls(pd.read_pickle(path), source=path, modified=os.path.getmtime(path))
+
+    def select(self, filters):
+        """Row positions matching every filter ({column: [values]}), in row order"""
+        rows = None
+        for col, values in filters.items():
+            index = self.indexes[col]
+            matches = [index[key] for key in (_key(value) for value in values) if key in index]
+            found = np.unique(np.concatenate(matches)) if matches else np.array([], dtype=np.int64)
+            rows = found if rows is None else np.intersect1d(rows, found, assume_unique=True)
+        return np.arange(len(self.df)) if rows is None else rows
+
+
+# Keeps the latest Dataset and swaps in a newer pipeline run when one is saved
+class DatasetStore:
+    def __init__(self, path, poll_seconds=POLL_SECONDS):
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self.dataset = Dataset.load(path)
+        self._stop = threading.Event()
+
+    def refresh(self):
+        """Load the queues again if a newer run saved them
+
+        The new Dataset (and its indexes) is built before it replaces the old one in a single assignment,
+        so a request sees either the old queues or the new ones, never a mix.
+        """
+        modified = os.path.getmtime(self.path)
+        if modified != self.dataset.modified:
+            self.dataset = Dataset.load(self.path)
+            print(f"Loaded the queues saved {time.ctime(modified)} ({len(self.dataset.df)} rows)")
+            return True
+        return False
+
+    def watch(self):
+        def poll():
+            while not self._stop.wait(self.poll_seconds):
+                try:
+                    self.refresh()
+                except Exception as e: # Keep serving the last good queues (e.g. a run is writing the file right now)
+                    print(f"Could not load {self.path}: {e!r}")
+        threading.Thread(target=poll, name='dataset-watcher', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+
+class QueueRequestHandler(BaseHTTPRequestHandler):
+    server_version = 'ISOQueues/1.0'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {name: ','.join(values) for name, values in parse_qs(url.query).items()}
+        dataset = self.server.store.dataset # The same queues for the whole request, even if a new run is swapped in meanwhile
+        try:
+            if url.path == '/health':
+                self._send_json({
+                    'rows': len(dataset.df), 'partitions': dataset.counts, 'source': dataset.source,
+                    'saved': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(dataset.modified)) if dataset.modified else None,
+                    'loaded': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(dataset.loaded)),
+                })
+            elif url.path == '/queues':
+                self._queues(dataset, params)
+            else:
+                self._send_json({'error': f"Unknown path {url.path}, expected /queues or /health"}, status=404)
+        except ValueError as e:
+            self._send_json({'error': str(e)}, status=400)
+
+    def _queues(self, dataset, params):
+        unknown = [name for name in params if name not in FILTERS and name not in ('limit', 'offset', 'format')]
+        if unknown:
+            raise ValueError(f"Unknown parameter(s) {unknown}, expected any of {list(FILTERS) + ['limit', 'offset', 'format']}")
+        filters = {FILTERS[name]: value.split(',') for name, value in params.items() if name in FILTERS}
+        output = params.get('format', 'json')
+        if output not in ('json', 'csv', 'ndjson'):
+            raise ValueError(f"Unknown format {output}, expected json, csv or ndjson")
+        try:
+            offset = int(params.get('offset', 0))
+            limit = int(params['limit']) if 'limit' in params else None
+        except ValueError:
+            raise ValueError("limit and offset must be whole numbers")
+        if offset < 0 or (limit is not None and limit < 0):
+            raise ValueError("limit and offset can't be negative")
+
+        rows = dataset.select(filters)
+        if output == 'json':
+            limit = min(DEFAULT_LIMIT if limit is None else limit, MAX_LIMIT)
+            page = dataset.df.iloc[rows[offset:offset + limit]]
+            body = page.to_json(orient='records', date_format='iso')
+            self._send_json_text(f'{{"total": {len(rows)}, "offset": {offset}, "limit": {limit}, "rows": {body}}}')
+            return
+
+        # CSV/NDJSON stream every matching row (or the limit given) a few at a time, without building the whole response first
+        rows = rows[offset:] if limit is None else rows[offset:offset + limit]
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv; charset=utf-8' if output == 'csv' else 'application/x-ndjson')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        for start in range(0, max(len(rows), 1), STREAM_ROWS):
+            chunk = dataset.df.iloc[rows[start:start + STREAM_ROWS]]
+            if output == 'csv':
+                text = chunk.to_csv(index=False, header=start == 0, date_format='%Y-%m-%d')
+            else:
+                text = chunk.to_json(orient='records', lines=True, date_format='iso').rstrip('\n') + '\n' if len(chunk) else ''
+            self.wfile.write(text.encode('utf-8'))
+        self.close_connection = True
+
+    def _send_json(self, data, status=200):
+        self._send_json_text(json.dumps(data), status)
+
+    def _send_json_text(self, text, status=200):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Quiet, every request would be printed otherwise
+
+
+def make_server(path=None, host=HOST, port=PORT, poll_seconds=POLL_SECONDS):
+    """HTTP server over the cleaned queues saved at path (defaults to the last pipeline run's)
+
+    Call serve_forever() to run it (and shutdown() from another thread to stop it). Port 0 picks a free port.
+    """
+    path = path or intermediate_path('cleaned')
+    if not os.path.exists(path):
+        raise RuntimeError(f"No cleaned queues at {path}, run main.py first")
+    server = ThreadingHTTPServer((host, port), QueueRequestHandler)
+    server.daemon_threads = True
+    server.store = DatasetStore(path, poll_seconds)
+    server.store.watch()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the latest cleaned ISO queues over HTTP (read only)")
+    parser.add_argument('--host', default=HOST, help="Address to listen on (0.0.0.0 for other machines)")
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--poll', type=float, default=POLL_SECONDS, help="Seconds between checks for a newer pipeline run")
+    parser.add_argument('--path', help="Cleaned queues to serve (default: the last main.py run's)")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.path, args.host, args.port, args.poll)
+    print(f"Serving {len(server.store.dataset.df)} rows on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.store.stop()
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# Author: Selorm Kwami Dzakpasu
+
+import json
+import os
+import numpy as np
+import pandas as pd
+from instrumentation import STAGES
+
+# Rule table used to split the combined queue into Active/Withdrawn/Completed
+# New status strings (e.g. a new SPP status) are handled by editing this file, no code changes needed
+STATUS_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'status_rules.json')
+
+
+def load_status_rules(path=STATUS_RULES_PATH):
+    """Load the status rule table
+
+    Each rule sends the rows whose "column" value is one of "in" (null for a blank) to "partition".
+    A rule can be limited to some ISOs with "iso" (a list of Balancing Authority Codes).
+    Rules are checked in order and the first one that matches wins, rows no rule matches go to "default".
+
+    Args:
+        path (str): JSON file with the rules
+
+    Returns:
+        dict: the rule table
+    """
+    with open(path) as f:
+        return json.load(f)
+
+
+def compile_status_rules(table):
+    """Check a rule table once and turn it into a classifier
+
+    Args:
+        table (dict): rule table from load_status_rules()
+
+    Returns:
+        function: classify(df) -> (categorical Series with every row's partition, array with the number of the rule each row matched, -1 for none)
+    """
+    partitions = table['partitions']
+    default = table['default']
+    if default not in partitions:
+        raise ValueError(f"Default partition {default!r} is not one of {partitions}")
+
+    rules = []
+    for number, rule in enumerate(table['rules']):
+        if rule['partition'] not in partitions:
+            raise ValueError(f"Status rule {number} sends rows to unknown partition {rule['partition']!r}")
+        if not rule.get('in'):
+            raise ValueError(f"Status rule {number} has no values to match")
+        values = [value for value in rule['in'] if value is not None]
+        rules.append((rule['column'], values, None in rule['in'], rule.get('iso'), partitions.index(rule['partition'])))
+
+    choices = np.array([code for _, _, _, _, code in rules], dtype=np.int8)
+    numbers = np.arange(len(rules))
+    default_code = partitions.index(default)
+
+    def classify(df):
+        conditions = []
+        for column, values, blank, isos, _ in rules:
+            if column not in df.columns:
+                conditions.append(np.zeros(len(df), dtype=bool)) # Column of an ISO that is not in this queue
+                continue
+            # Blanks are matched with isna(), isin([None]) matches NaN in a categorical column but not in an object one
+            matched = df[column].isin(values).to_numpy()
+            if blank:
+                matched |= df[column].isna().to_numpy()
+            if isos is not None:
+                matched &= df['Balancing Authority Code'].isin(isos).to_numpy()
+            conditions.append(matched)
+
+        # One pass over every rule, the first matching rule wins (same as filtering the rows out rule by rule)
+        codes = np.select(conditions, choices, default=default_code)
+        rule_numbers = np.select(conditions, numbers, default=-1)
+        labels = pd.Series(pd.Categorical.from_codes(codes, categories=partitions), index=df.index, name='Queue Status')
+        return labels, rule_numbers
+
+    classify.default = default
+    classify.partitions = list(partitions)
+    return classify
+
+
+@STAGES.timed('split_by_status')
+def split_by_status(df, classify=None):
+    """Split the combined queue into its status partitions
+
+    Rows of each partition are ordered by the rule they matched, then by their order in df.
+    The default partition keeps df's order and index (matched or not), the others get a new index.
+
+    Args:
+        df (pandas.DataFrame): combined queue
+        classify (function): compiled rules from compile_status_rules(), defaults to the rules in STATUS_RULES_PATH
+
+    Returns:
+        tuple: (dict of DataFrames keyed by partition, DataFrame counting the rows no rule matched by ISO and Status)
+    """
+    if classify is None:
+        classify = compile_status_rules(load_status_rules())
+
+    labels, rule_numbers = classify(df)
+
+    partitions = {}
+    codes = labels.cat.codes.to_numpy()
+    for code, name in enumerate(labels.cat.categories):
+        positions = np.flatnonzero(codes == code)
+        if name == classify.default:
+            partitions[name] = df.iloc[positions]
+        else:
+            partitions[name] = df.iloc[positions[np.argsort(rule_numbers[positions], kind='stable')]].reset_index(drop=True)
+
+    # Rows no rule matched, a status string showing up here for the first time may need a new rule
+    unmatched = count_unmatched([unmatched_statuses(df, rule_numbers)])
+    print_unmatched(unmatched, classify.default)
+
+    return partitions, unmatched
+
+
+# ISO and status of the rows no rule matched
+# A blank Status is shown as the ISO published it where the parser keeps it in "Status (Original)" (SPP blanks statuses it doesn't know)
+def unmatched_statuses(df, rule_numbers):
+    rows = df.loc[rule_numbers < 0]
+    status = rows['Status'].astype(object)
+    if 'Status (Original)' in rows.columns:
+        status = status.where(status.notna(), rows['Status (Original)'].astype(object))
+    return pd.DataFrame({'Balancing Authority Code': rows['Balancing Authority Code'].astype(object), 'Status': status.fillna('(blank)')})
+
+# Rows per ISO and status of the unmatched_statuses() of one or more frames
+def count_unmatched(frames):
+    unmatched = pd.concat(frames) if frames else pd.DataFrame(columns=['Balancing Authority Code', 'Status'])
+    return unmatched.value_counts(sort=False).rename('Rows').reset_index()
+
+
+def print_unmatched(unmatched, default):
+    """Print the number of rows no rule matched for each ISO (nothing when every row matched)
+
+    Args:
+        unmatched (pandas.DataFrame): Balancing Authority Code, Status and Rows of the unmatched rows (from split_by_status())
+        default (str): partition the unmatched rows were kept in
+    """
+    if len(unmatched):
+        counts = unmatched.groupby('Balancing Authority Code')['Rows'].sum()
+        print(f"Status rules: rows kept as {default} without a matching rule: "
+              + ", ".join(f"{iso} {rows}" for iso, rows in counts.items()))
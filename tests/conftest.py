@@ -0,0 +1,37 @@
+# Author: Selorm Kwami Dzakpasu
+
+import os
+import sys
+import pytest
+import pandas as pd
+
+# The modules live in the repo's top folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import synthetic_queue, combine
+from iso_queues import ISO_COLUMNS
+
+
+@pytest.fixture
+def queues():
+    """Small generated queue of every ISO, with the columns of its real queue"""
+    return {code: synthetic_queue(code, rows=40, seed=number) for number, code in enumerate(ISO_COLUMNS)}
+
+@pytest.fixture
+def combined(queues):
+    """The generated queues combined the way main.py combines them"""
+    return combine(queues)
+
+@pytest.fixture
+def mixed_date_queues(queues):
+    """The generated queues with their dates in the formats different ISOs publish (some with a time)"""
+    formats = {'CAISO': '%m/%d/%Y', 'MISO': '%m/%d/%Y', 'ERCOT': '%Y-%m-%dT%H:%M:%S', 'NEISO': '%d-%b-%Y'}
+    mixed = {}
+    for code, queue in queues.items():
+        queue = queue.copy()
+        if code in formats:
+            for col in ['Queue Date', 'Proposed Completion Date']:
+                dates = pd.to_datetime(queue[col], errors='coerce')
+                queue[col] = queue[col].where(dates.isna(), dates.dt.strftime(formats[code]))
+        mixed[code] = queue
+    return mixed
@@ -0,0 +1,13 @@
+# Author: Selorm Kwami Dzakpasu
+
+from benchmark import baseline_cleaned, clean_partitions, check_golden
+
+
+def test_cleaned_queues_match_the_baseline_commit(queues):
+    # The golden output "python benchmark.py record" saves, from the code before any optimization
+    golden = baseline_cleaned(queues)
+    assert check_golden(clean_partitions(queues), golden, workbook=None) == []
+
+    changed = clean_partitions(queues)
+    changed['Withdrawn'] = changed['Withdrawn'].iloc[1:]
+    assert check_golden(changed, golden, workbook=None) == ["Withdrawn: cleaned rows differ from the recorded golden output"]
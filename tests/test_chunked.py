@@ -0,0 +1,42 @@
+# Author: Selorm Kwami Dzakpasu
+
+import contextlib
+import gzip
+import io
+import pytest
+import chunked
+from benchmark import combine
+from chunked import run_chunked
+from compaction import compact_queue_frame
+from outputs import write_csv
+from status_rules import load_status_rules, compile_status_rules, split_by_status
+from queue_cleanup import queue_cleanup
+
+
+# Queues as main.py has them after fetching (with the columns it adds)
+def fetched(queues):
+    combined = combine(queues)
+    return {code: queue.reset_index(drop=True) for code, queue in combined.groupby('Balancing Authority Code', sort=False)}
+
+def read_csvs(paths):
+    return {path.rsplit('_', 1)[-1]: gzip.open(path, 'rt').read() for path in paths}
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_chunked_run_matches_normal_run(mixed_date_queues, tmp_path, monkeypatch, compact):
+    monkeypatch.setattr(chunked, 'SPILL_DIR', str(tmp_path / 'chunks'))
+    classify = compile_status_rules(load_status_rules())
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Normal run: the combined queue compacted (or not), split and cleaned whole
+        combined = combine(mixed_date_queues)
+        if compact:
+            combined, _ = compact_queue_frame(combined)
+        partitions, unmatched = split_by_status(combined, classify)
+        normal = write_csv({name: queue_cleanup(part) for name, part in partitions.items()}, str(tmp_path / 'normal'))
+
+        # Chunked run, in chunks smaller than every ISO's queue and partition
+        result = run_chunked(fetched(mixed_date_queues), classify, ['csv'], chunk_rows=20, name='chunked',
+                             directory=str(tmp_path), compact=compact)
+
+    assert read_csvs(result['paths']) == read_csvs(normal)
+    assert result['unmatched'].equals(unmatched)
@@ -0,0 +1,40 @@
+# Author: Selorm Kwami Dzakpasu
+
+import contextlib
+import io
+import pandas as pd
+import pytest
+from benchmark import combine
+from compaction import compact_queue_frame, restore_plain_dtypes
+from status_rules import split_by_status
+from queue_cleanup import queue_cleanup
+
+
+def clean(df, compact):
+    with contextlib.redirect_stdout(io.StringIO()):
+        if compact:
+            df, _ = compact_queue_frame(df)
+        partitions, _ = split_by_status(df)
+        return {name: queue_cleanup(part) for name, part in partitions.items()}
+
+
+@pytest.mark.parametrize('mixed_dates', [False, True])
+def test_cleaned_queues_same_with_and_without_compaction(queues, mixed_date_queues, mixed_dates):
+    df = combine(mixed_date_queues if mixed_dates else queues)
+    plain, compacted = clean(df, compact=False), clean(df, compact=True)
+
+    assert list(plain) == list(compacted)
+    for name in plain:
+        pd.testing.assert_frame_equal(compacted[name], plain[name], check_exact=True)
+
+
+def test_restore_gives_back_the_published_values(mixed_date_queues):
+    published = combine(mixed_date_queues)
+    with contextlib.redirect_stdout(io.StringIO()):
+        compacted, _ = compact_queue_frame(published)
+    restored = restore_plain_dtypes(compacted)
+    for col in ['Status', 'State', 'Capacity (MW)', 'Summer Capacity (MW)', 'Latitude']:
+        assert compacted[col].dtype != object
+    for col in published.columns:
+        assert restored[col].dtype == published[col].dtype, col
+        assert restored[col].astype(str).equals(published[col].astype(str)), col # str() tells None and NaN apart
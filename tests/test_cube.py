@@ -0,0 +1,42 @@
+# Author: Selorm Kwami Dzakpasu
+
+import pandas as pd
+import pytest
+from cube import build_cube, query_cube, main
+
+
+@pytest.fixture
+def cube():
+    def partition(*rows):
+        return pd.DataFrame(rows, columns=['Technology', 'State', 'Balancing Authority Code', 'Planned Operation Year', 'Capacity (MW)'])
+    return build_cube({
+        'Active': partition(('Solar', 'CA', 'CAISO', 2026, 100), ('Wind', 'TX', 'ERCOT', 2027, 200), ('Solar', 'TX', 'ERCOT', 2026, 50)),
+        'Withdrawn': partition(('Solar', 'CA', 'CAISO', 2025, 10)),
+    })
+
+
+@pytest.mark.parametrize('by', [['State', 'Technology'], ['Planned Operation Year', 'Partition', 'Technology', 'State', 'Balancing Authority Code']])
+def test_columns_in_by_order(cube, by):
+    # Whether the level is rolled up or not, the columns come back in the order asked for
+    result = query_cube(by, cube=cube)
+    assert list(result.columns) == by + ['Capacity (MW)', 'Projects']
+
+
+def test_rollup_and_filter(cube):
+    result = query_cube(['State'], where={'Partition': 'Active'}, cube=cube)
+    assert result.to_dict('records') == [{'State': 'TX', 'Capacity (MW)': 250, 'Projects': 2},
+                                         {'State': 'CA', 'Capacity (MW)': 100, 'Projects': 1}]
+    assert query_cube(cube=cube).to_dict('records') == [{'Capacity (MW)': 360, 'Projects': 4}]
+
+
+def test_command_line(cube, tmp_path, capsys):
+    path = str(tmp_path / 'cube.pkl')
+    pd.to_pickle(cube, path)
+
+    assert main(['--cube', path]) == 0 # Grand total
+    assert capsys.readouterr().out.split() == ['Capacity', '(MW)', 'Projects', '360', '4']
+    assert main(['--where', 'Partition=Active', 'Planned Operation Year=2026', '--cube', path]) == 0 # Filters only
+    assert capsys.readouterr().out.split()[-2:] == ['150', '2']
+    with pytest.raises(SystemExit):
+        main(['County', '--cube', path])
+    assert 'Unknown dimension' in capsys.readouterr().err
@@ -0,0 +1,66 @@
+# Author: Selorm Kwami Dzakpasu
+
+import contextlib
+import io
+import pandas as pd
+from dedupe import find_linked_projects
+
+COLUMNS = ['Balancing Authority Code', 'Queue ID', 'Project Name', 'State', 'County', 'Interconnection Location',
+           'Capacity (MW)', 'Technology', 'Queue Date']
+
+
+def cleaned(*rows):
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    df['Queue Date'] = pd.to_datetime(df['Queue Date'])
+    return df
+
+def link(**partitions):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return find_linked_projects(partitions)
+
+def linked_ids(pairs):
+    return {(a, b) for a, b in zip(pairs['Queue ID A'], pairs['Queue ID B'])}
+
+
+def test_neighbouring_capacity_buckets_are_compared():
+    # 100 and 110 MW are on either side of a bucket boundary, 100 and 200 MW are too far apart to be compared
+    groups, pairs = link(Active=cleaned(
+        ('MISO', 'J1', 'Prairie Solar', 'IN', 'Lake', 'Sub A 345kV', 100, 'Solar', '2020-01-01'),
+        ('PJM', 'AB1', 'Prairie Solar LLC', 'IN', 'Lake County', 'SUB A 345 KV', 110, 'Solar', '2020-03-01'),
+        ('PJM', 'AB2', 'Prairie Solar', 'IN', 'Lake', 'Sub A 345kV', 200, 'Solar', '2020-01-01'),
+    ))
+    assert linked_ids(pairs) == {('J1', 'AB1')}
+    assert pairs['Link'].tolist() == ['Cross-ISO']
+
+def test_hybrid_components():
+    groups, pairs = link(Active=cleaned(
+        ('NYISO', '1001', 'NY37 Solar', 'NY', 'Albany', 'Sub B 115kV', 100, 'Solar', '2021-05-05'),
+        ('NYISO', '1002', 'NY37 Energy Storage', 'NY', 'Albany', 'Sub B 115kV', 20, 'Battery Storage', '2021-05-05'),
+        ('NYISO', '1003', 'Hudson Wind', 'NY', 'Albany', 'Sub B 115kV', 30, 'Wind', '2021-05-05'), # Same day, another project
+    ))
+    assert linked_ids(pairs) == {('1001', '1002')}
+    assert pairs['Link'].tolist() == ['Hybrid']
+
+def test_groups_join_chains_of_pairs():
+    # 100 and 145 MW are two buckets apart and never compared, but both link to 120 MW (different days, so not a hybrid block either)
+    def ridge(queue_id, capacity, queue_date):
+        return ('MISO', queue_id, 'Ridge Wind', 'KS', 'Ford', 'Sub C', capacity, 'Wind', queue_date)
+    groups, pairs = link(Active=cleaned(ridge('W1', 100, '2019-01-01'), ridge('W2', 120, '2019-02-01')),
+                         Withdrawn=cleaned(ridge('W3', 145, '2019-03-01')))
+    assert linked_ids(pairs) == {('W1', 'W2'), ('W2', 'W3')}
+    assert groups['Group'].tolist() == [1, 1, 1]
+    assert groups['Queue ID'].tolist() == ['W1', 'W2', 'W3'] and groups['Partition'].tolist() == ['Active', 'Active', 'Withdrawn']
+
+def test_same_queue_id_in_two_isos():
+    groups, pairs = link(Active=cleaned(
+        ('MISO', 'J500', 'Seam Solar', 'IL', 'Lee', 'Sub D', 80, 'Solar', '2022-02-02'),
+        ('PJM', 'J500', 'Seam Solar', 'IL', 'Lee', 'Sub D', 80, 'Solar', '2022-02-02'),
+        ('PJM', 'J501', 'Other Solar', 'OH', 'Lee', 'Sub E', 80, 'Solar', '2022-02-02'),
+    ))
+    assert pairs[['Balancing Authority Code A', 'Queue ID A', 'Balancing Authority Code B', 'Queue ID B', 'Link']].values.tolist() == [
+        ['MISO', 'J500', 'PJM', 'J500', 'Cross-ISO']]
+    assert groups[['Group', 'Balancing Authority Code', 'Queue ID']].values.tolist() == [[1, 'MISO', 'J500'], [1, 'PJM', 'J500']]
+
+def test_no_projects():
+    groups, pairs = link(Active=cleaned())
+    assert groups.empty and pairs.empty
@@ -0,0 +1,116 @@
+# Author: Selorm Kwami Dzakpasu
+
+import http.server
+import threading
+import time
+import pytest
+import requests
+from downloads import HTTPCache
+
+
+# Stand-in for an ISO's web server
+# Answers with Server.status, or 304 Not Modified when the request's If-None-Match is the current ETag
+class Server(http.server.ThreadingHTTPServer):
+    status = 200
+    body = b'queue'
+    etag = '"v1"'
+    delay = 0 # Seconds to wait before answering
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get('If-None-Match')))
+        time.sleep(self.server.delay)
+        if self.server.status == 200 and self.headers.get('If-None-Match') == self.server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(self.server.status)
+        self.send_header('ETag', self.server.etag)
+        self.send_header('Content-Length', str(len(self.server.body)))
+        self.end_headers()
+        self.wfile.write(self.server.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = Server(('127.0.0.1', 0), Handler)
+    server.requests = []
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/queue.csv"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_fresh_file_is_served_from_the_cache(server, tmp_path):
+    cache = HTTPCache(directory=str(tmp_path))
+    first = cache.get(server.url)
+    second = cache.get(server.url)
+
+    assert (first.from_cache, first.changed, first.content) == (False, True, b'queue')
+    assert (second.from_cache, second.changed, second.content) == (True, False, b'queue')
+    assert len(server.requests) == 1 # Still fresh, the server isn't asked
+
+def test_stale_file_is_revalidated_with_its_etag(server, tmp_path):
+    cache = HTTPCache(directory=str(tmp_path), ttl=0)
+    cache.get(server.url)
+    response = cache.get(server.url)
+
+    assert server.requests[-1] == ('/queue.csv', '"v1"')
+    assert (response.from_cache, response.changed, response.content) == (True, False, b'queue')
+    assert response.attempts[0]['status'] == 304
+
+def test_new_version_is_downloaded_again(server, tmp_path):
+    cache = HTTPCache(directory=str(tmp_path), ttl=0)
+    first = cache.get(server.url)
+    server.body, server.etag = b'new queue', '"v2"'
+    response = cache.get(server.url)
+
+    assert server.requests[-1] == ('/queue.csv', '"v1"')
+    assert (response.from_cache, response.changed, response.content) == (False, True, b'new queue')
+    assert response.sha256 != first.sha256
+    assert cache.get(server.url, refresh=True).content == b'new queue' # Now revalidated against "v2"
+    assert server.requests[-1] == ('/queue.csv', '"v2"')
+
+def test_least_recently_used_files_are_evicted(server, tmp_path):
+    cache = HTTPCache(directory=str(tmp_path), max_bytes=len(server.body) * 2)
+    for name in ['a', 'b', 'c']:
+        cache.get(f"{server.url}?{name}")
+        time.sleep(0.01) # Distinct "used" times
+    cache.get(f"{server.url}?a") # Evicted, downloaded again
+
+    assert [path for path, _ in server.requests] == ['/queue.csv?a', '/queue.csv?b', '/queue.csv?c', '/queue.csv?a']
+    assert len(list(tmp_path.glob('*.body'))) == 2
+    cache.get(f"{server.url}?c") # Still cached
+    assert len(server.requests) == 4
+
+def test_files_unused_for_max_age_are_evicted(server, tmp_path):
+    cache = HTTPCache(directory=str(tmp_path), max_age=0)
+    cache.get(server.url)
+    time.sleep(0.01)
+    cache.evict()
+    assert not list(tmp_path.iterdir())
+
+
+def test_retries_stop_before_the_deadline(server, tmp_path, capsys):
+    server.status = 503
+    cache = HTTPCache(directory=str(tmp_path), retries=10, backoff=1)
+    started = time.monotonic()
+    with pytest.raises(RuntimeError):
+        cache.get(server.url, deadline=started + 8)
+
+    assert time.monotonic() - started < 8
+    assert 'no time left to retry' in capsys.readouterr().out
+
+def test_slow_response_is_given_up_at_the_deadline(server, tmp_path):
+    server.delay = 5
+    cache = HTTPCache(directory=str(tmp_path), retries=0)
+    started = time.monotonic()
+    with pytest.raises((requests.Timeout, TimeoutError)):
+        cache.get(server.url, deadline=started + 1)
+    assert time.monotonic() - started < 3
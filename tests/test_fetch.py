@@ -0,0 +1,75 @@
+# Author: Selorm Kwami Dzakpasu
+
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+import pandas as pd
+import pytest
+import main
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def sources(monkeypatch, tmp_path):
+    """Two stand-in ISOs: FAST answers straight away, SLOW hangs until the test ends"""
+    release = threading.Event()
+
+    def slow(refresh=False, deadline=None):
+        release.wait(30)
+        return pd.DataFrame({'Queue ID': ['slow']})
+
+    monkeypatch.setattr(main, 'ISO_SOURCES', {
+        'FAST': ('Fast ISO', lambda refresh=False, deadline=None: pd.DataFrame({'Queue ID': ['fast']})),
+        'SLOW': ('Slow ISO', slow),
+    })
+    monkeypatch.setattr(main, 'SCHEMA_VALIDATOR', None)
+    monkeypatch.setattr(main, 'USE_STALE_QUEUES', False)
+    monkeypatch.setattr(main.FRAME_CACHE, 'directory', str(tmp_path / 'frames'))
+    yield
+    release.set()
+    for thread in threading.enumerate(): # Let the abandoned fetches finish while FRAME_CACHE still points at tmp_path
+        if thread.name.startswith('fetch-'):
+            thread.join()
+
+
+def test_slow_iso_times_out_without_holding_up_the_others(sources):
+    started = time.monotonic()
+    queues, errors = main.fetch_all_queues(timeouts={'SLOW': 1})
+
+    assert time.monotonic() - started < 5
+    assert list(queues) == ['FAST']
+    assert isinstance(errors['SLOW'], TimeoutError)
+
+
+def test_timed_out_iso_falls_back_to_its_last_good_queue(sources, monkeypatch):
+    monkeypatch.setattr(main, 'USE_STALE_QUEUES', True)
+    main.FRAME_CACHE.remember('SLOW', pd.DataFrame({'Queue ID': ['cached']}))
+    queues, errors = main.fetch_all_queues(timeouts={'SLOW': 1})
+
+    assert not errors
+    assert list(queues) == ['FAST', 'SLOW']
+    assert queues['SLOW']['Queue ID'].tolist() == ['cached']
+    assert queues['SLOW']['Balancing Authority Code'].tolist() == ['SLOW']
+
+    # refresh never uses a stale queue
+    queues, errors = main.fetch_all_queues(timeouts={'SLOW': 1}, refresh=True)
+    assert list(queues) == ['FAST'] and isinstance(errors['SLOW'], TimeoutError)
+
+
+def test_abandoned_fetch_does_not_block_exit():
+    script = textwrap.dedent("""
+        import time
+        import main
+        main.ISO_SOURCES = {'SLOW': ('Slow ISO', lambda refresh=False, deadline=None: time.sleep(60))}
+        main.SCHEMA_VALIDATOR = None
+        main.USE_STALE_QUEUES = False
+        queues, errors = main.fetch_all_queues(timeouts={'SLOW': 1})
+        assert not queues and isinstance(errors['SLOW'], TimeoutError)
+    """)
+    started = time.monotonic()
+    subprocess.run([sys.executable, '-c', script], cwd=REPO, check=True, capture_output=True, timeout=30)
+    assert time.monotonic() - started < 20 # The interpreter doesn't wait out the 60s fetch
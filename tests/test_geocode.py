@@ -0,0 +1,80 @@
+# Author: Selorm Kwami Dzakpasu
+
+import pandas as pd
+import pytest
+from geocode import Geocoder, geocode_partitions
+
+# A few rows in the layout of the Census Bureau's county gazetteer (tab separated, the last column name padded with spaces)
+COUNTIES = (
+    "USPS\tGEOID\tANSICODE\tNAME\tALAND\tAWATER\tALAND_SQMI\tAWATER_SQMI\tINTPTLAT\tINTPTLONG                 \n"
+    "CA\t06029\t02054176\tKern County\t0\t0\t0\t0\t35.34\t-118.73\n"
+    "NY\t36047\t00974122\tKings County\t0\t0\t0\t0\t40.64\t-73.94\n"
+    "NY\t36081\t00974139\tQueens County\t0\t0\t0\t0\t40.70\t-73.82\n"
+    "LA\t22071\t00558106\tOrleans Parish\t0\t0\t0\t0\t30.07\t-89.93\n"
+    "MD\t24510\t01702381\tBaltimore city\t0\t0\t0\t0\t39.30\t-76.61\n"
+)
+LOCATIONS = "State,Name,Latitude,Longitude\nNY,Astoria,40.78,-73.91\n"
+
+
+@pytest.fixture
+def geocoder(tmp_path):
+    gazetteer = tmp_path / 'gazetteer'
+    gazetteer.mkdir()
+    (gazetteer / '2024_Gaz_counties_national.txt').write_text(COUNTIES, encoding='latin-1')
+    (gazetteer / 'locations.csv').write_text(LOCATIONS)
+    return Geocoder(str(gazetteer), str(tmp_path / 'cache'))
+
+
+def queue(*rows):
+    df = pd.DataFrame(rows, columns=['State', 'County', 'Interconnection Location'])
+    df['Latitude'] = None
+    df['Longitude'] = None
+    return df
+
+
+def test_state_and_county_matching(geocoder):
+    assert geocoder.load()
+    df, stats = geocoder.geocode(queue(
+        ('CA', 'Kern', None),                # County without "County"
+        ('California', 'KERN COUNTY', None), # State spelled out
+        ('NY', 'Kings, Queens', None),       # Several counties, the first one found
+        ('LA', 'Orleans', None),             # Parish
+        ('MD', 'Baltimore', None),           # Independent city
+        ('TX', 'Kern', None),                # County of another state
+        (None, 'Kern', None),
+    ))
+    assert df['Latitude'].tolist()[:5] == [35.34, 35.34, 40.64, 30.07, 39.30]
+    assert df['Longitude'].tolist()[:5] == [-118.73, -118.73, -73.94, -89.93, -76.61]
+    assert df['Latitude'].iloc[5:].isna().all()
+    assert (stats['county'], stats['location'], stats['missed']) == (5, 0, 2)
+
+def test_listed_location_is_used_before_the_county(geocoder):
+    geocoder.load()
+    df, stats = geocoder.geocode(queue(
+        ('NY', 'Queens', 'Astoria 138 kV Substation'),
+        ('NY', 'Queens', 'Astoria - Unknown 345kV'), # One end of a line
+        ('NY', 'Queens', 'Unlisted Substation'),
+        ('CA', 'Kern', 'Astoria'),                   # Listed in another state
+    ))
+    assert df['Latitude'].tolist() == [40.78, 40.78, 40.70, 35.34]
+    assert (stats['location'], stats['county']) == (2, 2)
+
+def test_published_coordinates_are_kept_and_memo_is_reused(geocoder):
+    geocoder.load()
+    df = queue(('CA', 'Kern', None), ('CA', 'Kern', None))
+    df.loc[0, ['Latitude', 'Longitude']] = [36.0, -119.0]
+    df, stats = geocoder.geocode(df)
+    assert df['Latitude'].tolist() == [36.0, 35.34]
+    geocoder.save()
+
+    again = Geocoder(geocoder.gazetteer_dir, geocoder.cache_dir)
+    again.load()
+    _, stats = again.geocode(queue(('CA', 'Kern', None)))
+    assert (stats['memo_hits'], stats['memo_misses']) == (1, 0)
+
+
+def test_skipped_without_a_gazetteer(tmp_path, capsys):
+    partitions = {'Active': queue(('CA', 'Kern', None))}
+    result, stats = geocode_partitions(partitions, Geocoder(str(tmp_path / 'none'), str(tmp_path / 'cache')))
+    assert result is partitions and stats is None
+    assert "Geocoding skipped" in capsys.readouterr().out
@@ -0,0 +1,67 @@
+# Author: Selorm Kwami Dzakpasu
+
+import contextlib
+import io
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from history import record_history, project_history, queue_as_of
+
+
+def cleaned(rows):
+    df = pd.DataFrame(rows, columns=['Queue ID', 'Balancing Authority Code', 'Status', 'Capacity (MW)', 'Queue Date'])
+    df['Queue Date'] = pd.to_datetime(df['Queue Date'])
+    return df
+
+FIRST_RUN = {
+    'Active': cleaned([(1234.0, 'MISO', 'Active', 100.0, '2020-01-02'), ('J2', 'MISO', 'Active', 50.0, '2021-02-03'),
+                       ('AB-1', 'PJM', 'Active', 20.0, None)]),
+    'Withdrawn': cleaned([(np.nan, 'MISO', 'Withdrawn', 5.0, '2015-06-07')]),
+}
+# A project's capacity changed and another one withdrawn
+SECOND_RUN = {
+    'Active': cleaned([(1234.0, 'MISO', 'Active', 150.0, '2020-01-02'), ('AB-1', 'PJM', 'Active', 20.0, None)]),
+    'Withdrawn': cleaned([(np.nan, 'MISO', 'Withdrawn', 5.0, '2015-06-07'), ('J2', 'MISO', 'Withdrawn', 50.0, '2021-02-03')]),
+}
+
+
+@pytest.fixture
+def history(tmp_path):
+    path = str(tmp_path / 'history.sqlite')
+    with contextlib.redirect_stdout(io.StringIO()):
+        first = record_history(FIRST_RUN, run_date=datetime(2025, 1, 1, 6), path=path)
+        second = record_history(SECOND_RUN, run_date=datetime(2025, 2, 1, 6), path=path)
+    return path, first, second
+
+
+def test_only_changes_are_stored(history):
+    _, first, second = history
+    assert (first['Change'] == 'Added').all() and len(first) == 4
+    changes = dict(zip(second['Queue ID'], second['Change']))
+    assert changes == {'1234': 'Updated', 'J2': 'Status Changed'}
+
+def test_project_history(history):
+    path, _, _ = history
+    versions = project_history('MISO', '1234', path=path) # Stored from a float Queue ID, found by its text
+    assert list(versions['Change']) == ['Added', 'Updated']
+    assert list(versions['Capacity (MW)']) == [100.0, 150.0]
+    assert list(versions['Run Date']) == [pd.Timestamp('2025-01-01 06:00'), pd.Timestamp('2025-02-01 06:00')]
+    assert project_history('MISO', 1234.0, path=path).equals(versions)
+
+    withdrawn = project_history('MISO', 'J2', path=path)
+    assert list(zip(withdrawn['Change'], withdrawn['Partition'])) == [('Added', 'Active'), ('Status Changed', 'Withdrawn')]
+
+def test_queue_as_of(history):
+    path, _, _ = history
+    assert queue_as_of('2024-12-31', path=path) == {}
+
+    between = queue_as_of('2025-01-15', path=path)
+    assert list(between) == ['Active', 'Withdrawn']
+    assert list(between['Active']['Queue ID']) == [1234.0, 'J2', 'AB-1'] # The rows as the cleaned queues had them
+    assert list(between['Active']['Capacity (MW)']) == [100.0, 50.0, 20.0]
+    assert between['Active']['Queue Date'].dtype == 'datetime64[ns]'
+
+    latest = queue_as_of('2025-02-01', isos=['MISO'], path=path) # The whole day is included
+    assert list(latest['Active']['Capacity (MW)']) == [150.0]
+    assert len(latest['Withdrawn']) == 2
@@ -0,0 +1,40 @@
+# Author: Selorm Kwami Dzakpasu
+
+import contextlib
+import io
+import pandas as pd
+from benchmark import combine
+from incremental import incremental_cleanup
+from status_rules import split_by_status
+from queue_cleanup import queue_cleanup
+
+
+def split(queues):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return split_by_status(combine(queues))[0]
+
+
+def test_incremental_matches_full_cleanup(mixed_date_queues, tmp_path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        first, changes = incremental_cleanup(split(mixed_date_queues), directory=str(tmp_path))
+    assert (changes['Change'] == 'Added').all()
+
+    # Next run: a NEISO project edited, one added and one removed, so only NEISO rows (with their own date format) are cleaned again
+    queues = {code: queue.copy() for code, queue in mixed_date_queues.items()}
+    neiso = queues['NEISO']
+    neiso.loc[3, 'Capacity (MW)'] = 999
+    added = neiso.iloc[[5]].assign(**{'Queue ID': 'NEISO-NEW'})
+    removed = neiso.loc[7, 'Queue ID']
+    queues['NEISO'] = pd.concat([neiso.drop(index=7), added], ignore_index=True)
+
+    partitions = split(queues)
+    with contextlib.redirect_stdout(io.StringIO()):
+        cleaned, changes = incremental_cleanup(partitions, directory=str(tmp_path))
+        full = {name: queue_cleanup(df).reset_index(drop=True) for name, df in partitions.items()}
+
+    assert list(cleaned) == list(full)
+    for name in full:
+        pd.testing.assert_frame_equal(cleaned[name], full[name], check_exact=True)
+    changed = dict(zip(changes['Queue ID'], changes['Change']))
+    assert changed['NEISO-NEW'] == 'Added' and changed[removed] == 'Removed'
+    assert set(changes['Balancing Authority Code']) == {'NEISO'}
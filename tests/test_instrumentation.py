@@ -0,0 +1,62 @@
+# Author: Selorm Kwami Dzakpasu
+
+import json
+import pandas as pd
+import pytest
+from instrumentation import Instrumentation
+
+
+def test_nested_stages_in_the_report(tmp_path):
+    stages = Instrumentation()
+
+    @stages.timed('clean')
+    def clean(df):
+        steps = stages.steps()
+        steps.start('Step 1', df)
+        df = df[df['MW'] > 1]
+        steps.start('Step 2', df)
+        df = df.assign(GW=df['MW'] / 1000)
+        steps.finish(df)
+        return df
+
+    with stages.stage('pipeline', pd.DataFrame({'MW': range(10)})) as pipeline:
+        cleaned = clean(pd.DataFrame({'MW': range(10)}))
+        pipeline.set_output(cleaned)
+
+    path = tmp_path / 'report' / 'run_report.json'
+    assert stages.write_report(str(path)) == [str(path)]
+    report = json.loads(path.read_text())
+
+    assert report['seconds'] >= 0 and report['started']
+    found = {stage['name']: stage for stage in report['stages']}
+    assert list(found) == ['pipeline', 'clean', 'Step 1', 'Step 2'] # In the order they started
+    assert [found[name]['parent'] for name in found] == [None, 'pipeline', 'clean', 'clean']
+    assert (found['pipeline']['rows_in'], found['pipeline']['rows_out']) == (10, 8)
+    assert (found['Step 1']['rows_in'], found['Step 1']['rows_out']) == (10, 8)
+    assert (found['Step 2']['columns_in'], found['Step 2']['columns_out']) == (1, 2)
+    assert all(stage['seconds'] >= 0 and stage['error'] is None for stage in report['stages'])
+
+
+def test_failed_stage_is_recorded():
+    stages = Instrumentation()
+    with pytest.raises(KeyError):
+        with stages.stage('outer'):
+            steps = stages.steps()
+            steps.start('Step 1', None)
+            raise KeyError('Capacity (MW)')
+
+    outer, step = stages.stages
+    assert outer.error == step.error == "KeyError('Capacity (MW)')" # The step the error happened in ends with the stage around it
+    assert step.parent == 'outer' and step.seconds is not None
+    del steps # Closing the step left open doesn't change it
+    assert step.error == "KeyError('Capacity (MW)')"
+    with stages.stage('next') as record: # Stages left open by the error don't become its parent
+        pass
+    assert record.parent is None
+
+
+def test_disabled_records_nothing():
+    stages = Instrumentation(enabled=False)
+    with stages.stage('stage'):
+        pass
+    assert stages.stages == []
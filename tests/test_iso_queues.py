@@ -0,0 +1,36 @@
+# Author: Selorm Kwami Dzakpasu
+
+import io
+import pandas as pd
+import pytest
+from benchmark import synthetic_pjm_xml
+from iso_queues import read_pjm_xml
+
+# Projects of several types, with a field only a transmission project has, a field that is a number on the generation
+# projects but text on another project, missing fields, an attribute and the project's own text
+PLANNING_QUEUES = b"""<?xml version="1.0" encoding="utf-8"?>
+<PlanningQueues xmlns="http://pjm.com/queues">
+  <Project id="1"><ProjectNumber>AA1-001</ProjectNumber><ProjectType>Generation Interconnection</ProjectType><Code>1</Code><MW>10</MW></Project>
+  <Project id="2"><ProjectNumber>AA1-002</ProjectNumber><ProjectType>Transmission Interconnection</ProjectType><Code>abc</Code><Line>345 kV</Line></Project>
+  <Project id="3">note<ProjectNumber>AA1-003</ProjectNumber><ProjectType>Generation Interconnection</ProjectType><Code>2</Code></Project>
+  <Project id="4"><ProjectNumber>AA1-004</ProjectNumber><ProjectType>Long-Term Firm Transmission Service</ProjectType><MW>7.5</MW></Project>
+  <Project id="5"><ProjectNumber>AA1-005</ProjectNumber><ProjectType>Generation Interconnection</ProjectType><MW>20</MW><Code/></Project>
+</PlanningQueues>
+"""
+
+
+def read_xml_generation(content):
+    queue = pd.read_xml(io.BytesIO(content), parser='etree')
+    return queue[queue['ProjectType'] == 'Generation Interconnection'].reset_index(drop=True)
+
+
+@pytest.mark.parametrize('content', [PLANNING_QUEUES, synthetic_pjm_xml(rows=200)], ids=['fixture', 'synthetic'])
+def test_read_pjm_xml_matches_read_xml(content):
+    pd.testing.assert_frame_equal(read_pjm_xml(content), read_xml_generation(content), check_exact=True)
+
+
+def test_types_come_from_every_project():
+    queue = read_pjm_xml(PLANNING_QUEUES)
+    assert list(queue['ProjectNumber']) == ['AA1-001', 'AA1-003', 'AA1-005']
+    assert queue['Code'].tolist()[:2] == ['1', '2'] # Text, as another project's Code is "abc"
+    assert queue['MW'].dtype == float and 'Line' in queue.columns
@@ -0,0 +1,45 @@
+# Author: Selorm Kwami Dzakpasu
+
+from datetime import datetime
+import openpyxl
+import pandas as pd
+from outputs import typed_partition, excel_stream, EXCEL_DATE_FORMAT
+
+
+def test_combined_queue_dates_in_any_format_survive():
+    # Combined queues (WRITE_COMBINED_QUEUES) still have each ISO's own date text
+    df = pd.DataFrame({
+        'Queue Date': ['2020-01-15', '01/16/2020', '2020-01-17T10:30:00', None],
+        'Withdrawal Date': ['2021-03-01T00:00:00', '3/2/2021', None, ''],
+    })
+    typed = typed_partition(df)
+
+    assert typed['Queue Date'].tolist()[:3] == list(pd.to_datetime(['2020-01-15', '2020-01-16', '2020-01-17']))
+    assert typed['Withdrawal Date'].tolist()[:2] == list(pd.to_datetime(['2021-03-01', '2021-03-02']))
+    assert typed['Queue Date'].isna().tolist() == [False, False, False, True]
+
+
+def test_cleaned_dates_kept_and_text_that_is_not_a_date_reported(capsys):
+    dates = pd.to_datetime(['2020-01-15 08:00', None])
+    typed = typed_partition(pd.DataFrame({'Planned Operation Date': dates, 'Cessation Date': ['TBD', '2022-05-01']}))
+
+    assert typed['Planned Operation Date'].equals(pd.Series(dates, name='Planned Operation Date'))
+    assert typed['Cessation Date'].isna().tolist() == [True, False]
+    assert "Cessation Date: 1 values that aren't dates" in capsys.readouterr().out
+
+
+def test_streamed_workbook_has_date_cells(tmp_path):
+    stream = excel_stream(str(tmp_path / 'streamed'), ['Active', 'Withdrawn'])
+    for dates in (['2020-01-15', None], ['2021-02-16']): # Two chunks of the same sheet
+        stream.append('Active', pd.DataFrame({'Queue ID': ['J1'] * len(dates), 'Queue Date': pd.to_datetime(dates), 'Capacity (MW)': 5.0}))
+    stream.append('Withdrawn', pd.DataFrame({'Queue ID': [1234], 'Queue Date': pd.to_datetime(['2019-03-17'])}))
+    stream.close()
+
+    workbook = openpyxl.load_workbook(stream.paths[0])
+    assert workbook.sheetnames == ['Active', 'Withdrawn']
+    active = list(workbook['Active'].iter_rows(values_only=True))
+    assert active == [('Queue ID', 'Queue Date', 'Capacity (MW)'), ('J1', datetime(2020, 1, 15), 5),
+                      ('J1', None, 5), ('J1', datetime(2021, 2, 16), 5)]
+    cell = workbook['Withdrawn']['B2']
+    assert cell.is_date and cell.number_format == EXCEL_DATE_FORMAT
+    assert workbook['Withdrawn']['A2'].value == 1234
@@ -0,0 +1,32 @@
+# Author: Selorm Kwami Dzakpasu
+
+import contextlib
+import io
+import pandas as pd
+from benchmark import combine
+from parallel_cleanup import parallel_cleanup, first_date_rows, DATE_SOURCES
+from status_rules import split_by_status
+from queue_cleanup import queue_cleanup
+
+CHUNK_ROWS = 15
+
+
+def test_parallel_cleanup_matches_sequential(mixed_date_queues):
+    with contextlib.redirect_stdout(io.StringIO()):
+        partitions, _ = split_by_status(combine(mixed_date_queues))
+
+    # A partition without any date in its first chunks, so every later chunk needs the anchor rows from a later chunk
+    late = partitions['Active'].copy()
+    date_columns = [col for columns in DATE_SOURCES.values() for col in columns if col in late.columns]
+    late.iloc[:2 * CHUNK_ROWS + 3, [late.columns.get_loc(col) for col in date_columns]] = None
+    assert all(position > 2 * CHUNK_ROWS for position in first_date_rows(late).values())
+    partitions['Late'] = late
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        parallel = parallel_cleanup(partitions, workers=2, chunk_rows=CHUNK_ROWS)
+        sequential = {name: queue_cleanup(df) for name, df in partitions.items()}
+
+    assert list(parallel) == list(sequential)
+    for name in sequential:
+        assert len(partitions[name]) > CHUNK_ROWS # Every partition is split into chunks
+        pd.testing.assert_frame_equal(parallel[name], sequential[name], check_exact=True)
@@ -0,0 +1,77 @@
+# Author: Selorm Kwami Dzakpasu
+
+import os
+import pandas as pd
+import pytest
+import intermediates
+import main
+
+# Options that keep a test run to the stages under test
+RUN = {'history': False, 'report': False, 'incremental': False, 'workers': 1, 'chunked': 0}
+
+
+@pytest.fixture
+def pipeline(monkeypatch, tmp_path, mixed_date_queues):
+    """main.py with every ISO "fetched" from the generated queues and everything it saves kept in tmp_path"""
+    fetched = []
+
+    def fetcher(code):
+        def fetch(refresh=False, deadline=None):
+            fetched.append(code)
+            return mixed_date_queues[code].copy()
+        return fetch
+
+    monkeypatch.setattr(main, 'ISO_SOURCES', {code: (name, fetcher(code)) for code, (name, _) in main.ISO_SOURCES.items()})
+    monkeypatch.setattr(main.FRAME_CACHE, 'directory', str(tmp_path / 'frames'))
+    monkeypatch.setattr(intermediates, 'PIPELINE_DIR', str(tmp_path / 'pipeline'))
+    monkeypatch.setattr(main, 'QUEUE_CUBE', str(tmp_path / 'cube.pkl'))
+    monkeypatch.chdir(tmp_path) # The outputs are written to the current folder
+    return fetched
+
+
+def test_subset_run(pipeline, tmp_path):
+    results = main.run_pipeline(isos=['PJM', 'MISO'], outputs=['csv'], **RUN)
+
+    assert sorted(pipeline) == ['MISO', 'PJM'] # Fetched at the same time, in any order
+    assert list(results['queues']) == ['MISO', 'PJM'] # In ISO_SOURCES order
+    for df in results['cleaned'].values():
+        assert set(df['Balancing Authority Code']) <= {'MISO', 'PJM'}
+    assert sorted(os.path.basename(path) for path in results['paths']) == [
+        f"Cleaned_ISO_Queues_{name}.csv.gz" for name in sorted(results['cleaned'])]
+    assert not os.path.exists(tmp_path / 'Cleaned_ISO_Queues.xlsx')
+    assert 'cube' not in results and not os.path.exists(tmp_path / 'cube.pkl') # Only a run of every ISO saves the cube
+
+
+def test_resumed_run(pipeline, tmp_path):
+    whole = main.run_pipeline(outputs=['csv'], **RUN)
+    assert os.path.exists(tmp_path / 'cube.pkl')
+
+    # Stop after the split, then clean and save what it saved without fetching again
+    split = main.run_pipeline(stop='split', **RUN)
+    assert set(split) == {'queues', 'errors', 'partitions', 'unmatched'}
+    fetches = len(pipeline)
+    resumed = main.run_pipeline(start='cleanup', outputs=['csv'], **RUN)
+    assert len(pipeline) == fetches and 'queues' not in resumed
+    assert list(resumed['cleaned']) == list(whole['cleaned'])
+    for name, df in whole['cleaned'].items():
+        pd.testing.assert_frame_equal(resumed['cleaned'][name], df)
+
+    # Write only some ISOs' cleaned queues from the last run
+    written = main.run_pipeline(start='write', isos=['NEISO'], outputs=['csv'], **RUN)
+    for name, df in whole['cleaned'].items():
+        expected = df[df['Balancing Authority Code'] == 'NEISO'].reset_index(drop=True)
+        pd.testing.assert_frame_equal(written['cleaned'][name], expected)
+
+    with pytest.raises(ValueError):
+        main.run_pipeline(start='write', stop='split', **RUN)
+
+
+def test_command_line(pipeline, tmp_path):
+    main.main(['--iso', 'CAISO', 'NYISO', '--output', 'parquet', '--history', '', '--report', ''])
+    active = pd.read_parquet(tmp_path / 'Cleaned_ISO_Queues_Active.parquet')
+    assert list(active['Balancing Authority Code'].unique()) == ['NYISO', 'CAISO']
+
+    main.main(['--start', 'write', '--iso', 'CAISO', '--output', 'csv', '--history', '', '--report', ''])
+    active = pd.read_csv(tmp_path / 'Cleaned_ISO_Queues_Active.csv.gz')
+    assert list(active['Balancing Authority Code'].unique()) == ['CAISO']
+    assert sorted(pipeline) == ['CAISO', 'NYISO'] # The second run fetched nothing
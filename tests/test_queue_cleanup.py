@@ -0,0 +1,61 @@
+# Author: Selorm Kwami Dzakpasu
+
+import numpy as np
+import pandas as pd
+import pytest
+from queue_cleanup import queue_cleanup
+from baseline_queue_cleanup import queue_cleanup as baseline_queue_cleanup
+
+# Date columns queue_cleanup() now keeps as dates, the row-wise version saved them as MM/DD/YYYY text
+SHORT_DATE_COLUMNS = ['Queue Date', 'Planned Operation Date']
+
+
+# The edge cases the row-wise steps handled one cell at a time
+def with_edge_cases(df):
+    df = df.copy()
+    # 5 character placeholders in the planned operation date columns are skipped for the next date
+    df.loc[0, ['Actual Completion Date', 'Proposed Completion Date']] = ['45123', '2031-05-01']
+    df.loc[1, ['Actual Completion Date', 'Proposed Completion Date', 'inService']] = [None, 'TBD..', '2029-02-03T00:00:00']
+    # and in the study status columns they are blanked
+    df.loc[2, ['System Impact Study Status', 'Facilities Study Status']] = ['Compl', 'Y/N/A']
+    # Rows mentioning jellyfish are dropped
+    df.loc[3, 'Project Name'] = 'The Jellyfish Farm'
+    df.loc[4, 'Comment'] = 'jellyfish'
+    # Blank IA statuses get no "IA " prefix
+    df.loc[5, 'Interconnection Agreement Status'] = ''
+    df.loc[6, 'Interconnection Agreement Status'] = None
+    df.loc[7, 'Interconnection Agreement Status'] = 'Executed'
+    # Queue dates with a time
+    df.loc[8, 'Queue Date'] = '2019-07-04T13:45:00'
+    return df
+
+
+@pytest.mark.parametrize('excel_roundtrip', [False, True])
+def test_matches_row_wise_cleanup(combined, excel_roundtrip, tmp_path):
+    df = with_edge_cases(combined)
+    if excel_roundtrip: # The queues were read back from Combined_ISO_Queues.xlsx before they were passed in memory
+        df.to_excel(tmp_path / 'combined.xlsx', index=False)
+        df = pd.read_excel(tmp_path / 'combined.xlsx')
+
+    expected = baseline_queue_cleanup(df)
+    cleaned = queue_cleanup(df)
+
+    assert not cleaned['Project Name'].astype(str).str.contains('jellyfish', case=False).any()
+    for col in SHORT_DATE_COLUMNS:
+        assert pd.api.types.is_datetime64_any_dtype(cleaned[col])
+        cleaned[col] = cleaned[col].dt.strftime('%m/%d/%Y')
+    pd.testing.assert_frame_equal(cleaned, expected, check_exact=True)
+    # Same Python types cell by cell (e.g. numbers that stayed numbers), not just equal values
+    assert [type(value) for value in cleaned.to_numpy().ravel()] == [type(value) for value in expected.to_numpy().ravel()]
+
+
+def test_edge_cases(combined):
+    cleaned = queue_cleanup(with_edge_cases(combined)).set_index('Queue ID')
+    queue_ids = combined['Queue ID']
+
+    assert queue_ids[3] not in cleaned.index and queue_ids[4] not in cleaned.index
+    assert cleaned.loc[queue_ids[0], 'Planned Operation Date'] == pd.Timestamp('2031-05-01')
+    assert cleaned.loc[queue_ids[1], 'Planned Operation Date'] == pd.Timestamp('2029-02-03')
+    assert cleaned.loc[queue_ids[8], 'Queue Date'] == pd.Timestamp('2019-07-04')
+    assert not cleaned.loc[queue_ids[5], 'Status'].endswith('IA ')
+    assert cleaned.loc[queue_ids[7], 'Status'].endswith('IA Executed')
@@ -0,0 +1,53 @@
+# Author: Selorm Kwami Dzakpasu
+
+import contextlib
+import io
+import pytest
+from schemas import load_schemas, compile_schemas, check_schema, record_schemas, SchemaDriftError
+from queue_cleanup import queue_cleanup
+
+
+@pytest.fixture
+def validate():
+    return compile_schemas(load_schemas())
+
+
+def issues_of(issues, severity):
+    return {(check, column) for level, check, column, _ in issues if level == severity}
+
+
+def test_missing_iso_specific_column_is_only_a_warning(queues, validate, capsys):
+    queues['PJM'] = queues['PJM'].drop(columns=['Backfeed Date'])
+    issues = check_schema(validate, 'PJM', queues['PJM'])
+
+    assert ('missing column', 'Backfeed Date') in issues_of(issues, 'warning')
+    assert not issues_of(issues, 'error')
+    assert "PJM: schema warning, missing column 'Backfeed Date'" in capsys.readouterr().out
+
+def test_missing_status_column_quarantines_the_queue(queues, validate):
+    with pytest.raises(SchemaDriftError) as raised:
+        check_schema(validate, 'SPP', queues['SPP'].drop(columns=['Status (Original)']))
+    assert ('missing column', 'Status (Original)') in issues_of(raised.value.issues, 'error')
+
+    with pytest.raises(SchemaDriftError):
+        check_schema(validate, 'MISO', queues['MISO'].drop(columns=['Queue Date']))
+
+
+def test_record_builds_the_registry_from_queues(queues):
+    table = record_schemas(queues, {'isos': {}})
+    assert table['isos']['MISO']['types']['Queue Date'] == 'text'
+    assert set(table['isos']['MISO']['statuses']['Status']) == set(queues['MISO']['Status'].dropna())
+
+    # Queues that match what was recorded have nothing to report
+    validate = compile_schemas(table)
+    for iso, queue in queues.items():
+        assert validate(iso, queue) == []
+
+def test_queue_missing_an_iso_specific_column_still_cleans(queues):
+    import main
+    queues['PJM'] = queues['PJM'].drop(columns=['Backfeed Date'])
+    fetched = {code: main.add_balancing_authority(queue.copy(), code) for code, queue in queues.items()}
+    with contextlib.redirect_stdout(io.StringIO()):
+        partitions, _ = main.split_queues(fetched)
+        cleaned = {name: queue_cleanup(part) for name, part in partitions.items()}
+    assert sum(len(df) for df in cleaned.values()) > 0
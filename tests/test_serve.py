@@ -0,0 +1,88 @@
+# Author: Selorm Kwami Dzakpasu
+
+import io
+import json
+import os
+import threading
+import pandas as pd
+import pytest
+import requests
+from serve import make_server
+
+
+def cleaned(rows):
+    columns = ['Queue ID', 'Balancing Authority Code', 'State', 'Status', 'Queue Date']
+    df = pd.DataFrame(rows, columns=columns)
+    df['Queue Date'] = pd.to_datetime(df['Queue Date'])
+    return df
+
+PARTITIONS = {
+    'Active': cleaned([('J100', 'MISO', 'IL', 'Active', '2020-01-02'), (1234.0, 'PJM', 'PA', 'Active', '2021-03-04'),
+                       ('J101', 'MISO', 'IN', 'Active', None), ('AB-1', 'PJM', 'TX', 'Under Construction', '2019-05-06')]),
+    'Withdrawn': cleaned([('GI-7', 'SPP', 'TX', 'Withdrawn', '2018-07-08')]),
+}
+
+
+@pytest.fixture
+def server(tmp_path):
+    path = tmp_path / 'cleaned.pkl'
+    pd.to_pickle(PARTITIONS, path)
+    server = make_server(str(path), '127.0.0.1', 0, poll_seconds=3600) # Swapped in by refresh() in the tests, not the watcher
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    server.path = path
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.store.stop()
+    server.server_close()
+
+
+def get(server, query, path='/queues'):
+    return requests.get(f"{server.url}{path}?{query}", timeout=10)
+
+
+def test_filters(server):
+    page = get(server, 'iso=pjm,SPP&state=TX').json()
+    assert page['total'] == 2
+    assert [row['Queue ID'] for row in page['rows']] == ['AB-1', 'GI-7'] # In row order, Active before Withdrawn
+    assert get(server, 'queue_id=1234').json()['rows'][0]['State'] == 'PA' # 1234.0 is found as "1234"
+    assert get(server, 'partition=Withdrawn&iso=MISO').json()['total'] == 0
+
+def test_pagination(server):
+    page = get(server, 'limit=2&offset=1').json()
+    assert (page['total'], page['offset'], page['limit']) == (5, 1, 2)
+    assert [row['Queue ID'] for row in page['rows']] == [1234.0, 'J101']
+    assert get(server, 'offset=10').json()['rows'] == []
+
+def test_csv_and_ndjson(server):
+    response = get(server, 'iso=MISO&format=csv')
+    assert response.headers['Content-Type'].startswith('text/csv')
+    csv = pd.read_csv(io.StringIO(response.text))
+    assert list(csv['Queue ID']) == ['J100', 'J101'] and list(csv['Partition']) == ['Active', 'Active']
+    assert csv['Queue Date'][0] == '2020-01-02'
+
+    response = get(server, 'state=TX&format=ndjson&limit=1')
+    lines = response.text.splitlines()
+    assert response.headers['Content-Type'] == 'application/x-ndjson'
+    assert [json.loads(line)['Queue ID'] for line in lines] == ['AB-1']
+
+@pytest.mark.parametrize('query', ['county=Cook', 'format=xml', 'limit=ten', 'offset=-1'])
+def test_bad_requests(server, query):
+    response = get(server, query)
+    assert response.status_code == 400
+    assert 'error' in response.json()
+
+def test_new_run_is_swapped_in(server):
+    assert get(server, '', '/health').json()['partitions'] == {'Active': 4, 'Withdrawn': 1}
+
+    pd.to_pickle({'Active': PARTITIONS['Active'].iloc[:1], 'Completed': cleaned([('Q9', 'NYISO', 'NY', 'In Service', None)])},
+                 server.path)
+    modified = os.path.getmtime(server.path) + 10 # A later run, even where the clock is coarse
+    os.utime(server.path, (modified, modified))
+    assert server.store.refresh()
+    assert not server.store.refresh() # Nothing newer
+
+    health = get(server, '', '/health').json()
+    assert health['partitions'] == {'Active': 1, 'Completed': 1}
+    assert [row['Queue ID'] for row in get(server, '').json()['rows']] == ['J100', 'Q9']
@@ -0,0 +1,73 @@
+# Author: Selorm Kwami Dzakpasu
+
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from benchmark import combine
+from compaction import compact_queue_frame, restore_plain_dtypes
+from status_rules import split_by_status
+
+WITHDRAWN_STATUSES = ["Annulled", "Canceled", "Deactivated", "Retracted", "Suspended", "WITHDRAWN", "Withdrawn"]
+
+
+# The chained filters main.py split the combined queue with before the rule table
+def chained_split(combined_df):
+    withdrawn_df_1 = combined_df[combined_df["Status"].isin(WITHDRAWN_STATUSES)]
+    not_withdrawn_df = combined_df[~combined_df["Status"].isin(WITHDRAWN_STATUSES)]
+    withdrawn_df_2 = not_withdrawn_df[not_withdrawn_df["Status (Original)"] == "TERMINATED"]
+    withdrawn_df = pd.concat([withdrawn_df_1, withdrawn_df_2], ignore_index=True)
+
+    combined_df = combined_df[~combined_df["Status"].isin(WITHDRAWN_STATUSES)]
+    combined_df = combined_df[combined_df["Status (Original)"] != "TERMINATED"]
+
+    completed_df_1 = combined_df[combined_df["Status"] == "In Service"]
+    active_df_1 = combined_df[combined_df["Status"] != "In Service"]
+    completed_df_2 = active_df_1[active_df_1["Status (Original)"] == "IA FULLY EXECUTED/COMMERCIAL OPERATION"]
+    active_df_2 = active_df_1[active_df_1["Status (Original)"] != "IA FULLY EXECUTED/COMMERCIAL OPERATION"]
+    completed_df_3 = active_df_2[active_df_2["Project Status"] == "In Service"]
+    active_df_3 = active_df_2[active_df_2["Project Status"] != "In Service"]
+    completed_df_4 = active_df_3[active_df_3["S"] == 14]
+    active_df_4 = active_df_3[active_df_3["S"] != 14]
+    completed_df_5 = active_df_4[active_df_4["Post Generator Interconnection Agreement Status"] == "In Service"]
+    active_df_5 = active_df_4[active_df_4["Post Generator Interconnection Agreement Status"] != "In Service"]
+    completed_df = pd.concat([completed_df_1, completed_df_2, completed_df_3, completed_df_4, completed_df_5], ignore_index=True)
+
+    return {'Active': active_df_5, 'Withdrawn': withdrawn_df, 'Completed': completed_df}
+
+
+# SPP rows with a status parse_spp_interconnection_queue() doesn't know (it blanks their Status)
+def with_new_spp_status(queues, rows=5):
+    queues = dict(queues)
+    spp = queues['SPP'].copy()
+    spp.loc[:rows - 1, 'Status'] = np.nan
+    spp.loc[:rows - 1, 'Status (Original)'] = 'BRAND NEW STATUS'
+    queues['SPP'] = spp
+    return queues
+
+
+def split(df, compact):
+    with contextlib.redirect_stdout(io.StringIO()):
+        if compact:
+            df, _ = compact_queue_frame(df)
+        partitions, unmatched = split_by_status(df)
+    return {name: restore_plain_dtypes(part) for name, part in partitions.items()}, unmatched
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_rules_split_like_the_chained_filters(queues, compact):
+    combined = combine(with_new_spp_status(queues))
+    partitions, _ = split(combined, compact)
+    expected = chained_split(combined)
+
+    assert list(partitions) == list(expected)
+    for name in expected:
+        pd.testing.assert_frame_equal(partitions[name], expected[name], check_exact=True) # Same rows, order and index
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_new_status_is_reported(queues, compact):
+    _, unmatched = split(combine(with_new_spp_status(queues)), compact)
+    spp = unmatched[unmatched['Balancing Authority Code'] == 'SPP']
+    assert spp.to_dict('records') == [{'Balancing Authority Code': 'SPP', 'Status': 'BRAND NEW STATUS', 'Rows': 5}]